@@ -1,78 +1,536 @@
 """The V-Guard Inverter integration."""
+from functools import partial
 import logging
-from homeassistant.components import mqtt
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST, CONF_PORT, CONF_TOKEN, Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import device_registry as dr
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import (
+    config_validation as cv,
+    device_registry as dr,
+    entity_registry as er,
+)
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.typing import ConfigType
 
+from .aggregate import VGuardAggregator
+from .cadence import VGuardCadenceController
+from .client import HomeAssistantMqttClient, MqttClient, async_get_direct_client
+from .commands import VGuardCommandQueue
 from .const import (
+    COMMAND_START,
+    CONF_AGGREGATE_WINDOW,
+    CONF_COMBINE_COMMANDS,
+    CONF_CONNECTION,
+    CONF_ENTITY_GROUPS,
+    CONF_EXPORT,
+    CONF_EXPORT_RETENTION,
+    CONF_HEARTBEAT_INTERVAL,
+    CONF_HISTORY_HOURS,
+    CONF_MODE,
+    CONF_RATED_POWER,
+    CONF_SUPPRESS_UNCHANGED,
+    CONF_TELEMETRY_QOS,
+    CONNECTION_DIRECT,
+    DATA_DISCOVERED_SERIALS,
+    DATA_STORAGE,
+    DEFAULT_AGGREGATE_WINDOW,
+    DEFAULT_COMBINE_COMMANDS,
+    DEFAULT_CONNECTION,
+    DEFAULT_ENTITY_GROUPS,
+    DEFAULT_EXPORT,
+    DEFAULT_EXPORT_RETENTION,
+    DEFAULT_HEARTBEAT_INTERVAL,
+    DEFAULT_HISTORY_HOURS,
+    DEFAULT_RATED_POWER,
+    DEFAULT_SUPPRESS_UNCHANGED,
+    DEFAULT_TELEMETRY_QOS,
     DOMAIN,
+    EXPORT_DIRECTORY,
+    GROUP_DERIVED,
+    GROUP_DIAGNOSTICS,
     MANUFACTURER,
+    MODE_FLEET,
     MODEL,
+    SIGNAL_NEW_DEVICE,
     TOPIC_TELEMETRY,
     TOPIC_CONTROL,
     TOPIC_LWT,
 )
+from .decoder import mac_address
+from .derived import VGuardDerivedMetrics
+from .entity import VGuardDeviceContext
+from .export import VGuardExporter
+from .fleet import VGuardFleet
+from .history import VGuardHistory
+from .hub import VGuardTelemetryHub
+from .outage import VGuardOutageDetector
+from .storage import VGuardStorage
+from .websocket import async_register_websocket_commands
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = [Platform.SENSOR, Platform.SWITCH, Platform.SELECT, Platform.NUMBER]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the websocket API shared by all entries."""
+    async_register_websocket_commands(hass)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up V-Guard Inverter from a config entry."""
     hass.data.setdefault(DOMAIN, {})
 
-    # Get configuration
-    host = entry.data[CONF_HOST]
-    port = entry.data[CONF_PORT]
-    serial = entry.data[CONF_TOKEN]
+    # Serials and VG codes seen before, so entities exist right away
+    storage = VGuardStorage(hass, entry.entry_id)
+    await storage.async_load()
+    hass.data.setdefault(DATA_STORAGE, {})[entry.entry_id] = storage
 
-    # Create device registry entry
-    device_registry = dr.async_get(hass)
-    device_registry.async_get_or_create(
-        config_entry_id=entry.entry_id,
+    # Home Assistant's MQTT integration, or a connection of our own to the
+    # configured broker, shared with the other entries using that broker
+    connection = entry.options.get(CONF_CONNECTION, DEFAULT_CONNECTION)
+    if connection == CONNECTION_DIRECT:
+        mqtt_client = await async_get_direct_client(
+            hass, entry.data[CONF_HOST], entry.data[CONF_PORT]
+        )
+    else:
+        mqtt_client = HomeAssistantMqttClient(hass)
+
+    # Store configuration for platforms
+    config = hass.data[DOMAIN][entry.entry_id] = {
+        "host": entry.data[CONF_HOST],
+        "port": entry.data[CONF_PORT],
+        "connection": connection,
+        "mqtt_client": mqtt_client,
+        "devices": {},
+        "storage": storage,
+        # Updated in place when the options change, entities read it
+        "entity_groups": set(
+            entry.options.get(CONF_ENTITY_GROUPS, DEFAULT_ENTITY_GROUPS)
+        ),
+        # Writes the telemetry of all inverters of the entry to files
+        "exporter": VGuardExporter(
+            hass,
+            hass.config.path(DOMAIN, EXPORT_DIRECTORY),
+            entry.options.get(CONF_EXPORT_RETENTION, DEFAULT_EXPORT_RETENTION),
+        ),
+    }
+    if entry.options.get(CONF_EXPORT, DEFAULT_EXPORT):
+        config["exporter"].async_start()
+
+    if entry.data.get(CONF_MODE) == MODE_FLEET:
+        # Inverters configured on their own keep being handled by their entry
+        ignored_serials = {
+            other.data[CONF_TOKEN]
+            for other in hass.config_entries.async_entries(DOMAIN)
+            if CONF_TOKEN in other.data
+        }
+        fleet = VGuardFleet(
+            hass,
+            ignored_serials,
+            lambda serial: _async_add_device(hass, entry, serial)["hub"],
+            _telemetry_qos(entry),
+            mqtt_client,
+        )
+        config["fleet"] = fleet
+
+        # Forward setup to platforms, entities are added as inverters show up
+        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+        # Inverters of previous runs are added before their first message
+        fleet.async_restore(storage.serials)
+
+        # Two wildcard subscriptions for all inverters on the broker
+        await fleet.async_start()
+
+        # Restored inverters may already count as online, ask them directly
+        for device in list(config["devices"].values()):
+            await _async_publish_start(mqtt_client, device["control_topic"])
+    else:
+        # Forward setup to platforms, they add entities once the device exists
+        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+        device = _async_add_device(hass, entry, entry.data[CONF_TOKEN])
+
+        # One telemetry and LWT subscription for all entities of this device
+        await device["hub"].async_start()
+
+        # Publish initial start command via MQTT
+        await _async_publish_start(mqtt_client, device["control_topic"])
+
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
+
+    return True
+
+
+@callback
+def _async_add_device(hass: HomeAssistant, entry: ConfigEntry, serial: str) -> dict:
+    """Create the hub and command queue of an inverter.
+
+    The platforms must be set up already, they add the entities of the
+    inverter when it is announced.
+    """
+    config = hass.data[DOMAIN][entry.entry_id]
+    storage: VGuardStorage = config["storage"]
+    mqtt_client: MqttClient = config["mqtt_client"]
+
+    # Create device registry entry, its info is shared by all entities
+    device_info = DeviceInfo(
         identifiers={(DOMAIN, serial)},
         manufacturer=MANUFACTURER,
         model=MODEL,
         name=f"V-Guard Inverter {serial[-6:]}",
-        sw_version="2.2.3",
+    )
+    device_registry = dr.async_get(hass)
+    device_entry = device_registry.async_get_or_create(
+        config_entry_id=entry.entry_id, **device_info
     )
 
-    # Store configuration for platforms
-    hass.data[DOMAIN][entry.entry_id] = {
-        "host": host,
-        "port": port,
+    telemetry_topic = TOPIC_TELEMETRY.format(serial=serial)
+    lwt_topic = TOPIC_LWT.format(serial=serial)
+    hub = VGuardTelemetryHub(
+        hass,
+        serial,
+        telemetry_topic,
+        lwt_topic,
+        heartbeat_interval=_heartbeat_seconds(entry),
+        known_codes=storage.known_codes(serial),
+        telemetry_qos=_telemetry_qos(entry),
+        mqtt_client=mqtt_client,
+    )
+    # Entities show the last values of the previous run until data arrives
+    storage.async_restore(hub)
+
+    control_topic = TOPIC_CONTROL.format(serial=serial)
+    commands = VGuardCommandQueue(
+        hass,
+        hub,
+        control_topic,
+        combine=entry.options.get(CONF_COMBINE_COMMANDS, DEFAULT_COMBINE_COMMANDS),
+    )
+
+    # Firmware, hardware and MAC go to the device registry
+    _async_track_device_metadata(hass, entry, hub, device_entry.id)
+
+    # Fires outage events and tells the others whether the unit is on battery
+    outage = VGuardOutageDetector(
+        hass, hub, entry.options.get(CONF_RATED_POWER, DEFAULT_RATED_POWER)
+    )
+
+    # Re-sends start when telemetry stalls, more eagerly on battery
+    cadence = VGuardCadenceController(
+        hass, hub, outage, partial(_async_publish_start, mqtt_client, control_topic)
+    )
+
+    # Power, battery energy and load average computed from each frame
+    derived = VGuardDerivedMetrics(
+        hub, outage, entry.options.get(CONF_RATED_POWER, DEFAULT_RATED_POWER)
+    )
+
+    # Optionally hands fast-moving codes to their entities once per window
+    aggregator = VGuardAggregator(hass, hub)
+
+    # Recent numeric telemetry for the websocket API
+    history = VGuardHistory(hub)
+
+    @callback
+    def availability_changed() -> None:
+        """Ask for telemetry as soon as the device comes back online."""
+        if hub.available:
+            hass.async_create_task(_async_publish_start(mqtt_client, control_topic))
+
+    entry.async_on_unload(hub.async_add_availability_listener(availability_changed))
+
+    device = {
         "serial": serial,
-        "telemetry_topic": TOPIC_TELEMETRY.format(serial=serial),
-        "control_topic": TOPIC_CONTROL.format(serial=serial),
-        "lwt_topic": TOPIC_LWT.format(serial=serial),
+        "telemetry_topic": telemetry_topic,
+        "control_topic": control_topic,
+        "lwt_topic": lwt_topic,
+        "hub": hub,
+        "commands": commands,
+        "outage": outage,
+        "cadence": cadence,
+        "derived": derived,
+        "aggregator": aggregator,
+        "history": history,
+        "context": VGuardDeviceContext(
+            serial, hub, commands, device_info, config["entity_groups"]
+        ),
     }
+    config["devices"][serial] = device
+    async_dispatcher_send(hass, SIGNAL_NEW_DEVICE.format(entry_id=entry.entry_id), device)
+
+    # Recreate the entities of restored codes, then persist new ones
+    hub.async_announce_codes()
+    storage.async_track(hub)
+    # The detector runs before the other frame listeners, which read its state
+    outage.async_start()
+    if GROUP_DERIVED in config["entity_groups"]:
+        derived.async_start()
+    cadence.async_start()
+    aggregator.async_set_window(
+        entry.options.get(CONF_AGGREGATE_WINDOW, DEFAULT_AGGREGATE_WINDOW)
+    )
+    history.async_set_hours(entry.options.get(CONF_HISTORY_HOURS, DEFAULT_HISTORY_HOURS))
+    config["exporter"].async_add_hub(hub)
+    return device
 
-    # Forward setup to platforms
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    # Publish initial start command via MQTT
-    try:
-        await mqtt.async_publish(
-            hass,
-            TOPIC_CONTROL.format(serial=serial),
-            "start",
-            qos=1,
+@callback
+def _async_track_device_metadata(
+    hass: HomeAssistant, entry: ConfigEntry, hub: VGuardTelemetryHub, device_id: str
+) -> None:
+    """Apply VG012, VG013 and VG132 to the device registry when they change."""
+    device_registry = dr.async_get(hass)
+
+    @callback
+    def update_device(field: str, value) -> None:
+        """Update one field of the device entry, skipping unchanged values."""
+        device_entry = device_registry.async_get(device_id)
+        if device_entry is None or not value:
+            return
+        value = str(value)
+        if field == "connections":
+            connection = (dr.CONNECTION_NETWORK_MAC, dr.format_mac(mac_address(value)))
+            if connection in device_entry.connections:
+                return
+            changes = {"merge_connections": {connection}}
+        elif getattr(device_entry, field) == value:
+            return
+        else:
+            changes = {field: value}
+        _LOGGER.debug("Updating %s of V-Guard Inverter %s", field, hub.serial)
+        device_registry.async_update_device(device_id, **changes)
+
+    for vg_code, field in (
+        ("VG012", "sw_version"),
+        ("VG013", "hw_version"),
+        ("VG132", "connections"),
+    ):
+        entry.async_on_unload(
+            hub.async_add_listener(vg_code, partial(update_device, field))
         )
+
+
+async def _async_publish_start(mqtt_client: MqttClient, control_topic: str) -> None:
+    """Publish the start command so the device sends telemetry."""
+    try:
+        await mqtt_client.async_publish(control_topic, COMMAND_START, qos=1)
         _LOGGER.info("Published start command to V-Guard Inverter")
     except Exception as err:
         _LOGGER.error("Failed to publish start command: %s", err)
 
+
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Migrate an old config entry."""
+    _LOGGER.debug("Migrating from version %s", entry.version)
+
+    if entry.version == 1:
+        # Sensors now report numbers with units instead of formatted strings.
+        # Suggested units only apply to new registry entries, so hand them to
+        # the existing sensors here; unique IDs and history are kept as is.
+        from .codes import SENSORS
+
+        entity_registry = er.async_get(hass)
+        prefix = f"{DOMAIN}_{entry.data[CONF_TOKEN]}_"
+        for entity_entry in er.async_entries_for_config_entry(
+            entity_registry, entry.entry_id
+        ):
+            if entity_entry.domain != Platform.SENSOR:
+                continue
+            description = SENSORS.get(entity_entry.unique_id.removeprefix(prefix))
+            if description is None or description.suggested_unit is None:
+                continue
+            entity_registry.async_update_entity_options(
+                entity_entry.entity_id,
+                "sensor.private",
+                {"suggested_unit_of_measurement": description.suggested_unit},
+            )
+
+        hass.config_entries.async_update_entry(entry, version=2)
+
+    if entry.version == 2:
+        # Firmware, MAC, SSID and model parameter became disabled diagnostic
+        # sensors, the first three are on the device entry now. The device
+        # entry also lost the integration version posing as firmware.
+        from .codes import SENSORS
+
+        entity_registry = er.async_get(hass)
+        for entity_entry in er.async_entries_for_config_entry(
+            entity_registry, entry.entry_id
+        ):
+            if (
+                entity_entry.domain == Platform.SENSOR
+                and entity_entry.disabled_by is None
+                and (code := entity_entry.unique_id.rsplit("_", 1)[-1]) in SENSORS
+                and SENSORS[code].diagnostic
+            ):
+                entity_registry.async_update_entity(
+                    entity_entry.entity_id,
+                    disabled_by=er.RegistryEntryDisabler.INTEGRATION,
+                )
+
+        device_registry = dr.async_get(hass)
+        for device_entry in dr.async_entries_for_config_entry(
+            device_registry, entry.entry_id
+        ):
+            if device_entry.sw_version == "2.2.3":
+                device_registry.async_update_device(device_entry.id, sw_version=None)
+
+        hass.config_entries.async_update_entry(entry, version=3)
+
+    _LOGGER.info("Migration to version %s successful", entry.version)
     return True
 
 
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed options without reloading the entry."""
+    config = hass.data[DOMAIN][entry.entry_id]
+    if entry.options.get(CONF_CONNECTION, DEFAULT_CONNECTION) != config["connection"]:
+        # Everything subscribes through the client, start over with the new one
+        hass.async_create_task(hass.config_entries.async_reload(entry.entry_id))
+        return
+
+    telemetry_qos = _telemetry_qos(entry)
+    if "fleet" in config:
+        await config["fleet"].async_set_telemetry_qos(telemetry_qos)
+
+    entity_groups = set(entry.options.get(CONF_ENTITY_GROUPS, DEFAULT_ENTITY_GROUPS))
+    if entity_groups != config["entity_groups"]:
+        # The set is shared with the entities, so update it in place
+        config["entity_groups"].clear()
+        config["entity_groups"].update(entity_groups)
+        _async_apply_entity_groups(hass, entry, entity_groups)
+
+    exporter: VGuardExporter = config["exporter"]
+    exporter.retention_days = entry.options.get(
+        CONF_EXPORT_RETENTION, DEFAULT_EXPORT_RETENTION
+    )
+    if entry.options.get(CONF_EXPORT, DEFAULT_EXPORT):
+        exporter.async_start()
+    else:
+        await exporter.async_stop()
+
+    for device in config["devices"].values():
+        await device["hub"].async_set_telemetry_qos(telemetry_qos)
+        device["hub"].heartbeat_interval = _heartbeat_seconds(entry)
+        device["commands"].combine = entry.options.get(
+            CONF_COMBINE_COMMANDS, DEFAULT_COMBINE_COMMANDS
+        )
+        rated_power = entry.options.get(CONF_RATED_POWER, DEFAULT_RATED_POWER)
+        device["outage"].rated_power = device["derived"].rated_power = rated_power
+        if GROUP_DERIVED in entity_groups:
+            device["derived"].async_start()
+        else:
+            device["derived"].async_stop()
+        device["aggregator"].async_set_window(
+            entry.options.get(CONF_AGGREGATE_WINDOW, DEFAULT_AGGREGATE_WINDOW)
+        )
+        device["history"].async_set_hours(
+            entry.options.get(CONF_HISTORY_HOURS, DEFAULT_HISTORY_HOURS)
+        )
+
+
+@callback
+def _async_apply_entity_groups(
+    hass: HomeAssistant, entry: ConfigEntry, entity_groups: set[str]
+) -> None:
+    """Enable or disable the registered entities of the optional groups.
+
+    Only entities the integration disabled are enabled again, entities
+    disabled by the user stay as they are.
+    """
+    from .codes import SENSORS
+
+    # Keys of derived metrics contain underscores, strip the whole prefix
+    prefixes = [
+        f"{DOMAIN}_{serial}_" for serial in hass.data[DOMAIN][entry.entry_id]["devices"]
+    ]
+    entity_registry = er.async_get(hass)
+    for entity_entry in er.async_entries_for_config_entry(
+        entity_registry, entry.entry_id
+    ):
+        if entity_entry.domain != Platform.SENSOR:
+            continue
+        unique_id = entity_entry.unique_id
+        prefix = next((prefix for prefix in prefixes if unique_id.startswith(prefix)), None)
+        if prefix is None:
+            continue
+        key = unique_id.removeprefix(prefix)
+        if key.startswith("diagnostic_"):
+            group = GROUP_DIAGNOSTICS
+        elif description := SENSORS.get(key):
+            group = description.group
+        else:
+            continue
+        if group is None:
+            continue
+
+        if group in entity_groups:
+            if entity_entry.disabled_by is er.RegistryEntryDisabler.INTEGRATION:
+                entity_registry.async_update_entity(
+                    entity_entry.entity_id, disabled_by=None
+                )
+        elif entity_entry.disabled_by is None:
+            entity_registry.async_update_entity(
+                entity_entry.entity_id,
+                disabled_by=er.RegistryEntryDisabler.INTEGRATION,
+            )
+
+
+def _heartbeat_seconds(entry: ConfigEntry) -> float:
+    """Return the configured heartbeat interval in seconds.
+
+    Without change suppression every reported value is written, as if the
+    heartbeat were always due.
+    """
+    if not entry.options.get(CONF_SUPPRESS_UNCHANGED, DEFAULT_SUPPRESS_UNCHANGED):
+        return 0
+    return entry.options.get(CONF_HEARTBEAT_INTERVAL, DEFAULT_HEARTBEAT_INTERVAL) * 60
+
+
+def _telemetry_qos(entry: ConfigEntry) -> int:
+    """Return the configured QoS of the telemetry subscriptions."""
+    return entry.options.get(CONF_TELEMETRY_QOS, DEFAULT_TELEMETRY_QOS)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        config = hass.data[DOMAIN].pop(entry.entry_id)
+        # Writes out the rows collected since the last flush
+        await config["exporter"].async_stop()
+        if "fleet" in config:
+            config["fleet"].async_stop()
+        for device in config["devices"].values():
+            device["history"].async_stop()
+            device["aggregator"].async_stop()
+            device["cadence"].async_stop()
+            device["derived"].async_stop()
+            device["outage"].async_stop()
+            device["commands"].async_shutdown()
+            device["hub"].async_stop()
+        # Writes out the snapshot instead of leaving a delayed save behind
+        await config["storage"].async_stop()
+        await config["mqtt_client"].async_release()
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Clean up after a removed entry."""
+    storage = hass.data.get(DATA_STORAGE, {}).pop(entry.entry_id, None)
+    if storage is None:
+        # Not loaded since Home Assistant started
+        storage = VGuardStorage(hass, entry.entry_id)
+    await storage.async_remove()
+
+    # Let background discovery find a removed inverter again
+    if CONF_TOKEN in entry.data:
+        hass.data.get(DATA_DISCOVERED_SERIALS, set()).discard(entry.data[CONF_TOKEN])
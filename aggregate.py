@@ -0,0 +1,121 @@
+"""Windowed aggregation for V-Guard Inverter.
+
+Fast-moving numeric codes are sampled from every frame into running
+count, sum, min and max, so a window of any length costs the same, and
+reach their entities once per window as the mean, with min and max as
+attributes. The hub keeps the raw values, so the outage
+detector, derived metrics and controls still see every frame.
+"""
+from datetime import timedelta
+import math
+import logging
+from typing import Optional
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import AGGREGATED_CODES
+from .decoder import as_float
+from .hub import VGuardTelemetryHub
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Window:
+    """Running statistics of one code in the current window."""
+
+    __slots__ = ("count", "total", "low", "high")
+
+    def __init__(self) -> None:
+        """Initialize an empty window."""
+        self.reset()
+
+    def reset(self) -> None:
+        """Start the next window."""
+        self.count = 0
+        self.total = 0.0
+        self.low = math.inf
+        self.high = -math.inf
+
+    def append(self, value: float) -> None:
+        """Add a sample."""
+        self.count += 1
+        self.total += value
+        if value < self.low:
+            self.low = value
+        if value > self.high:
+            self.high = value
+
+
+class VGuardAggregator:
+    """Publish fast-moving codes of one inverter as windowed aggregates."""
+
+    def __init__(self, hass: HomeAssistant, hub: VGuardTelemetryHub) -> None:
+        """Initialize the aggregator."""
+        self.hass = hass
+        self._hub = hub
+        self.window = 0  # seconds, 0 when disabled
+        self._windows = {code: _Window() for code in AGGREGATED_CODES}
+        self._unsub_frame: Optional[CALLBACK_TYPE] = None
+        self._unsub_interval: Optional[CALLBACK_TYPE] = None
+
+    @callback
+    def async_set_window(self, window: int) -> None:
+        """Enable, change or (with 0) disable aggregation."""
+        if window == self.window:
+            return
+        self.async_stop()
+        self.window = window
+        hub = self._hub
+        if not window:
+            # Entities go back to raw values, starting with the latest one
+            hub.aggregated_codes.clear()
+            hub.aggregate_attributes.clear()
+            for code in AGGREGATED_CODES:
+                hub.async_redispatch(code)
+            return
+
+        _LOGGER.debug("Aggregating %s over %s seconds", hub.serial, window)
+        hub.aggregated_codes.update(AGGREGATED_CODES)
+        for stats in self._windows.values():
+            stats.reset()
+        self._unsub_frame = hub.async_add_frame_listener(self._async_frame_received)
+        self._unsub_interval = async_track_time_interval(
+            self.hass, self._async_publish, timedelta(seconds=window)
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop sampling and publishing."""
+        if self._unsub_frame is not None:
+            self._unsub_frame()
+            self._unsub_frame = None
+        if self._unsub_interval is not None:
+            self._unsub_interval()
+            self._unsub_interval = None
+
+    @callback
+    def _async_frame_received(self) -> None:
+        """Sample the codes of the latest frame, unchanged values included."""
+        get_value = self._hub.get_value
+        for code, stats in self._windows.items():
+            if (value := as_float(get_value(code))) is not None:
+                stats.append(value)
+
+    @callback
+    def _async_publish(self, _now=None) -> None:
+        """Publish mean, min and max of the window and start the next one."""
+        hub = self._hub
+        for code, stats in self._windows.items():
+            count = stats.count
+            if not count:
+                continue
+            attributes = {
+                "min": stats.low,
+                "max": stats.high,
+                "samples": count,
+                "window": self.window,
+            }
+            mean = round(stats.total / count, 3)
+            stats.reset()
+            hub.async_dispatch_aggregate(code, mean, attributes)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Microbenchmark: per-entity telemetry decoding vs. the shared decoder.
+
+The old path ran json.loads, the unwrap and the transform lambda in every
+entity for every frame. The new path parses each frame once with
+decoder.decode_frame and decodes values through a memoized ValueDecoder.
+
+The decoders are taken from codes.py, so the shipped descriptions are
+measured. Requires the homeassistant package (pip install homeassistant)
+and the integration directory to be importable as a Python package.
+
+Usage: python3 benchmarks/bench_decoder.py [--frames N] [--corpus capture.txt]
+"""
+import argparse
+import datetime
+import importlib
+import json
+import time
+
+import corpus
+
+# corpus imported the integration already
+codes = corpus.codes
+decoder = importlib.import_module(f"{corpus.ROOT.name}.decoder")
+
+# Transforms as they were in sensor.py before the decoder module existed
+LEGACY_TRANSFORMS = {
+    "VG011": lambda v: f"{v} dBm",
+    "VG012": None,
+    "VG132": lambda v: ':'.join(v[i:i+2] for i in range(0, len(v), 2)) if v else v,
+    "VG136": None,
+    "VG304": None,
+    "VG042": lambda v: str(datetime.timedelta(seconds=int(v))),
+    "VG144": lambda v: f"{v}°C",
+    "VG146": lambda v: f"{int(v)/1000:.2f} kWh",
+    "VG211": lambda v: f"{int(v)/1000:.2f} kWh",
+    "VG033": None,
+    "VG095": None,
+    "VG003": None,
+    "VG013": None,
+    "VG109": None,
+    "VG041": lambda v: "normal mode" if v == "0" else "unknown",
+    "VG094": lambda v: "normal operation" if v == "1" else "unknown",
+    "VG014": lambda v: f"{v} V",
+    "VG015": lambda v: f"{v} V",
+    "VG016": lambda v: f"{v} V",
+    "VG017": lambda v: f"{v}%",
+    "VG018": lambda v: f"{v} A",
+    "VG019": lambda v: f"{v}%",
+    "VG020": lambda v: f"{int(int(v)/60)}h{int(int(v)%60)}m",
+    "VG022": None,
+    "VG023": None,
+    "VG024": lambda v: f"{v}%",
+    "VG025": lambda v: f"{int(v)/10} Ah",
+    "VG026": lambda v: str(datetime.timedelta(seconds=int(v))),
+    "VG098": lambda v: str(datetime.timedelta(seconds=int(v))),
+    "VG037": lambda v: f"{v} min",
+    "VG038": lambda v: "ON" if v == "1" else "OFF",
+}
+
+# Decoders as used by sensor.py
+DECODERS = {
+    code: description.decoder
+    for code, description in codes.SENSORS.items()
+    if description.decoder is not None
+}
+
+# Codes of the switch, number and select entities (value comparison only)
+CONTROL_CODES = tuple(
+    description.code
+    for description in codes.DESCRIPTIONS
+    if not isinstance(description, codes.VGuardSensorDescription)
+)
+
+
+def legacy_path(frames: list[bytes]) -> None:
+    """One json.loads, unwrap and transform per entity per frame."""
+    subscribers = [(code, fn) for code, fn in LEGACY_TRANSFORMS.items()]
+    subscribers += [(code, None) for code in CONTROL_CODES]
+    for raw in frames:
+        text = raw.decode("utf-8")
+        for code, transform in subscribers:
+            payload = json.loads(text)
+            if len(payload) == 1 and isinstance(next(iter(payload.values())), dict):
+                payload = next(iter(payload.values()))
+            if code in payload:
+                value = payload[code]
+                if transform:
+                    value = transform(value)
+
+
+def shared_path(frames: list[bytes]) -> None:
+    """One decode per frame, memoized decoding of changed values only."""
+    value_decoder = decoder.ValueDecoder(DECODERS)
+    last_values: dict = {}
+    for raw in frames:
+        payload = decoder.decode_frame(raw)
+        for code, value in payload.items():
+            if last_values.get(code) == value:
+                continue
+            last_values[code] = value
+            value_decoder.decode(code, value)
+
+
+def run(name: str, fn, frames: list[bytes]) -> float:
+    """Time one path and print the result."""
+    start = time.perf_counter()
+    fn(frames)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<28} {elapsed * 1e6 / len(frames):9.1f} µs/frame"
+        f" {len(frames) / elapsed:11.0f} frames/s"
+    )
+    return elapsed
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=5000)
+    parser.add_argument("--corpus", help="mosquitto_sub -v capture to replay")
+    args = parser.parse_args()
+
+    frames = corpus.load(args.corpus, args.frames)
+    print(f"JSON backend: {'orjson' if decoder.orjson is not None else 'json'}")
+    legacy = run("per-entity (before)", legacy_path, frames)
+    shared = run("shared decoder (after)", shared_path, frames)
+    print(f"speedup: {legacy / shared:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""Replay telemetry through the hub and all four entity platforms.
+
+Runs the real fleet routing, telemetry hub, every frame listener the
+integration adds (storage, outage detector, derived metrics, cadence
+controller, aggregator, history and exporter) and the sensor, switch, number
+and select value handlers for 1, 10 and 100 simulated inverters. Home
+Assistant's state machine is replaced by a counter and its timers never
+fire, so the numbers cover the integration's own hot path: messages per
+second, µs per frame, state writes per frame and memory allocated while
+replaying, plus the time and memory it takes to create the entities of the
+fleet. Aggregation and export are off by default, as in the integration.
+
+Requires the homeassistant package (pip install homeassistant) and the
+integration directory to be importable as a Python package.
+
+Usage: python3 benchmarks/bench_platforms.py [--frames N] [--corpus capture.txt]
+                                             [--inverters 1,10,100] [--output FILE]
+                                             [--aggregate-window SECONDS] [--export]
+"""
+import argparse
+import asyncio
+from functools import partial
+import importlib
+import logging
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from homeassistant.core import CoreState
+
+import corpus
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT.parent))
+
+try:
+    integration = importlib.import_module(ROOT.name)
+except ImportError as err:
+    sys.exit(f"Cannot import the integration ({err}), is homeassistant installed?")
+
+const = importlib.import_module(f"{ROOT.name}.const")
+aggregate_module = importlib.import_module(f"{ROOT.name}.aggregate")
+cadence_module = importlib.import_module(f"{ROOT.name}.cadence")
+commands_module = importlib.import_module(f"{ROOT.name}.commands")
+derived_module = importlib.import_module(f"{ROOT.name}.derived")
+entity_module = importlib.import_module(f"{ROOT.name}.entity")
+export_module = importlib.import_module(f"{ROOT.name}.export")
+outage_module = importlib.import_module(f"{ROOT.name}.outage")
+fleet_module = importlib.import_module(f"{ROOT.name}.fleet")
+history_module = importlib.import_module(f"{ROOT.name}.history")
+hub_module = importlib.import_module(f"{ROOT.name}.hub")
+storage_module = importlib.import_module(f"{ROOT.name}.storage")
+PLATFORM_FACTORIES = (
+    importlib.import_module(f"{ROOT.name}.sensor")._create_sensors,
+    importlib.import_module(f"{ROOT.name}.switch")._create_switches,
+    importlib.import_module(f"{ROOT.name}.number")._create_numbers,
+    importlib.import_module(f"{ROOT.name}.select")._create_selects,
+)
+
+HEARTBEAT_INTERVAL = const.DEFAULT_HEARTBEAT_INTERVAL * 60
+
+
+class FakeBus:
+    """Event bus that counts fired events."""
+
+    def __init__(self) -> None:
+        """Initialize the fake."""
+        self.events = 0
+
+    def async_fire(self, event_type: str, event_data=None) -> None:
+        """Count the event."""
+        self.events += 1
+
+    def async_listen_once(self, event_type: str, listener):
+        """Accept the final write listener of the storage."""
+        return lambda: None
+
+
+class FakeHass:
+    """The parts of HomeAssistant the hot path touches."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Initialize the fake."""
+        self.data = {}
+        self.bus = FakeBus()
+        # Timers are scheduled on the loop, it does not run while replaying
+        self.loop = loop
+        self.state = CoreState.running
+        self.tasks = 0
+
+    def async_create_task(self, target, name=None, eager_start=False) -> None:
+        """Count the task, the start commands of the cadence go nowhere."""
+        self.tasks += 1
+        target.close()
+
+
+class FakeMessage:
+    """An MQTT message as handed to subscription callbacks."""
+
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic: str, payload) -> None:
+        """Initialize the message."""
+        self.topic = topic
+        self.payload = payload
+
+
+class Bench:
+    """A fleet of simulated inverters wired to real entities."""
+
+    def __init__(self, aggregate_window: int, export: bool) -> None:
+        """Initialize the bench."""
+        self.loop = asyncio.new_event_loop()
+        self.hass = FakeHass(self.loop)
+        self.writes = 0
+        self.entities = []
+        self.aggregate_window = aggregate_window
+        self.storage = storage_module.VGuardStorage(self.hass, "bench")
+        # Nothing is flushed to the directory while replaying
+        self.exporter = export_module.VGuardExporter(
+            self.hass, tempfile.gettempdir(), const.DEFAULT_EXPORT_RETENTION
+        )
+        if export:
+            self.exporter.async_start()
+        self.fleet = fleet_module.VGuardFleet(self.hass, set(), self._add_device)
+
+    def close(self) -> None:
+        """Drop the timers of the fleet."""
+        self.loop.close()
+
+    def _count_write(self) -> None:
+        """Stand in for Entity.async_write_ha_state."""
+        self.writes += 1
+
+    def _add_device(self, serial: str):
+        """Build a device the way the integration does, minus the registries."""
+        hub = hub_module.VGuardTelemetryHub(
+            self.hass,
+            serial,
+            const.TOPIC_TELEMETRY.format(serial=serial),
+            const.TOPIC_LWT.format(serial=serial),
+            heartbeat_interval=HEARTBEAT_INTERVAL,
+        )
+        context = entity_module.VGuardDeviceContext(
+            serial,
+            hub,
+            commands_module.VGuardCommandQueue(
+                self.hass, hub, const.TOPIC_CONTROL.format(serial=serial), combine=False
+            ),
+            {"identifiers": {(const.DOMAIN, serial)}},
+            set(const.DEFAULT_ENTITY_GROUPS),
+        )
+        # Entities are created lazily, as the integration's platforms do
+        for create_entities in PLATFORM_FACTORIES:
+            hub.async_add_code_listener(partial(self._add_entities, create_entities, context))
+        # Frame listeners in the order the integration adds them
+        self.storage.async_track(hub)
+        outage = outage_module.VGuardOutageDetector(self.hass, hub, const.DEFAULT_RATED_POWER)
+        outage.async_start()
+        derived_module.VGuardDerivedMetrics(hub, outage, const.DEFAULT_RATED_POWER).async_start()
+        cadence_module.VGuardCadenceController(
+            self.hass, hub, outage, self._publish_start
+        ).async_start()
+        aggregate_module.VGuardAggregator(self.hass, hub).async_set_window(
+            self.aggregate_window
+        )
+        history_module.VGuardHistory(hub).async_set_hours(const.DEFAULT_HISTORY_HOURS)
+        self.exporter.async_add_hub(hub)
+        return hub
+
+    async def _publish_start(self) -> None:
+        """Stand in for publishing the start command."""
+
+    def _add_entities(self, create_entities, context, code: str) -> bool:
+        """Create the entities of a newly seen VG code."""
+        entities = create_entities(context, code)
+        for entity in entities:
+            entity.async_write_ha_state = self._count_write
+            self.entities.append(entity)
+        return bool(entities)
+
+    def setup(self, serials: list[str], first_frame: bytes) -> None:
+        """Run async_setup on the loop of the bench."""
+        self.loop.run_until_complete(self.async_setup(serials, first_frame))
+
+    async def async_setup(self, serials: list[str], first_frame: bytes) -> None:
+        """Bring all inverters online and register their entities."""
+        for serial in serials:
+            self.fleet._lwt_received(
+                FakeMessage(const.TOPIC_LWT.format(serial=serial), const.LWT_ONLINE)
+            )
+            # The first frame creates the entities of all reported codes
+            self.fleet._telemetry_received(
+                FakeMessage(const.TOPIC_TELEMETRY.format(serial=serial), first_frame)
+            )
+        for entity in self.entities:
+            await entity.async_added_to_hass()
+        self.writes = 0
+
+    def replay(self, messages: list[FakeMessage]) -> float:
+        """Feed all messages through the fleet router, return seconds taken."""
+        handle = self.fleet._telemetry_received
+        start = time.perf_counter()
+        for message in messages:
+            handle(message)
+        return time.perf_counter() - start
+
+
+def build_messages(serials: list[str], frames: list[bytes]) -> list[FakeMessage]:
+    """Interleave the corpus for all inverters like a broker would."""
+    topics = [const.TOPIC_TELEMETRY.format(serial=serial) for serial in serials]
+    return [FakeMessage(topic, frame) for frame in frames for topic in topics]
+
+
+def run(count: int, frames: list[bytes], aggregate_window: int, export: bool) -> str:
+    """Benchmark one fleet size and return the result row."""
+    serials = [f"VGSIM{index:08d}" for index in range(count)]
+    messages = build_messages(serials, frames)
+    create_bench = partial(Bench, aggregate_window, export)
+
+    # Entity creation, memory retained by the fleet once it is set up
+    bench = create_bench()
+    tracemalloc.start()
+    start = time.perf_counter()
+    bench.setup(serials, frames[0])
+    setup = time.perf_counter() - start
+    setup_memory, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    bench.close()
+
+    bench = create_bench()
+    bench.setup(serials, frames[0])
+    elapsed = bench.replay(messages)
+    writes = bench.writes
+    bench.close()
+
+    # Separate pass for allocations, tracing slows everything down
+    bench = create_bench()
+    bench.setup(serials, frames[0])
+    tracemalloc.start()
+    bench.replay(messages)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    bench.close()
+
+    total = len(messages)
+    return (
+        f"{count:>9} {total / elapsed:>12.0f} {elapsed * 1e6 / total:>10.1f}"
+        f" {writes / total:>12.2f} {peak / 1024:>10.1f} {len(bench.entities):>9}"
+        f" {setup * 1e3:>9.1f} {setup_memory / 1024:>10.1f}"
+    )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--corpus", help="mosquitto_sub -v capture to replay")
+    parser.add_argument("--inverters", default="1,10,100")
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument(
+        "--aggregate-window", type=int, default=const.DEFAULT_AGGREGATE_WINDOW
+    )
+    parser.add_argument("--export", action="store_true", help="collect export batches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    frames = corpus.load(args.corpus, args.frames)
+
+    lines = [
+        f"{len(frames)} frames per inverter",
+        f"{'inverters':>9} {'msgs/s':>12} {'µs/frame':>10} {'writes/frame':>12}"
+        f" {'peak KiB':>10} {'entities':>9} {'setup ms':>9} {'setup KiB':>10}",
+    ]
+    print("\n".join(lines))
+    for count in (int(value) for value in args.inverters.split(",")):
+        lines.append(run(count, frames, args.aggregate_window, args.export))
+        print(lines[-1])
+
+    if args.output:
+        Path(args.output).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""Simulate a fleet of V-Guard inverters against an MQTT broker.
+
+Every simulated inverter announces itself on its LWT topic, publishes
+telemetry frames with all VG codes of the sensor, switch, number and select
+platforms and answers control commands the way the firmware does: ``start``
+triggers an immediate frame and ``VGxxx:value`` writes (comma separated
+for several codes) are applied and reported in the next frame.
+
+Mains outages and connectivity dropouts can be scheduled per inverter, and
+a capture of real traffic can be replayed at N times its original speed.
+
+Requires paho-mqtt and homeassistant (pip install paho-mqtt homeassistant),
+the frames are built from the descriptions in codes.py.
+
+Usage: python3 benchmarks/simulator.py [--broker HOST] [--port PORT]
+                                       [--inverters N] [--interval SECONDS]
+                                       [--speed N] [--outage-every SECONDS]
+                                       [--outage-length SECONDS]
+                                       [--dropout-every SECONDS]
+                                       [--dropout-length SECONDS]
+                                       [--replay capture.txt] [--duration SECONDS]
+"""
+import argparse
+import asyncio
+from pathlib import Path
+import random
+import time
+from typing import Optional
+
+import paho.mqtt.client as mqtt_client
+
+import corpus
+
+TOPIC_TELEMETRY = "device/dups/CE01/{serial}"
+TOPIC_CONTROL = "apps/dups/CE01/{serial}"
+TOPIC_LWT = "device/dups/CE01/lwt/{serial}"
+CONTROL_PREFIX_LEN = len(TOPIC_CONTROL.format(serial=""))
+
+REPORT_INTERVAL = 10  # seconds
+
+
+def create_client(client_id: str) -> mqtt_client.Client:
+    """Create a paho client for both the 1.x and the 2.x API."""
+    if hasattr(mqtt_client, "CallbackAPIVersion"):
+        return mqtt_client.Client(mqtt_client.CallbackAPIVersion.VERSION1, client_id)
+    return mqtt_client.Client(client_id)
+
+
+class Stats:
+    """Counters printed while the simulator runs."""
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.frames = 0
+        self.lwt = 0
+        self.commands = 0
+        self.started = time.monotonic()
+
+    def report(self) -> None:
+        """Print the counters and the publish rate."""
+        elapsed = time.monotonic() - self.started
+        print(
+            f"{elapsed:8.0f}s  frames: {self.frames}  ({self.frames / elapsed:.1f}/s)"
+            f"  lwt: {self.lwt}  commands: {self.commands}"
+        )
+
+
+class SimulatedInverter:
+    """One synthetic inverter with its own state, outages and dropouts."""
+
+    def __init__(self, serial: str, index: int, client, stats: Stats, args) -> None:
+        """Initialize the inverter."""
+        self.serial = serial
+        self.client = client
+        self.stats = stats
+        self.args = args
+        self.model = corpus.InverterModel(seed=index, mac=f"a4cf12{index:06x}")
+        self.telemetry_topic = TOPIC_TELEMETRY.format(serial=serial)
+        self.lwt_topic = TOPIC_LWT.format(serial=serial)
+        self.online = False
+        # Stagger the schedules so the fleet does not fail all at once
+        rng = random.Random(index)
+        self.outage_offset = rng.uniform(0, args.outage_every or 1)
+        self.dropout_offset = rng.uniform(0, args.dropout_every or 1)
+
+    def set_online(self, online: bool) -> None:
+        """Publish the retained LWT state if it changed."""
+        if online == self.online:
+            return
+        self.online = online
+        self.client.publish(
+            self.lwt_topic, "online" if online else "offline", qos=1, retain=True
+        )
+        self.stats.lwt += 1
+
+    def publish_frame(self) -> None:
+        """Publish the current state as a telemetry frame."""
+        if self.online:
+            self.client.publish(self.telemetry_topic, self.model.frame(), qos=1)
+            self.stats.frames += 1
+
+    def handle_command(self, payload: str) -> None:
+        """Apply a control command and report the result."""
+        self.stats.commands += 1
+        if payload.strip().lower() != "start":
+            for write in payload.split(","):
+                code, sep, value = write.partition(":")
+                if not sep or code not in self.model.values:
+                    print(f"{self.serial}: ignoring unknown command {write!r}")
+                    continue
+                self.model.values[code] = value
+        # The firmware answers both with a frame shortly after
+        asyncio.get_running_loop().call_later(
+            self.args.ack_delay / self.args.speed, self.publish_frame
+        )
+
+    @staticmethod
+    def _in_window(clock: float, every: float, length: float, offset: float) -> bool:
+        """Return True if clock lies in a periodic window."""
+        return bool(every) and (clock + offset) % every < length
+
+    async def run(self, start_delay: float) -> None:
+        """Publish frames until cancelled."""
+        args = self.args
+        await asyncio.sleep(start_delay)
+        clock = 0.0
+        while True:
+            dropped = self._in_window(
+                clock, args.dropout_every, args.dropout_length, self.dropout_offset
+            )
+            self.set_online(not dropped)
+            on_battery = self._in_window(
+                clock, args.outage_every, args.outage_length, self.outage_offset
+            )
+            self.model.step(args.interval, on_battery)
+            self.publish_frame()
+            clock += args.interval
+            await asyncio.sleep(args.interval / args.speed)
+
+
+async def replay(client, stats: Stats, args) -> None:
+    """Publish the messages of a capture, optionally fanned out to N serials."""
+    messages = list(corpus.read_capture(Path(args.replay)))
+    if not messages:
+        print(f"No messages in {args.replay}")
+        return
+
+    serials: Optional[list[str]] = None
+    if args.inverters:
+        serials = [f"{args.prefix}{index:08d}" for index in range(args.inverters)]
+    print(f"Replaying {len(messages)} messages at {args.speed}x")
+
+    previous: Optional[float] = None
+    for timestamp, topic, payload in messages:
+        if timestamp is None:
+            # Captures made with -v have no timestamps, pace telemetry only
+            delay = args.interval if topic.count("/") == 3 else 0
+        else:
+            delay = timestamp - previous if previous is not None else 0
+            previous = timestamp
+        if delay > 0:
+            await asyncio.sleep(delay / args.speed)
+
+        lwt = topic.count("/") == 4
+        if serials is None:
+            targets = [topic]
+        else:
+            base = TOPIC_LWT if lwt else TOPIC_TELEMETRY
+            targets = [base.format(serial=serial) for serial in serials]
+        for target in targets:
+            client.publish(target, payload, qos=1, retain=lwt)
+            if lwt:
+                stats.lwt += 1
+            else:
+                stats.frames += 1
+
+
+async def report(stats: Stats) -> None:
+    """Print the counters periodically."""
+    while True:
+        await asyncio.sleep(REPORT_INTERVAL)
+        stats.report()
+
+
+async def simulate(args) -> None:
+    """Connect to the broker and run the simulation."""
+    loop = asyncio.get_running_loop()
+    stats = Stats()
+    inverters: dict[str, SimulatedInverter] = {}
+
+    def on_connect(client, userdata, flags, rc):
+        """Subscribe to the control topics once connected."""
+        if rc != 0:
+            print(f"✗ Failed to connect, return code {rc}")
+            return
+        print(f"✓ Connected to MQTT broker at {args.broker}:{args.port}")
+        if inverters:
+            client.subscribe(TOPIC_CONTROL.format(serial="+"), qos=1)
+
+    def on_message(client, userdata, msg):
+        """Hand control commands to the event loop."""
+        inverter = inverters.get(msg.topic[CONTROL_PREFIX_LEN:])
+        if inverter is not None:
+            payload = msg.payload.decode("utf-8", errors="replace")
+            loop.call_soon_threadsafe(inverter.handle_command, payload)
+
+    client = create_client(f"vguard-simulator-{random.getrandbits(32):08x}")
+    client.on_connect = on_connect
+    client.on_message = on_message
+    # Large fleets publish in bursts, do not drop QoS 1 messages
+    client.max_queued_messages_set(0)
+    client.max_inflight_messages_set(1000)
+
+    if not args.replay:
+        for index in range(args.inverters):
+            serial = f"{args.prefix}{index:08d}"
+            inverters[serial] = SimulatedInverter(serial, index, client, stats, args)
+
+    client.connect(args.broker, args.port, 60)
+    client.loop_start()
+
+    tasks = [asyncio.create_task(report(stats))]
+    if args.replay:
+        tasks.append(asyncio.create_task(replay(client, stats, args)))
+    else:
+        print(f"Simulating {len(inverters)} inverters, a frame every {args.interval}s at {args.speed}x")
+        spread = args.interval / args.speed
+        tasks.extend(
+            asyncio.create_task(inverter.run(spread * index / len(inverters)))
+            for index, inverter in enumerate(inverters.values())
+        )
+
+    try:
+        if args.replay:
+            await asyncio.wait_for(tasks[1], args.duration)
+        elif args.duration:
+            await asyncio.sleep(args.duration)
+        else:
+            await asyncio.Event().wait()
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        for inverter in inverters.values():
+            inverter.set_online(False)
+        stats.report()
+        # Let the offline LWT messages go out before disconnecting
+        await asyncio.sleep(1)
+        client.loop_stop()
+        client.disconnect()
+
+
+def main() -> None:
+    """Parse the arguments and run the simulator."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--inverters", type=int, help="number of inverters (default 1, replay: captured serials)")
+    parser.add_argument("--prefix", default="VGSIM", help="serial prefix of the simulated inverters")
+    parser.add_argument("--interval", type=float, default=corpus.FRAME_INTERVAL, help="seconds between frames")
+    parser.add_argument("--speed", type=float, default=1.0, help="run N times faster than real time")
+    parser.add_argument("--outage-every", type=float, default=0, help="seconds between mains outages")
+    parser.add_argument("--outage-length", type=float, default=300)
+    parser.add_argument("--dropout-every", type=float, default=0, help="seconds between WiFi dropouts")
+    parser.add_argument("--dropout-length", type=float, default=60)
+    parser.add_argument("--ack-delay", type=float, default=1.0, help="seconds before answering a command")
+    parser.add_argument("--replay", help="capture to replay instead of simulating")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    args = parser.parse_args()
+    if args.inverters is None and not args.replay:
+        args.inverters = 1
+
+    try:
+        asyncio.run(simulate(args))
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Telemetry cadence control for V-Guard Inverter.
+
+The firmware has no documented command to set its reporting rate, the only
+lever is the start command. The controller re-sends it when telemetry goes
+stale, backing off exponentially while the device stays silent, and expects
+frames much more often while the inverter runs on battery.
+"""
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    CADENCE_MAX_BACKOFF,
+    CADENCE_STALE_ON_BATTERY,
+    CADENCE_STALE_ON_MAINS,
+)
+from .hub import VGuardTelemetryHub
+from .outage import VGuardOutageDetector
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class VGuardCadenceController:
+    """Keep the telemetry of one inverter flowing at a rate fit for its state."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        hub: VGuardTelemetryHub,
+        outage: VGuardOutageDetector,
+        publish_start: Callable[[], Awaitable[None]],
+    ) -> None:
+        """Initialize the controller."""
+        self.hass = hass
+        self._hub = hub
+        self._outage = outage
+        self._publish_start = publish_start
+        self._last_frame = time.monotonic()
+        # Start commands sent since the last frame, drives the backoff
+        self._attempts = 0
+        self.starts_sent = 0
+        self._unsub_check: Optional[CALLBACK_TYPE] = None
+        self._unsubscribes: list[CALLBACK_TYPE] = []
+
+    @property
+    def on_battery(self) -> bool:
+        """Return True while the unit runs on battery."""
+        return self._outage.on_battery
+
+    @property
+    def stale_after(self) -> float:
+        """Return the seconds without a frame after which start is re-sent."""
+        return CADENCE_STALE_ON_BATTERY if self.on_battery else CADENCE_STALE_ON_MAINS
+
+    @callback
+    def async_start(self) -> None:
+        """Start watching the telemetry."""
+        self._unsubscribes = [
+            self._hub.async_add_frame_listener(self._async_frame_received),
+            self._outage.async_add_listener(self._async_power_changed),
+        ]
+        self._schedule_check(self.stale_after)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop watching the telemetry."""
+        if self._unsub_check is not None:
+            self._unsub_check()
+            self._unsub_check = None
+        while self._unsubscribes:
+            self._unsubscribes.pop()()
+
+    @callback
+    def _async_frame_received(self) -> None:
+        """Note the arrival of a frame, no timer is touched per frame."""
+        self._last_frame = time.monotonic()
+        self._attempts = 0
+
+    @callback
+    def _async_power_changed(self, on_battery: bool) -> None:
+        """Switch the cadence when the unit moves between mains and battery."""
+        _LOGGER.debug(
+            "V-Guard Inverter %s runs on %s, expecting a frame every %s seconds",
+            self._hub.serial,
+            "battery" if on_battery else "mains",
+            self.stale_after,
+        )
+        if on_battery:
+            # Ask for fresh telemetry right away, the outage just started
+            self._send_start()
+        self._schedule_check(self.stale_after)
+
+    @callback
+    def _schedule_check(self, delay: float) -> None:
+        """(Re)start the watchdog timer."""
+        if self._unsub_check is not None:
+            self._unsub_check()
+        self._unsub_check = async_call_later(self.hass, delay, self._async_check)
+
+    @callback
+    def _async_check(self, _now=None) -> None:
+        """Re-send start if telemetry is stale, then check again."""
+        self._unsub_check = None
+        stale_after = self.stale_after
+        silence = time.monotonic() - self._last_frame
+        if silence < stale_after:
+            self._schedule_check(stale_after - silence)
+            return
+
+        # Offline devices are asked again when their LWT reports them online
+        if self._hub.available:
+            _LOGGER.debug(
+                "No telemetry from %s for %.0f seconds, sending start",
+                self._hub.serial,
+                silence,
+            )
+            self._send_start()
+        self._schedule_check(min(stale_after * 2 ** self._attempts, CADENCE_MAX_BACKOFF))
+
+    @callback
+    def _send_start(self) -> None:
+        """Publish the start command in the background."""
+        self._attempts += 1
+        self.starts_sent += 1
+        self.hass.async_create_task(self._publish_start())
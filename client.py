@@ -0,0 +1,344 @@
+"""MQTT connections for V-Guard Inverter.
+
+Entries either share Home Assistant's MQTT integration or, in direct mode,
+connect to the broker they were configured with. Direct connections are
+pooled per broker: all entries pointing at the same host and port share
+one paho client with a persistent session.
+"""
+from collections import deque
+from dataclasses import dataclass
+import logging
+from typing import Any, Callable, Optional, Union
+
+import paho.mqtt.client as mqtt_client
+
+from homeassistant.components import mqtt
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import instance_id
+
+from .const import (
+    CONNECTION_DIRECT,
+    CONNECTION_MQTT_INTEGRATION,
+    DATA_MQTT_CLIENTS,
+    DIRECT_KEEPALIVE,
+    DIRECT_RECONNECT_MAX_DELAY,
+    DOMAIN,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HomeAssistantMqttClient:
+    """Traffic through Home Assistant's MQTT integration."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the client."""
+        self.hass = hass
+
+    async def async_subscribe(
+        self,
+        topic: str,
+        msg_callback: Callable[[Any], None],
+        qos: int = 0,
+        encoding: Optional[str] = "utf-8",
+    ) -> CALLBACK_TYPE:
+        """Subscribe to a topic, return the unsubscribe callback."""
+        return await mqtt.async_subscribe(
+            self.hass, topic, msg_callback, qos, encoding=encoding
+        )
+
+    async def async_publish(self, topic: str, payload: str, qos: int = 0) -> None:
+        """Publish a message."""
+        await mqtt.async_publish(self.hass, topic, payload, qos=qos)
+
+    async def async_release(self) -> None:
+        """Release the client, the integration's connection stays up."""
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the connection state for diagnostics."""
+        return {"mode": CONNECTION_MQTT_INTEGRATION}
+
+
+@dataclass(slots=True)
+class DirectMqttMessage:
+    """A received message, shaped like Home Assistant's."""
+
+    topic: str
+    payload: Any
+    qos: int
+    retain: bool
+
+
+class _Subscription:
+    """The callbacks of one topic filter."""
+
+    __slots__ = ("qos", "callbacks")
+
+    def __init__(self, qos: int) -> None:
+        """Initialize the subscription."""
+        self.qos = qos
+        self.callbacks: list[tuple[Callable[[Any], None], Optional[str]]] = []
+
+
+def _create_paho_client(client_id: str) -> mqtt_client.Client:
+    """Create a paho client with a persistent session, for paho 1.x and 2.x."""
+    if hasattr(mqtt_client, "CallbackAPIVersion"):
+        return mqtt_client.Client(
+            mqtt_client.CallbackAPIVersion.VERSION1, client_id, clean_session=False
+        )
+    return mqtt_client.Client(client_id, clean_session=False)
+
+
+class DirectMqttClient:
+    """One connection to a broker, shared by all entries pointing at it.
+
+    paho runs its network loop in a thread. Received messages go into a
+    queue that the event loop drains in batches, so a burst of frames costs
+    one thread hop. Subscriptions made in the same event loop iteration are
+    sent in one SUBSCRIBE packet.
+    """
+
+    def __init__(self, hass: HomeAssistant, host: str, port: int, client_id: str) -> None:
+        """Initialize the client."""
+        self.hass = hass
+        self.host = host
+        self.port = port
+        self.refs = 0
+        self.connected = False
+        self.messages = 0
+        self._client = _create_paho_client(client_id)
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+        self._client.on_message = self._on_message
+        self._client.reconnect_delay_set(max_delay=DIRECT_RECONNECT_MAX_DELAY)
+        # Topic filter -> callbacks, filters with wildcards are also listed
+        self._subscriptions: dict[str, _Subscription] = {}
+        self._wildcards: list[str] = []
+        # Changes not sent to the broker yet
+        self._pending_subscribe: dict[str, int] = {}
+        self._pending_unsubscribe: set[str] = set()
+        self._flush_scheduled = False
+        # Filled by the network thread, drained by the event loop
+        self._received: deque[mqtt_client.MQTTMessage] = deque()
+        self._drain_scheduled = False
+
+    @callback
+    def async_connect(self) -> None:
+        """Connect in the background, reconnecting whenever the link drops."""
+        _LOGGER.info("Connecting to MQTT broker %s:%s", self.host, self.port)
+        self._client.connect_async(self.host, self.port, keepalive=DIRECT_KEEPALIVE)
+        self._client.loop_start()
+
+    async def async_release(self) -> None:
+        """Drop one reference, disconnect when no entry uses the client."""
+        self.refs -= 1
+        if self.refs > 0:
+            return
+        self.hass.data[DATA_MQTT_CLIENTS].pop((self.host, self.port), None)
+        _LOGGER.info("Disconnecting from MQTT broker %s:%s", self.host, self.port)
+        # The unsubscribes of the unloaded entries are still pending, send
+        # them before the DISCONNECT or the persistent session keeps them
+        self._async_flush()
+        # loop_stop joins the network thread
+        await self.hass.async_add_executor_job(self._disconnect)
+
+    def _disconnect(self) -> None:
+        """Disconnect and stop the network thread."""
+        self._client.disconnect()
+        self._client.loop_stop()
+
+    async def async_subscribe(
+        self,
+        topic: str,
+        msg_callback: Callable[[Any], None],
+        qos: int = 0,
+        encoding: Optional[str] = "utf-8",
+    ) -> CALLBACK_TYPE:
+        """Subscribe to a topic, return the unsubscribe callback."""
+        entry = (msg_callback, encoding)
+        if (subscription := self._subscriptions.get(topic)) is None:
+            subscription = self._subscriptions[topic] = _Subscription(qos)
+            if "+" in topic or "#" in topic:
+                self._wildcards.append(topic)
+            self._pending_unsubscribe.discard(topic)
+            self._pending_subscribe[topic] = qos
+            self._schedule_flush()
+        elif qos > subscription.qos:
+            subscription.qos = qos
+            self._pending_subscribe[topic] = qos
+            self._schedule_flush()
+        subscription.callbacks.append(entry)
+
+        @callback
+        def unsubscribe() -> None:
+            """Remove the callback, and the broker subscription with the last one."""
+            subscription.callbacks.remove(entry)
+            if subscription.callbacks or self._subscriptions.get(topic) is not subscription:
+                return
+            del self._subscriptions[topic]
+            if topic in self._wildcards:
+                self._wildcards.remove(topic)
+            self._pending_subscribe.pop(topic, None)
+            self._pending_unsubscribe.add(topic)
+            self._schedule_flush()
+
+        return unsubscribe
+
+    async def async_publish(self, topic: str, payload: str, qos: int = 0) -> None:
+        """Publish a message, paho sends it from its network thread."""
+        info = self._client.publish(topic, payload, qos)
+        if info.rc == mqtt_client.MQTT_ERR_NO_CONN and qos > 0:
+            # paho keeps QoS 1 and 2 messages and sends them once connected
+            _LOGGER.debug("Queued message to %s until %s is connected", topic, self.host)
+            return
+        if info.rc != mqtt_client.MQTT_ERR_SUCCESS:
+            raise HomeAssistantError(
+                f"Cannot publish to {topic}: {mqtt_client.error_string(info.rc)}"
+            )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the connection state for diagnostics."""
+        return {
+            "mode": CONNECTION_DIRECT,
+            "connected": self.connected,
+            "entries": self.refs,
+            "subscriptions": len(self._subscriptions),
+            "messages": self.messages,
+        }
+
+    @callback
+    def _schedule_flush(self) -> None:
+        """Send pending subscription changes once this iteration is done."""
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.hass.loop.call_soon(self._async_flush)
+
+    @callback
+    def _async_flush(self) -> None:
+        """Send all pending subscription changes, one packet each."""
+        self._flush_scheduled = False
+        if not self.connected:
+            # Sent by _async_connected
+            return
+        if self._pending_unsubscribe:
+            self._client.unsubscribe(list(self._pending_unsubscribe))
+            self._pending_unsubscribe.clear()
+        if self._pending_subscribe:
+            self._client.subscribe(list(self._pending_subscribe.items()))
+            _LOGGER.debug(
+                "Subscribed to %s topics on %s", len(self._pending_subscribe), self.host
+            )
+            self._pending_subscribe.clear()
+
+    def _on_connect(self, _client, _userdata, flags, result_code) -> None:
+        """Hand a connection result to the event loop (network thread)."""
+        self.hass.loop.call_soon_threadsafe(
+            self._async_connected, result_code, bool(flags.get("session present"))
+        )
+
+    def _on_disconnect(self, _client, _userdata, result_code) -> None:
+        """Hand a lost connection to the event loop (network thread)."""
+        self.hass.loop.call_soon_threadsafe(self._async_disconnected, result_code)
+
+    def _on_message(self, _client, _userdata, message) -> None:
+        """Queue a received message for the event loop (network thread)."""
+        self._received.append(message)
+        if not self._drain_scheduled:
+            self._drain_scheduled = True
+            self.hass.loop.call_soon_threadsafe(self._async_drain)
+
+    @callback
+    def _async_connected(self, result_code: int, session_present: bool) -> None:
+        """Restore the subscriptions the broker does not remember."""
+        if result_code != mqtt_client.MQTT_ERR_SUCCESS:
+            _LOGGER.error(
+                "Connection to MQTT broker %s:%s refused: %s",
+                self.host,
+                self.port,
+                mqtt_client.connack_string(result_code),
+            )
+            return
+        _LOGGER.info(
+            "Connected to MQTT broker %s:%s (session %s)",
+            self.host,
+            self.port,
+            "resumed" if session_present else "new",
+        )
+        self.connected = True
+        if not session_present:
+            self._pending_subscribe = {
+                topic: subscription.qos
+                for topic, subscription in self._subscriptions.items()
+            }
+        self._async_flush()
+
+    @callback
+    def _async_disconnected(self, result_code: int) -> None:
+        """Note the lost connection, paho reconnects on its own."""
+        self.connected = False
+        if result_code != mqtt_client.MQTT_ERR_SUCCESS:
+            _LOGGER.warning(
+                "Disconnected from MQTT broker %s:%s: %s",
+                self.host,
+                self.port,
+                mqtt_client.error_string(result_code),
+            )
+
+    @callback
+    def _async_drain(self) -> None:
+        """Dispatch all queued messages to their subscriptions."""
+        # Reset first, a message queued while draining schedules another run
+        self._drain_scheduled = False
+        received = self._received
+        subscriptions = self._subscriptions
+        while received:
+            message = received.popleft()
+            self.messages += 1
+            topic = message.topic
+            if (subscription := subscriptions.get(topic)) is not None:
+                self._dispatch(subscription, message)
+            for topic_filter in self._wildcards:
+                if topic_filter != topic and mqtt_client.topic_matches_sub(
+                    topic_filter, topic
+                ):
+                    self._dispatch(subscriptions[topic_filter], message)
+
+    @callback
+    def _dispatch(self, subscription: _Subscription, message) -> None:
+        """Call the callbacks of one subscription with a message."""
+        for msg_callback, encoding in list(subscription.callbacks):
+            payload = message.payload
+            if encoding is not None:
+                try:
+                    payload = payload.decode(encoding)
+                except UnicodeDecodeError:
+                    _LOGGER.warning(
+                        "Cannot decode payload on %s as %s", message.topic, encoding
+                    )
+                    continue
+            try:
+                msg_callback(
+                    DirectMqttMessage(message.topic, payload, message.qos, message.retain)
+                )
+            except Exception as err:
+                _LOGGER.error("Error handling message on %s: %s", message.topic, err)
+
+
+MqttClient = Union[HomeAssistantMqttClient, DirectMqttClient]
+
+
+async def async_get_direct_client(
+    hass: HomeAssistant, host: str, port: int
+) -> DirectMqttClient:
+    """Return the pooled client of a broker, connecting on first use."""
+    # A stable client ID, so the broker keeps the session across restarts
+    client_id = f"{DOMAIN}-{(await instance_id.async_get(hass))[:12]}"
+    clients: dict[tuple[str, int], DirectMqttClient] = hass.data.setdefault(
+        DATA_MQTT_CLIENTS, {}
+    )
+    if (client := clients.get((host, port))) is None:
+        client = clients[(host, port)] = DirectMqttClient(hass, host, port, client_id)
+        client.async_connect()
+    client.refs += 1
+    return client
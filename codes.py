@@ -0,0 +1,181 @@
+"""VG code registry for V-Guard Inverter.
+
+Declares once what each VG code (or computed value) is exposed as. The
+descriptions are frozen and shared by the entities of all inverters, an
+entity only keeps a reference to its description and to its device.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, TypeVar, Union
+
+from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass
+from homeassistant.const import (
+    PERCENTAGE,
+    SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
+    UnitOfElectricCurrent,
+    UnitOfElectricPotential,
+    UnitOfEnergy,
+    UnitOfPower,
+    UnitOfTemperature,
+    UnitOfTime,
+)
+
+from .const import (
+    DERIVED_CHARGE_ENERGY,
+    DERIVED_CHARGE_POWER,
+    DERIVED_DISCHARGE_ENERGY,
+    DERIVED_LOAD_AVERAGE,
+    DERIVED_LOAD_POWER,
+    GROUP_DERIVED,
+    OUTAGE_COUNT,
+    OUTAGE_LAST_DURATION,
+    OUTAGE_TOTAL_DURATION,
+)
+from .decoder import mac_address, on_off, power_mode, system_mode, tenths
+
+
+@dataclass(frozen=True, slots=True)
+class VGuardSensorDescription:
+    """A sensor showing the decoded value of a code."""
+
+    code: str
+    name: str
+    icon: str
+    device_class: Optional[SensorDeviceClass] = None
+    state_class: Optional[SensorStateClass] = None
+    unit: Optional[str] = None
+    suggested_unit: Optional[str] = None
+    precision: Optional[int] = None
+    decoder: Optional[Callable[[Any], Any]] = None
+    # Static device metadata, disabled by default
+    diagnostic: bool = False
+    # Optional entity group, see CONF_ENTITY_GROUPS
+    group: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        """Return the unique ID suffix, sensors are keyed by their code."""
+        return self.code
+
+
+@dataclass(frozen=True, slots=True)
+class VGuardSwitchDescription:
+    """A switch writing one of two values to a code."""
+
+    key: str
+    code: str
+    name: str
+    icon: str
+    on_value: str = "1"
+    off_value: str = "0"
+
+
+@dataclass(frozen=True, slots=True)
+class VGuardNumberDescription:
+    """A number writing an integer within a range to a code."""
+
+    key: str
+    code: str
+    name: str
+    icon: str
+    min_value: float
+    max_value: float
+    step: float
+
+
+@dataclass(frozen=True, slots=True)
+class VGuardSelectDescription:
+    """A select writing the value of the chosen option to a code."""
+
+    key: str
+    code: str
+    name: str
+    icon: str
+    options: tuple[str, ...]
+    values: tuple[str, ...]
+
+
+VGuardDescription = Union[
+    VGuardSensorDescription,
+    VGuardSwitchDescription,
+    VGuardNumberDescription,
+    VGuardSelectDescription,
+]
+_DescriptionT = TypeVar("_DescriptionT", bound=VGuardDescription)
+
+DESCRIPTIONS: tuple[VGuardDescription, ...] = (
+    VGuardSensorDescription("VG011", "Wi-Fi Signal", "mdi:wifi", SensorDeviceClass.SIGNAL_STRENGTH, SensorStateClass.MEASUREMENT, SIGNAL_STRENGTH_DECIBELS_MILLIWATT, precision=0, decoder=float),
+    VGuardSensorDescription("VG012", "Wi-Fi Firmware Version", "mdi:cellphone-wireless", diagnostic=True),
+    VGuardSensorDescription("VG132", "Wi-Fi MAC ID", "mdi:access-point-network", decoder=mac_address, diagnostic=True),
+    VGuardSensorDescription("VG136", "Router SSID", "mdi:router-wireless", diagnostic=True),
+    VGuardSensorDescription("VG304", "Timezone Offset", "mdi:clock-time-four-outline"),
+    VGuardSensorDescription("VG042", "System Uptime", "mdi:timer-outline", SensorDeviceClass.DURATION, None, UnitOfTime.SECONDS, UnitOfTime.HOURS, 1, int),
+    VGuardSensorDescription("VG144", "Temperature", "mdi:thermometer", SensorDeviceClass.TEMPERATURE, SensorStateClass.MEASUREMENT, UnitOfTemperature.CELSIUS, precision=1, decoder=float),
+    VGuardSensorDescription("VG146", "Total Energy", "mdi:lightning-bolt", SensorDeviceClass.ENERGY, SensorStateClass.TOTAL_INCREASING, UnitOfEnergy.WATT_HOUR, UnitOfEnergy.KILO_WATT_HOUR, 2, int),
+    VGuardSensorDescription("VG211", "Energy Usage", "mdi:power-plug", SensorDeviceClass.ENERGY, SensorStateClass.TOTAL_INCREASING, UnitOfEnergy.WATT_HOUR, UnitOfEnergy.KILO_WATT_HOUR, 2, int),
+    VGuardSensorDescription("VG033", "Charging Mode", "mdi:battery-charging"),
+    VGuardSensorDescription("VG095", "Battery Capacity", "mdi:battery"),
+    VGuardSensorDescription("VG003", "Device Status Code", "mdi:information-outline"),
+    VGuardSensorDescription("VG013", "Device Model Parameter", "mdi:tag-outline", diagnostic=True),
+    VGuardSensorDescription("VG109", "Last Update Time", "mdi:clock-outline"),
+    VGuardSensorDescription("VG041", "Power Mode", "mdi:power", decoder=power_mode),
+    VGuardSensorDescription("VG094", "System Mode", "mdi:cog-outline", decoder=system_mode),
+    VGuardSensorDescription("VG014", "Input Voltage", "mdi:flash", SensorDeviceClass.VOLTAGE, SensorStateClass.MEASUREMENT, UnitOfElectricPotential.VOLT, precision=1, decoder=float),
+    VGuardSensorDescription("VG015", "Output Voltage", "mdi:flash-outline", SensorDeviceClass.VOLTAGE, SensorStateClass.MEASUREMENT, UnitOfElectricPotential.VOLT, precision=1, decoder=float),
+    VGuardSensorDescription("VG016", "Battery Voltage", "mdi:battery-outline", SensorDeviceClass.VOLTAGE, SensorStateClass.MEASUREMENT, UnitOfElectricPotential.VOLT, precision=1, decoder=float),
+    VGuardSensorDescription("VG017", "Battery Percentage", "mdi:battery-charging-outline", SensorDeviceClass.BATTERY, SensorStateClass.MEASUREMENT, PERCENTAGE, precision=0, decoder=float),
+    VGuardSensorDescription("VG018", "Charging Current", "mdi:current-ac", SensorDeviceClass.CURRENT, SensorStateClass.MEASUREMENT, UnitOfElectricCurrent.AMPERE, precision=1, decoder=float),
+    VGuardSensorDescription("VG019", "Load Percentage", "mdi:gauge", None, SensorStateClass.MEASUREMENT, PERCENTAGE, precision=0, decoder=float),
+    VGuardSensorDescription("VG020", "Backup Time", "mdi:clock", SensorDeviceClass.DURATION, None, UnitOfTime.MINUTES, UnitOfTime.HOURS, 1, int),
+    VGuardSensorDescription("VG022", "Inverter Status", "mdi:power-socket"),
+    VGuardSensorDescription("VG023", "Battery Status", "mdi:battery-alert"),
+    VGuardSensorDescription("VG024", "Battery Health", "mdi:heart-pulse", None, SensorStateClass.MEASUREMENT, PERCENTAGE, precision=0, decoder=float),
+    VGuardSensorDescription("VG025", "Battery Capacity in Ah", "mdi:battery-high", unit="Ah", precision=1, decoder=tenths),
+    VGuardSensorDescription("VG026", "Total Runtime", "mdi:timer", SensorDeviceClass.DURATION, SensorStateClass.TOTAL_INCREASING, UnitOfTime.SECONDS, UnitOfTime.HOURS, 1, int),
+    VGuardSensorDescription("VG098", "Total Runtime Mirror", "mdi:timer-sand", SensorDeviceClass.DURATION, SensorStateClass.TOTAL_INCREASING, UnitOfTime.SECONDS, UnitOfTime.HOURS, 1, int),
+    VGuardSensorDescription("VG037", "Forced Power Cut Duration", "mdi:timer-off-outline", SensorDeviceClass.DURATION, None, UnitOfTime.MINUTES, precision=0, decoder=int),
+    VGuardSensorDescription("VG038", "Forced Power Cut Status", "mdi:power-off", decoder=on_off),
+    # Derived metrics, computed by derived.py
+    VGuardSensorDescription(DERIVED_CHARGE_POWER, "Charging Power", "mdi:battery-charging", SensorDeviceClass.POWER, SensorStateClass.MEASUREMENT, UnitOfPower.WATT, precision=0, group=GROUP_DERIVED),
+    VGuardSensorDescription(DERIVED_LOAD_POWER, "Load Power", "mdi:home-lightning-bolt-outline", SensorDeviceClass.POWER, SensorStateClass.MEASUREMENT, UnitOfPower.WATT, precision=0, group=GROUP_DERIVED),
+    VGuardSensorDescription(DERIVED_CHARGE_ENERGY, "Battery Charge Energy", "mdi:battery-plus-variant", SensorDeviceClass.ENERGY, SensorStateClass.TOTAL_INCREASING, UnitOfEnergy.WATT_HOUR, UnitOfEnergy.KILO_WATT_HOUR, 2, group=GROUP_DERIVED),
+    VGuardSensorDescription(DERIVED_DISCHARGE_ENERGY, "Battery Discharge Energy", "mdi:battery-minus-variant", SensorDeviceClass.ENERGY, SensorStateClass.TOTAL_INCREASING, UnitOfEnergy.WATT_HOUR, UnitOfEnergy.KILO_WATT_HOUR, 2, group=GROUP_DERIVED),
+    VGuardSensorDescription(DERIVED_LOAD_AVERAGE, "Load Average", "mdi:chart-bell-curve-cumulative", None, SensorStateClass.MEASUREMENT, PERCENTAGE, precision=1, group=GROUP_DERIVED),
+    # Outage counters, kept by outage.py
+    VGuardSensorDescription(OUTAGE_COUNT, "Mains Outages", "mdi:transmission-tower-off", None, SensorStateClass.TOTAL_INCREASING, precision=0),
+    VGuardSensorDescription(OUTAGE_TOTAL_DURATION, "Total Outage Duration", "mdi:timer-alert-outline", SensorDeviceClass.DURATION, SensorStateClass.TOTAL_INCREASING, UnitOfTime.SECONDS, UnitOfTime.HOURS, 1),
+    VGuardSensorDescription(OUTAGE_LAST_DURATION, "Last Outage Duration", "mdi:timer-off-outline", SensorDeviceClass.DURATION, None, UnitOfTime.SECONDS, UnitOfTime.MINUTES, 0),
+    # Controls
+    VGuardSwitchDescription("turbo_charging", "VG099", "Turbo Charging", "mdi:battery-charging-high"),
+    VGuardSwitchDescription("advance_low_battery_alarm", "VG071", "Advance Low Battery Alarm", "mdi:battery-alert"),
+    VGuardSwitchDescription("mains_changeover_buzzer", "VG034", "Mains Changeover Buzzer", "mdi:volume-high", on_value="0", off_value="2"),
+    VGuardSwitchDescription("appliance_mode", "VG036", "Appliance Mode", "mdi:power-standby"),
+    VGuardSwitchDescription("daytime_load_usage", "VG185", "Daytime Load Usage", "mdi:weather-sunny"),
+    VGuardSwitchDescription("battery_type_unlock", "VG105", "Battery Type Unlock", "mdi:lock-open-variant"),
+    VGuardNumberDescription("performance_level", "VG035", "Performance Level", "mdi:speedometer", 1, 5, 1),
+    VGuardNumberDescription("load_alarm_threshold", "VG050", "Load Alarm Threshold", "mdi:alert-circle-outline", 50, 100, 10),
+    VGuardSelectDescription("inverter_mode", "VG021", "Inverter Mode", "mdi:home-lightning-bolt-outline", ("Normal", "UPS", "Equipment"), ("0", "1", "2")),
+)
+
+# Sensor descriptions by code, also used by the config entry migrations
+SENSORS: dict[str, VGuardSensorDescription] = {
+    description.code: description
+    for description in DESCRIPTIONS
+    if isinstance(description, VGuardSensorDescription)
+}
+
+DESCRIPTIONS_BY_CODE: dict[str, tuple[VGuardDescription, ...]] = {}
+for _description in DESCRIPTIONS:
+    DESCRIPTIONS_BY_CODE[_description.code] = (
+        *DESCRIPTIONS_BY_CODE.get(_description.code, ()),
+        _description,
+    )
+del _description
+
+
+def descriptions_for(code: str, kind: type[_DescriptionT]) -> list[_DescriptionT]:
+    """Return the descriptions of one platform for a code."""
+    return [
+        description
+        for description in DESCRIPTIONS_BY_CODE.get(code, ())
+        if isinstance(description, kind)
+    ]
@@ -0,0 +1,188 @@
+"""Outbound command queue for V-Guard Inverter."""
+from functools import partial
+import logging
+import time
+from typing import Optional
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    COMMAND_ACK_TIMEOUT,
+    COMMAND_DEBOUNCE,
+    COMMAND_LATENCY_BUCKETS,
+    COMMAND_MIN_INTERVAL,
+    COMMAND_SEPARATOR,
+)
+from .hub import VGuardTelemetryHub
+from .stats import Histogram
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _PendingCommand:
+    """A write waiting to be confirmed by telemetry."""
+
+    __slots__ = ("value", "cancel_expect", "sent_at", "cancel_timeout")
+
+    def __init__(self, value: str, cancel_expect: CALLBACK_TYPE) -> None:
+        """Initialize the pending command."""
+        self.value = value
+        self.cancel_expect = cancel_expect
+        self.sent_at: Optional[float] = None
+        self.cancel_timeout: Optional[CALLBACK_TYPE] = None
+
+    def cancel(self) -> None:
+        """Stop tracking the command."""
+        self.cancel_expect()
+        if self.cancel_timeout is not None:
+            self.cancel_timeout()
+
+
+class VGuardCommandQueue:
+    """Debounce, coalesce and rate-limit control writes to one device."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        hub: VGuardTelemetryHub,
+        control_topic: str,
+        combine: bool,
+    ) -> None:
+        """Initialize the queue."""
+        self.hass = hass
+        self._hub = hub
+        self._control_topic = control_topic
+        # Send all pending writes in one frame if the firmware accepts it
+        self.combine = combine
+        # VG code -> latest requested value, oldest request first
+        self._pending: dict[str, str] = {}
+        # VG code -> write waiting for telemetry to confirm it
+        self._unconfirmed: dict[str, _PendingCommand] = {}
+        self._last_send = 0.0
+        self._unsub_flush: Optional[CALLBACK_TYPE] = None
+        # Publish-to-confirmation latency in milliseconds
+        self.latency = Histogram(COMMAND_LATENCY_BUCKETS)
+        self.confirmed = 0
+        self.rolled_back = 0
+
+    @callback
+    def async_send(self, vg_code: str, value: str) -> None:
+        """Queue a write, replacing any pending write to the same VG code."""
+        self._pending.pop(vg_code, None)
+        self._pending[vg_code] = value
+        self._track(vg_code, value)
+        self._schedule_flush(COMMAND_DEBOUNCE)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Cancel the pending flush and drop unsent writes."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        if self._pending:
+            _LOGGER.debug("Dropping unsent commands: %s", self._pending)
+            self._pending.clear()
+        for command in self._unconfirmed.values():
+            command.cancel()
+        self._unconfirmed.clear()
+
+    @callback
+    def _track(self, vg_code: str, value: str) -> None:
+        """Hold the optimistic state until telemetry confirms the write."""
+        if (previous := self._unconfirmed.pop(vg_code, None)) is not None:
+            previous.cancel()
+        self._unconfirmed[vg_code] = _PendingCommand(
+            value,
+            self._hub.async_expect(
+                vg_code, value, partial(self._async_confirmed, vg_code)
+            ),
+        )
+
+    @callback
+    def _async_confirmed(self, vg_code: str) -> None:
+        """Record that telemetry reports the written value."""
+        command = self._unconfirmed.pop(vg_code, None)
+        if command is None:
+            return
+        if command.cancel_timeout is not None:
+            command.cancel_timeout()
+        self.confirmed += 1
+        if command.sent_at is not None:
+            latency = (time.monotonic() - command.sent_at) * 1000
+            self.latency.record(latency)
+            _LOGGER.debug("%s:%s confirmed after %.0f ms", vg_code, command.value, latency)
+
+    @callback
+    def _async_timeout(self, vg_code: str, command: _PendingCommand, _now=None) -> None:
+        """Roll back a write the device did not apply in time."""
+        if self._unconfirmed.get(vg_code) is not command:
+            return
+        command.cancel_timeout = None
+        _LOGGER.warning(
+            "%s:%s was not confirmed within %s seconds, rolling back",
+            vg_code,
+            command.value,
+            COMMAND_ACK_TIMEOUT,
+        )
+        self._rollback(vg_code)
+
+    @callback
+    def _rollback(self, vg_code: str) -> None:
+        """Restore the last confirmed state of a VG code."""
+        command = self._unconfirmed.pop(vg_code, None)
+        if command is None:
+            return
+        command.cancel()
+        self.rolled_back += 1
+        if not self._hub.async_redispatch(vg_code):
+            _LOGGER.debug("No confirmed state known for %s", vg_code)
+
+    @callback
+    def _schedule_flush(self, delay: float) -> None:
+        """(Re)start the flush timer, never sending faster than allowed."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+        delay = max(delay, self._last_send + COMMAND_MIN_INTERVAL - time.monotonic())
+        self._unsub_flush = async_call_later(self.hass, delay, self._async_flush)
+
+    async def _async_flush(self, _now=None) -> None:
+        """Publish the next frame of pending writes."""
+        self._unsub_flush = None
+        if not self._pending:
+            return
+
+        if self.combine:
+            writes = list(self._pending.items())
+            self._pending.clear()
+        else:
+            vg_code = next(iter(self._pending))
+            writes = [(vg_code, self._pending.pop(vg_code))]
+
+        payload = COMMAND_SEPARATOR.join(f"{code}:{value}" for code, value in writes)
+        # A newer write may replace these while publishing, it is sent later
+        commands = [(code, self._unconfirmed.get(code)) for code, _value in writes]
+        sent_at = self._last_send = time.monotonic()
+        try:
+            await self._hub.mqtt_client.async_publish(self._control_topic, payload, qos=1)
+        except Exception as err:
+            _LOGGER.error("Failed to publish command '%s': %s", payload, err)
+            for code, command in commands:
+                if command is not None and self._unconfirmed.get(code) is command:
+                    self._rollback(code)
+        else:
+            _LOGGER.debug("Published command '%s'", payload)
+            for code, command in commands:
+                if command is None or self._unconfirmed.get(code) is not command:
+                    continue
+                command.sent_at = sent_at
+                if command.cancel_timeout is not None:
+                    command.cancel_timeout()
+                command.cancel_timeout = async_call_later(
+                    self.hass,
+                    COMMAND_ACK_TIMEOUT,
+                    partial(self._async_timeout, code, command),
+                )
+
+        if self._pending:
+            self._schedule_flush(0)
@@ -1,6 +1,5 @@
 """Config flow for V-Guard Inverter integration."""
 import asyncio
-import json
 import logging
 import voluptuous as vol
 
@@ -9,32 +8,161 @@ from homeassistant.components import mqtt
 from homeassistant.const import CONF_HOST, CONF_PORT, CONF_TOKEN
 from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
-
-from .const import DOMAIN
+from homeassistant.helpers.service_info.mqtt import MqttServiceInfo
+
+from .const import (
+    CONF_AGGREGATE_WINDOW,
+    CONF_COMBINE_COMMANDS,
+    CONF_CONNECTION,
+    CONF_ENTITY_GROUPS,
+    CONF_EXPOSE_UNKNOWN_CODES,
+    CONF_HEARTBEAT_INTERVAL,
+    CONF_EXPORT,
+    CONF_EXPORT_RETENTION,
+    CONF_HISTORY_HOURS,
+    CONF_MODE,
+    CONF_PROFILE,
+    CONF_RATED_POWER,
+    CONF_SUPPRESS_UNCHANGED,
+    CONF_TELEMETRY_QOS,
+    CONNECTION_DIRECT,
+    CONNECTION_MQTT_INTEGRATION,
+    DATA_DISCOVERED_SERIALS,
+    DEFAULT_COMBINE_COMMANDS,
+    DEFAULT_CONNECTION,
+    DEFAULT_EXPOSE_UNKNOWN_CODES,
+    DEFAULT_EXPORT,
+    DEFAULT_EXPORT_RETENTION,
+    DEFAULT_HISTORY_HOURS,
+    DEFAULT_PROFILE,
+    DEFAULT_RATED_POWER,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    DOMAIN,
+    FLEET_UNIQUE_ID,
+    GROUP_DERIVED,
+    GROUP_DIAGNOSTICS,
+    MODE_FLEET,
+    PROFILE_BALANCED,
+    PROFILE_CUSTOM,
+    PROFILE_FULL_FIDELITY,
+    PROFILE_LOW_POWER,
+    PROFILES,
+    TOPIC_LWT,
+    TOPIC_TELEMETRY,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 DISCOVERY_TIMEOUT = 30  # seconds
+DISCOVERY_QUIET_PERIOD = 3  # seconds without a new device before stopping
+DISCOVERY_LWT_GRACE = 3  # seconds to wait for LWT messages before reading telemetry
+
+PROFILE_OPTIONS = {
+    PROFILE_LOW_POWER: "Low power (Raspberry Pi)",
+    PROFILE_BALANCED: "Balanced",
+    PROFILE_FULL_FIDELITY: "Full fidelity",
+    PROFILE_CUSTOM: "Custom",
+}
+CONNECTION_OPTIONS = {
+    CONNECTION_MQTT_INTEGRATION: "Home Assistant MQTT integration",
+    CONNECTION_DIRECT: "Direct connection to the configured broker",
+}
+QOS_OPTIONS = {
+    0: "0 - at most once",
+    1: "1 - at least once",
+}
+ENTITY_GROUP_OPTIONS = {
+    GROUP_DERIVED: "Derived metrics (power, energy, load average)",
+    GROUP_DIAGNOSTICS: "Telemetry diagnostics (frames, errors, processing time)",
+}
 
 
 class VGuardInverterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for V-Guard Inverter."""
 
-    VERSION = 1
+    VERSION = 3
 
     def __init__(self):
         """Initialize the config flow."""
         self.discovered_devices = {}
+        self._discovered_serial = None
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return VGuardInverterOptionsFlow(config_entry)
 
     async def async_step_user(self, user_input=None):
         """Handle the initial step - show menu."""
         return self.async_show_menu(
             step_id="user",
-            menu_options=["mqtt_discovery", "manual"],
+            menu_options=["mqtt_discovery", "manual", "fleet"],
+        )
+
+    async def async_step_mqtt(self, discovery_info: MqttServiceInfo):
+        """Handle an inverter announced on its LWT topic."""
+        serial = discovery_info.topic.rpartition("/")[2]
+        if len(serial) <= 5:
+            return self.async_abort(reason="invalid_discovery_info")
+
+        # A fleet entry already picks up every inverter on the broker, so
+        # Home Assistant may drop the LWT subscription for good
+        if self._fleet_configured():
+            return self.async_abort(reason="already_configured")
+
+        # Not "already_configured": that reason would stop the discovery of
+        # the other inverters on the broker as well
+        if serial in self._async_current_ids():
+            return self.async_abort(reason="device_configured")
+
+        # LWT messages repeat, only start one flow per serial
+        seen = self.hass.data.setdefault(DATA_DISCOVERED_SERIALS, set())
+        if serial in seen:
+            return self.async_abort(reason="already_in_progress")
+        seen.add(serial)
+
+        await self.async_set_unique_id(serial)
+
+        _LOGGER.info("✓ Discovered V-Guard inverter: %s", serial)
+        self._discovered_serial = serial
+        self.context["title_placeholders"] = {"serial": serial[-6:]}
+        return await self.async_step_mqtt_confirm()
+
+    def _fleet_configured(self) -> bool:
+        """Return True if a fleet entry handles every inverter on the broker."""
+        return any(
+            entry.data.get(CONF_MODE) == MODE_FLEET
+            for entry in self._async_current_entries()
+        )
+
+    async def async_step_mqtt_confirm(self, user_input=None):
+        """Confirm adding a discovered inverter."""
+        serial = self._discovered_serial
+        if user_input is not None:
+            return self.async_create_entry(
+                title=f"V-Guard Inverter {serial[-6:]}",
+                data={
+                    CONF_HOST: DEFAULT_HOST,
+                    CONF_PORT: DEFAULT_PORT,
+                    CONF_TOKEN: serial,
+                },
+            )
+
+        self._set_confirm_only()
+        return self.async_show_form(
+            step_id="mqtt_confirm",
+            description_placeholders={"serial": serial},
         )
 
     async def async_step_mqtt_discovery(self, user_input=None):
         """Handle MQTT discovery step."""
+        # The fleet ignores the inverters configured when it was set up, a
+        # second entry added later would report the same inverter twice
+        if self._fleet_configured():
+            return self.async_abort(reason="fleet_configured")
+
         if user_input is not None:
             # User selected a device
             selected_device = user_input["device"]
@@ -86,6 +214,9 @@ class VGuardInverterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_manual(self, user_input=None):
         """Handle manual configuration step."""
+        if self._fleet_configured():
+            return self.async_abort(reason="fleet_configured")
+
         errors = {}
 
         if user_input is not None:
@@ -103,8 +234,8 @@ class VGuardInverterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         # Show the manual configuration form
         data_schema = vol.Schema(
             {
-                vol.Required(CONF_HOST, default="192.168.0.4"): cv.string,
-                vol.Required(CONF_PORT, default=1883): cv.port,
+                vol.Required(CONF_HOST, default=DEFAULT_HOST): cv.string,
+                vol.Required(CONF_PORT, default=DEFAULT_PORT): cv.port,
                 vol.Required(CONF_TOKEN): cv.string,
             }
         )
@@ -115,87 +246,208 @@ class VGuardInverterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def async_step_fleet(self, user_input=None):
+        """Handle setting up all inverters on a broker as one fleet."""
+        await self.async_set_unique_id(FLEET_UNIQUE_ID)
+        self._abort_if_unique_id_configured()
+
+        if user_input is not None:
+            return self.async_create_entry(
+                title="V-Guard Inverter Fleet",
+                data={CONF_MODE: MODE_FLEET, **user_input},
+            )
+
+        data_schema = vol.Schema(
+            {
+                vol.Required(CONF_HOST, default=DEFAULT_HOST): cv.string,
+                vol.Required(CONF_PORT, default=DEFAULT_PORT): cv.port,
+            }
+        )
+
+        return self.async_show_form(step_id="fleet", data_schema=data_schema)
+
     async def _discover_devices(self):
         """Discover V-Guard inverters via MQTT."""
         discovered = {}
-        discovery_topic = "device/dups/CE01/#"  # Changed from + to # to catch all subtopics
+        new_device = asyncio.Event()
+        # LWT messages are small and usually retained. Telemetry topics carry
+        # full payloads from every inverter, so they are only subscribed to
+        # if no LWT message arrives in time; payloads are never decoded.
+        lwt_topic = TOPIC_LWT.format(serial="+")
+        telemetry_topic = TOPIC_TELEMETRY.format(serial="+")
 
-        _LOGGER.info("Starting MQTT discovery on topic: %s", discovery_topic)
+        _LOGGER.info("Starting MQTT discovery on topic: %s", lwt_topic)
 
         @callback
         def message_received(msg):
             """Handle received MQTT message."""
-            try:
-                _LOGGER.debug("Received discovery message on topic: %s", msg.topic)
-
-                # Extract serial from topic: device/dups/CE01/{serial} or device/dups/CE01/lwt/{serial}
-                topic_parts = msg.topic.split("/")
-
-                # Handle both telemetry and LWT topics
-                if "lwt" in topic_parts:
-                    # LWT topic: device/dups/CE01/lwt/{serial}
-                    if len(topic_parts) >= 5:
-                        serial = topic_parts[4]
-                        _LOGGER.debug("Found serial from LWT topic: %s", serial)
-                elif len(topic_parts) >= 4:
-                    # Telemetry topic: device/dups/CE01/{serial}
-                    serial = topic_parts[3]
-                    _LOGGER.debug("Found serial from telemetry topic: %s", serial)
-                else:
-                    _LOGGER.debug("Topic format not recognized: %s", msg.topic)
-                    return
-
-                # Don't add duplicates and validate serial number
-                if serial and serial not in discovered and len(serial) > 5:
-                    discovered[serial] = {
-                        CONF_HOST: "192.168.0.4",  # User will need to update if different
-                        CONF_PORT: 1883,
-                        CONF_TOKEN: serial,
-                    }
-                    _LOGGER.info("✓ Discovered V-Guard inverter: %s", serial)
+            # device/dups/CE01/{serial} or device/dups/CE01/lwt/{serial}
+            serial = msg.topic.rpartition("/")[2]
 
-            except Exception as err:
-                _LOGGER.error("Error processing discovery message: %s", err, exc_info=True)
+            # Don't add duplicates and validate serial number
+            if serial in discovered or len(serial) <= 5:
+                return
 
-        try:
-            # Check if MQTT is available
-            if "mqtt" not in self.hass.data:
-                _LOGGER.error("MQTT integration is not set up in Home Assistant")
-                _LOGGER.error("Please configure the MQTT integration first")
-                return {}
+            discovered[serial] = {
+                CONF_HOST: DEFAULT_HOST,  # User will need to update if different
+                CONF_PORT: DEFAULT_PORT,
+                CONF_TOKEN: serial,
+            }
+            _LOGGER.info("✓ Discovered V-Guard inverter: %s", serial)
+            new_device.set()
 
-            _LOGGER.info("MQTT integration found in Home Assistant")
+        # Check if MQTT is available
+        if "mqtt" not in self.hass.data:
+            _LOGGER.error("MQTT integration is not set up in Home Assistant")
+            _LOGGER.error("Please configure the MQTT integration first")
+            return {}
 
-            # Subscribe to discovery topic
-            _LOGGER.info("Subscribing to MQTT topic: %s", discovery_topic)
-            try:
-                unsubscribe = await mqtt.async_subscribe(
-                    self.hass, discovery_topic, message_received, 1
+        unsubscribes = []
+        try:
+            unsubscribes.append(
+                await mqtt.async_subscribe(
+                    self.hass, lwt_topic, message_received, 0, encoding=None
                 )
-                _LOGGER.info("Successfully subscribed to MQTT topic")
-            except Exception as sub_err:
-                _LOGGER.error("Failed to subscribe to MQTT: %s", sub_err, exc_info=True)
-                return {}
-
-            # Wait for discovery timeout with progress logging
-            _LOGGER.info("Listening for devices (30 seconds)...")
-            for i in range(6):
-                await asyncio.sleep(5)
-                _LOGGER.debug("Discovery progress: %d/%d seconds, found %d device(s)",
-                            (i+1)*5, DISCOVERY_TIMEOUT, len(discovered))
-
-            # Unsubscribe
-            unsubscribe()
-
-            self.discovered_devices = discovered
-            _LOGGER.info("Discovery complete. Found %d device(s): %s",
-                        len(discovered), list(discovered.keys()))
-            return discovered
+            )
+
+            # Stop once no new device has shown up for the quiet period
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + DISCOVERY_TIMEOUT
+            fallback_at = loop.time() + DISCOVERY_LWT_GRACE
+            while (remaining := deadline - loop.time()) > 0:
+                new_device.clear()
+                if discovered:
+                    wait = min(DISCOVERY_QUIET_PERIOD, remaining)
+                elif fallback_at is not None:
+                    wait = max(min(fallback_at - loop.time(), remaining), 0)
+                else:
+                    wait = remaining
+                try:
+                    await asyncio.wait_for(new_device.wait(), wait)
+                except asyncio.TimeoutError:
+                    if discovered:
+                        break
+                    if fallback_at is not None:
+                        fallback_at = None
+                        _LOGGER.info(
+                            "No LWT messages, listening on topic: %s", telemetry_topic
+                        )
+                        unsubscribes.append(
+                            await mqtt.async_subscribe(
+                                self.hass,
+                                telemetry_topic,
+                                message_received,
+                                0,
+                                encoding=None,
+                            )
+                        )
 
         except Exception as err:
             _LOGGER.error("Discovery failed: %s", err, exc_info=True)
             return {}
 
+        finally:
+            for unsubscribe in unsubscribes:
+                unsubscribe()
+
+        self.discovered_devices = discovered
+        _LOGGER.info("Discovery complete. Found %d device(s): %s",
+                    len(discovered), list(discovered.keys()))
+        return discovered
+
     async def async_step_import(self, import_data):
         """Handle import from configuration.yaml."""
         return await self.async_step_manual(import_data)
+
+
+class VGuardInverterOptionsFlow(config_entries.OptionsFlow):
+    """Handle V-Guard Inverter options."""
+
+    def __init__(self, config_entry):
+        """Initialize the options flow."""
+        self._entry = config_entry
+        self._options = dict(config_entry.options)
+
+    async def async_step_init(self, user_input=None):
+        """Pick a performance profile and set the per-site options."""
+        if user_input is not None:
+            self._options.update(user_input)
+            profile = user_input[CONF_PROFILE]
+            if profile == PROFILE_CUSTOM:
+                return await self.async_step_custom()
+            # A profile sets all of its options at once
+            self._options.update(PROFILES[profile])
+            return self.async_create_entry(title="", data=self._options)
+
+        options = self._entry.options
+        # Entries tuned before profiles existed keep their values as custom
+        profile = options.get(
+            CONF_PROFILE,
+            PROFILE_CUSTOM if CONF_HEARTBEAT_INTERVAL in options else DEFAULT_PROFILE,
+        )
+        data_schema = vol.Schema(
+            {
+                vol.Required(CONF_PROFILE, default=profile): vol.In(PROFILE_OPTIONS),
+                vol.Required(
+                    CONF_CONNECTION,
+                    default=options.get(CONF_CONNECTION, DEFAULT_CONNECTION),
+                ): vol.In(CONNECTION_OPTIONS),
+                vol.Required(
+                    CONF_COMBINE_COMMANDS,
+                    default=options.get(CONF_COMBINE_COMMANDS, DEFAULT_COMBINE_COMMANDS),
+                ): cv.boolean,
+                vol.Required(
+                    CONF_EXPOSE_UNKNOWN_CODES,
+                    default=options.get(
+                        CONF_EXPOSE_UNKNOWN_CODES, DEFAULT_EXPOSE_UNKNOWN_CODES
+                    ),
+                ): cv.boolean,
+                vol.Required(
+                    CONF_RATED_POWER,
+                    default=options.get(CONF_RATED_POWER, DEFAULT_RATED_POWER),
+                ): vol.All(vol.Coerce(int), vol.Range(min=100, max=10000)),
+                vol.Required(
+                    CONF_HISTORY_HOURS,
+                    default=options.get(CONF_HISTORY_HOURS, DEFAULT_HISTORY_HOURS),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=48)),
+                vol.Required(
+                    CONF_EXPORT, default=options.get(CONF_EXPORT, DEFAULT_EXPORT)
+                ): cv.boolean,
+                vol.Required(
+                    CONF_EXPORT_RETENTION,
+                    default=options.get(CONF_EXPORT_RETENTION, DEFAULT_EXPORT_RETENTION),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=365)),
+            }
+        )
+
+        return self.async_show_form(step_id="init", data_schema=data_schema)
+
+    async def async_step_custom(self, user_input=None):
+        """Set the options of the custom profile one by one."""
+        if user_input is not None:
+            self._options.update(user_input)
+            return self.async_create_entry(title="", data=self._options)
+
+        # Start from the current values, or the balanced profile's
+        defaults = {**PROFILES[DEFAULT_PROFILE], **self._entry.options}
+        data_schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_TELEMETRY_QOS, default=defaults[CONF_TELEMETRY_QOS]
+                ): vol.In(QOS_OPTIONS),
+                vol.Required(
+                    CONF_SUPPRESS_UNCHANGED, default=defaults[CONF_SUPPRESS_UNCHANGED]
+                ): cv.boolean,
+                vol.Required(
+                    CONF_HEARTBEAT_INTERVAL, default=defaults[CONF_HEARTBEAT_INTERVAL]
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=1440)),
+                vol.Required(
+                    CONF_AGGREGATE_WINDOW, default=defaults[CONF_AGGREGATE_WINDOW]
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                vol.Required(
+                    CONF_ENTITY_GROUPS, default=list(defaults[CONF_ENTITY_GROUPS])
+                ): cv.multi_select(ENTITY_GROUP_OPTIONS),
+            }
+        )
+
+        return self.async_show_form(step_id="custom", data_schema=data_schema)
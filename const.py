@@ -2,23 +2,168 @@
 
 DOMAIN = "vguard_inverter"
 
+# hass.data key for serials already seen by background MQTT discovery
+DATA_DISCOVERED_SERIALS = f"{DOMAIN}_discovered_serials"
+
+# hass.data key for the storage of each entry, kept after unloading so a
+# removed entry deletes its file through the Store that last wrote it
+DATA_STORAGE = f"{DOMAIN}_storage"
+
+# Dispatcher signal sent when an entry gains an inverter
+SIGNAL_NEW_DEVICE = f"{DOMAIN}_new_device_{{entry_id}}"
+
 # Device information
 MANUFACTURER = "V-Guard"
 MODEL = "Smart Inverter"
 
 # Configuration keys
 CONF_SERIAL = "serial"
+CONF_MODE = "mode"
+
+# Entry modes: one inverter per entry, or all inverters on the broker
+MODE_DEVICE = "device"
+MODE_FLEET = "fleet"
+FLEET_UNIQUE_ID = "fleet"
+
+# Option keys
+CONF_HEARTBEAT_INTERVAL = "heartbeat_interval"
+CONF_COMBINE_COMMANDS = "combine_commands"
+CONF_EXPOSE_UNKNOWN_CODES = "expose_unknown_codes"
+CONF_RATED_POWER = "rated_power"
+CONF_AGGREGATE_WINDOW = "aggregate_window"
+CONF_PROFILE = "profile"
+CONF_TELEMETRY_QOS = "telemetry_qos"
+CONF_SUPPRESS_UNCHANGED = "suppress_unchanged"
+CONF_ENTITY_GROUPS = "entity_groups"
+CONF_CONNECTION = "connection"
+CONF_HISTORY_HOURS = "history_hours"
+CONF_EXPORT = "export"
+CONF_EXPORT_RETENTION = "export_retention"
 
 # Default values
 DEFAULT_NAME = "V-Guard Inverter"
+DEFAULT_HOST = "192.168.0.4"
+DEFAULT_PORT = 1883
+DEFAULT_HEARTBEAT_INTERVAL = 10  # minutes
+DEFAULT_COMBINE_COMMANDS = False
+DEFAULT_EXPOSE_UNKNOWN_CODES = False
+DEFAULT_RATED_POWER = 900  # W at 100 % load (VG019)
+DEFAULT_AGGREGATE_WINDOW = 0  # seconds, 0 writes every changed value
+DEFAULT_TELEMETRY_QOS = 1
+DEFAULT_SUPPRESS_UNCHANGED = True
+DEFAULT_HISTORY_HOURS = 6  # 0 keeps no in-memory history
+DEFAULT_EXPORT = False
+DEFAULT_EXPORT_RETENTION = 7  # days
+
+# MQTT connection: Home Assistant's MQTT integration, or a direct
+# connection to the configured broker shared by all entries using it
+CONNECTION_MQTT_INTEGRATION = "mqtt_integration"
+CONNECTION_DIRECT = "direct"
+DEFAULT_CONNECTION = CONNECTION_MQTT_INTEGRATION
+DATA_MQTT_CLIENTS = f"{DOMAIN}_mqtt_clients"
+DIRECT_KEEPALIVE = 60  # seconds
+DIRECT_RECONNECT_MAX_DELAY = 120  # seconds
+
+# Optional entity groups: derived metrics (also computed only when enabled)
+# and the telemetry counters of each hub
+GROUP_DERIVED = "derived"
+GROUP_DIAGNOSTICS = "diagnostics"
+DEFAULT_ENTITY_GROUPS = [GROUP_DERIVED]
+
+# Performance profiles, each sets the options that trade load for fidelity
+PROFILE_LOW_POWER = "low_power"
+PROFILE_BALANCED = "balanced"
+PROFILE_FULL_FIDELITY = "full_fidelity"
+PROFILE_CUSTOM = "custom"
+DEFAULT_PROFILE = PROFILE_BALANCED
+PROFILES = {
+    PROFILE_LOW_POWER: {
+        CONF_TELEMETRY_QOS: 0,
+        CONF_SUPPRESS_UNCHANGED: True,
+        CONF_AGGREGATE_WINDOW: 60,
+        CONF_HEARTBEAT_INTERVAL: 60,
+        CONF_ENTITY_GROUPS: [],
+    },
+    PROFILE_BALANCED: {
+        CONF_TELEMETRY_QOS: DEFAULT_TELEMETRY_QOS,
+        CONF_SUPPRESS_UNCHANGED: DEFAULT_SUPPRESS_UNCHANGED,
+        CONF_AGGREGATE_WINDOW: DEFAULT_AGGREGATE_WINDOW,
+        CONF_HEARTBEAT_INTERVAL: DEFAULT_HEARTBEAT_INTERVAL,
+        CONF_ENTITY_GROUPS: DEFAULT_ENTITY_GROUPS,
+    },
+    PROFILE_FULL_FIDELITY: {
+        CONF_TELEMETRY_QOS: 1,
+        CONF_SUPPRESS_UNCHANGED: False,
+        CONF_AGGREGATE_WINDOW: 0,
+        CONF_HEARTBEAT_INTERVAL: DEFAULT_HEARTBEAT_INTERVAL,
+        CONF_ENTITY_GROUPS: [GROUP_DERIVED, GROUP_DIAGNOSTICS],
+    },
+}
+
+# Persistent storage of the VG codes (and serials) seen per entry and of
+# the last telemetry snapshot of each inverter
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.{{entry_id}}"
+STORAGE_SAVE_DELAY = 30  # seconds
+SNAPSHOT_SAVE_DELAY = 300  # seconds, limits writes while telemetry streams
 
 # MQTT topic patterns
 TOPIC_TELEMETRY = "device/dups/CE01/{serial}"
 TOPIC_CONTROL = "apps/dups/CE01/{serial}"
 TOPIC_LWT = "device/dups/CE01/lwt/{serial}"
 
+# LWT payloads
+LWT_ONLINE = "online"
+LWT_OFFLINE = "offline"
+
+# Commands
+COMMAND_START = "start"  # asks the device to start sending telemetry
+
+# Control commands
+COMMAND_DEBOUNCE = 0.5  # seconds to wait for further writes before sending
+COMMAND_MIN_INTERVAL = 1.0  # seconds between frames sent to one device
+COMMAND_SEPARATOR = ","  # joins several VGxxx:value writes in one frame
+COMMAND_ACK_TIMEOUT = 30  # seconds for telemetry to confirm a write
+COMMAND_LATENCY_BUCKETS = (250, 500, 1000, 2000, 5000, 10000, 20000, 30000)  # ms
+
+# Telemetry cadence: seconds without a frame before start is sent again
+CADENCE_STALE_ON_MAINS = 300
+CADENCE_STALE_ON_BATTERY = 20
+CADENCE_MAX_BACKOFF = 3600
+MAINS_MIN_VOLTAGE = 100  # V, below this on VG014 the unit runs on battery
+
+# Derived metrics, dispatched by the hub like VG codes
+DERIVED_CHARGE_POWER = "charge_power"
+DERIVED_LOAD_POWER = "load_power"
+DERIVED_CHARGE_ENERGY = "battery_charge_energy"
+DERIVED_DISCHARGE_ENERGY = "battery_discharge_energy"
+DERIVED_LOAD_AVERAGE = "load_average"
+OUTAGE_COUNT = "outage_count"
+OUTAGE_TOTAL_DURATION = "outage_duration_total"
+OUTAGE_LAST_DURATION = "outage_duration_last"
+DERIVED_LOAD_EWMA_TAU = 300  # seconds, time constant of the load average
+DERIVED_MAX_GAP = 600  # seconds, longer gaps between frames are not integrated
+
+# Windowed aggregation of fast-moving numeric codes
+AGGREGATED_CODES = ("VG011", "VG014", "VG015", "VG016", "VG017", "VG018", "VG019", "VG144")
+
+# Events fired by the outage detector
+EVENT_OUTAGE_STARTED = f"{DOMAIN}_outage_started"
+EVENT_OUTAGE_ENDED = f"{DOMAIN}_outage_ended"
+
+# Runtime diagnostics
+TELEMETRY_TIME_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)  # µs per frame
+
 # Entity types
 ENTITY_SENSOR = "sensor"
 ENTITY_SWITCH = "switch"
 ENTITY_SELECT = "select"
 ENTITY_NUMBER = "number"
+
+# In-memory history for the websocket API: at most one row per resolution
+HISTORY_RESOLUTION = 10  # seconds
+
+# Telemetry export: rows are collected in memory and written once a flush
+# interval to hourly files under <config>/vguard_inverter/export/<serial>
+EXPORT_DIRECTORY = "export"
+EXPORT_FLUSH_INTERVAL = 60  # seconds
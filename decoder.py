@@ -0,0 +1,105 @@
+"""Telemetry decoding for V-Guard Inverter.
+
+Kept free of Home Assistant imports so it can be benchmarked on its own.
+"""
+import json
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, itself a ValueError
+loads: Callable[[Any], Any] = orjson.loads if orjson is not None else json.loads
+
+# Distinct raw values remembered per VG code before the memo is reset
+MEMO_SIZE = 256
+
+
+def decode_frame(raw: Any) -> Optional[dict]:
+    """Parse a telemetry payload (bytes or str) into a dict of VG codes.
+
+    Raises ValueError if the payload is not valid JSON and returns None if
+    it is not a JSON object.
+    """
+    payload = loads(raw)
+    if not isinstance(payload, dict):
+        return None
+
+    # Unwrap nested data if needed
+    if len(payload) == 1:
+        inner = next(iter(payload.values()))
+        if isinstance(inner, dict):
+            return inner
+    return payload
+
+
+def as_float(value: Any) -> Optional[float]:
+    """Return a reported value as float, or None if it is not a number."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def mac_address(value: str) -> str:
+    """Format a bare MAC address with colons."""
+    return ":".join(value[i:i + 2] for i in range(0, len(value), 2)) if value else value
+
+
+def tenths(value: Any) -> float:
+    """Decode an integer reported in tenths."""
+    return int(value) / 10
+
+
+def power_mode(value: Any) -> str:
+    """Decode VG041."""
+    return "normal mode" if value == "0" else "unknown"
+
+
+def system_mode(value: Any) -> str:
+    """Decode VG094."""
+    return "normal operation" if value == "1" else "unknown"
+
+
+def on_off(value: Any) -> str:
+    """Decode a 1/0 flag."""
+    return "ON" if value == "1" else "OFF"
+
+
+class ValueDecoder:
+    """Apply per-code decoders, memoizing results per (code, raw value)."""
+
+    def __init__(self, decoders: dict[str, Optional[Callable[[Any], Any]]]) -> None:
+        """Initialize the decoder with a decoder function per VG code."""
+        self._decoders = {code: fn for code, fn in decoders.items() if fn is not None}
+        self._memos: dict[str, dict[Any, Any]] = {code: {} for code in self._decoders}
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, code: str, raw: Any) -> Any:
+        """Return the decoded value; errors of the decoder propagate."""
+        memo = self._memos.get(code)
+        if memo is None:
+            # No decoder, the raw value is used as is
+            return raw
+        try:
+            value = memo[raw]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable raw values (lists, dicts) are not memoized
+            return self._decoders[code](raw)
+        else:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = self._decoders[code](raw)
+        if len(memo) >= MEMO_SIZE:
+            memo.clear()
+        memo[raw] = value
+        return value
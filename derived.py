@@ -0,0 +1,114 @@
+"""Derived metrics for V-Guard Inverter.
+
+Computed once per frame in constant time from the values the hub already
+holds, and dispatched through the hub under their own codes so sensors
+subscribe to them like to any VG code.
+"""
+import logging
+import math
+import time
+from typing import Optional
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+from .const import (
+    DERIVED_CHARGE_ENERGY,
+    DERIVED_CHARGE_POWER,
+    DERIVED_DISCHARGE_ENERGY,
+    DERIVED_LOAD_AVERAGE,
+    DERIVED_LOAD_EWMA_TAU,
+    DERIVED_LOAD_POWER,
+    DERIVED_MAX_GAP,
+)
+from .decoder import as_float
+from .hub import VGuardTelemetryHub
+from .outage import VGuardOutageDetector
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class VGuardDerivedMetrics:
+    """Power, battery energy and load average of one inverter."""
+
+    def __init__(
+        self,
+        hub: VGuardTelemetryHub,
+        outage: VGuardOutageDetector,
+        rated_power: float,
+    ) -> None:
+        """Initialize the metrics."""
+        self._hub = hub
+        self._outage = outage
+        # Power drawn at 100 % load, converts VG019 into watts
+        self.rated_power = rated_power
+        self._last_time: Optional[float] = None
+        self._last_charge_power = 0.0
+        self._last_discharge_power = 0.0
+        self._charge_energy = 0.0  # Wh
+        self._discharge_energy = 0.0  # Wh
+        self._load_average: Optional[float] = None
+        self._unsub_frame: Optional[CALLBACK_TYPE] = None
+
+    @callback
+    def async_start(self) -> None:
+        """Resume the totals of the previous run and follow the telemetry."""
+        if self._unsub_frame is not None:
+            return
+        hub = self._hub
+        # Nothing is integrated over the time the metrics were stopped
+        self._last_time = None
+        self._charge_energy = as_float(hub.get_value(DERIVED_CHARGE_ENERGY)) or 0.0
+        self._discharge_energy = as_float(hub.get_value(DERIVED_DISCHARGE_ENERGY)) or 0.0
+        self._load_average = as_float(hub.get_value(DERIVED_LOAD_AVERAGE))
+        self._unsub_frame = hub.async_add_frame_listener(self._async_frame_received)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following the telemetry."""
+        if self._unsub_frame is not None:
+            self._unsub_frame()
+            self._unsub_frame = None
+
+    @callback
+    def _async_frame_received(self) -> None:
+        """Update all metrics from the current values."""
+        hub = self._hub
+        battery_voltage = as_float(hub.get_value("VG016"))
+        charge_current = as_float(hub.get_value("VG018"))
+        load = as_float(hub.get_value("VG019"))
+        on_battery = self._outage.on_battery
+
+        charge_power = (
+            battery_voltage * charge_current
+            if battery_voltage is not None and charge_current is not None and not on_battery
+            else 0.0
+        )
+        load_power = load / 100 * self.rated_power if load is not None else None
+        # On battery the load is what the battery delivers
+        discharge_power = load_power if on_battery and load_power is not None else 0.0
+
+        now = time.monotonic()
+        elapsed = now - self._last_time if self._last_time is not None else 0.0
+        self._last_time = now
+        if 0 < elapsed <= DERIVED_MAX_GAP:
+            # Trapezoidal Riemann sum, in Wh
+            self._charge_energy += (self._last_charge_power + charge_power) / 2 * elapsed / 3600
+            self._discharge_energy += (
+                (self._last_discharge_power + discharge_power) / 2 * elapsed / 3600
+            )
+            if load is not None and self._load_average is not None:
+                alpha = 1 - math.exp(-elapsed / DERIVED_LOAD_EWMA_TAU)
+                self._load_average += alpha * (load - self._load_average)
+        if load is not None and self._load_average is None:
+            self._load_average = load
+        self._last_charge_power = charge_power
+        self._last_discharge_power = discharge_power
+
+        # Rounded, so unchanged values are suppressed by the hub's heartbeat
+        hub.async_set_value(DERIVED_CHARGE_POWER, round(charge_power, 1))
+        if load_power is not None:
+            hub.async_set_value(DERIVED_LOAD_POWER, round(load_power))
+        hub.async_set_value(DERIVED_CHARGE_ENERGY, round(self._charge_energy, 1))
+        hub.async_set_value(DERIVED_DISCHARGE_ENERGY, round(self._discharge_energy, 1))
+        if self._load_average is not None:
+            hub.async_set_value(DERIVED_LOAD_AVERAGE, round(self._load_average, 1))
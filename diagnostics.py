@@ -0,0 +1,78 @@
+"""Diagnostics support for V-Guard Inverter."""
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST, CONF_TOKEN
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+# The token is the inverter serial, which also appears in its MQTT topics
+TO_REDACT = {CONF_HOST, CONF_TOKEN}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    config = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "connection": config["mqtt_client"].as_dict(),
+        "export": {
+            "enabled": config["exporter"].enabled,
+            "format": config["exporter"].format,
+            "rows_written": config["exporter"].rows_written,
+        },
+        # Keyed by position rather than serial, see TO_REDACT
+        "devices": {
+            f"device_{index}": _device_diagnostics(device)
+            for index, device in enumerate(config["devices"].values(), 1)
+        },
+    }
+
+
+def _device_diagnostics(device: dict) -> dict[str, Any]:
+    """Return the runtime counters of one inverter."""
+    hub = device["hub"]
+    commands = device["commands"]
+    cadence = device["cadence"]
+    outage = device["outage"]
+    return {
+        "available": hub.available,
+        "telemetry": {
+            "frames": hub.frames,
+            "frames_per_second": round(hub.frame_rate(), 3),
+            "decode_errors": hub.decode_errors,
+            "transform_errors": hub.transform_errors,
+            "unknown_codes": sorted(hub.unknown_codes),
+            "state_writes": hub.state_writes,
+            "processing_time_us": hub.processing_time.as_dict(),
+            "aggregate_window": device["aggregator"].window,
+            "qos": hub.telemetry_qos,
+            "heartbeat_interval": hub.heartbeat_interval,
+        },
+        "history": {
+            "hours": device["history"].hours,
+            "rows": len(device["history"]),
+        },
+        "outages": {
+            "on_battery": outage.on_battery,
+            "count": outage.outages,
+            "total_duration": outage.total_duration,
+            "last_duration": outage.last_duration,
+        },
+        "cadence": {
+            "stale_after": cadence.stale_after,
+            "starts_sent": cadence.starts_sent,
+        },
+        "commands": {
+            "confirmed": commands.confirmed,
+            "rolled_back": commands.rolled_back,
+            "latency_ms": commands.latency.as_dict(),
+        },
+    }
@@ -0,0 +1,157 @@
+"""Base entity for V-Guard Inverter."""
+from abc import abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import DeviceInfo, Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .codes import VGuardDescription
+from .commands import VGuardCommandQueue
+from .const import DOMAIN, SIGNAL_NEW_DEVICE
+from .hub import VGuardTelemetryHub
+
+
+@dataclass(frozen=True, slots=True)
+class VGuardDeviceContext:
+    """What all entities of one inverter share."""
+
+    serial: str
+    hub: VGuardTelemetryHub
+    commands: VGuardCommandQueue
+    device_info: DeviceInfo
+    # Optional entity groups enabled in the options, shared by the entry
+    entity_groups: set[str]
+
+
+@callback
+def async_setup_device_entities(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+    create_entities: Callable[[VGuardDeviceContext, str], list[Entity]],
+    create_device_entities: Optional[Callable[[VGuardDeviceContext], list[Entity]]] = None,
+    create_unknown_entities: Optional[
+        Callable[[VGuardDeviceContext, str], list[Entity]]
+    ] = None,
+) -> None:
+    """Add entities for every inverter of an entry as it is added.
+
+    Entities of a VG code are created the first time the inverter reports
+    it, or when a code it reported before is restored at startup.
+    """
+
+    @callback
+    def add_device(device: dict) -> None:
+        """Add the entities of one inverter as its VG codes show up."""
+        context: VGuardDeviceContext = device["context"]
+        hub = context.hub
+
+        @callback
+        def code_seen(code: str) -> bool:
+            """Add the entities of a VG code, return True if there are any."""
+            if entities := create_entities(context, code):
+                async_add_entities(entities)
+            return bool(entities)
+
+        entry.async_on_unload(hub.async_add_code_listener(code_seen))
+
+        if create_unknown_entities is not None:
+
+            @callback
+            def unknown_code_seen(code: str) -> None:
+                """Add generic entities for a code no platform supports."""
+                if entities := create_unknown_entities(context, code):
+                    async_add_entities(entities)
+
+            entry.async_on_unload(
+                hub.async_add_code_listener(unknown_code_seen, unknown=True)
+            )
+
+        if create_device_entities is not None:
+            async_add_entities(create_device_entities(context))
+
+    # Inverters are added once all platforms are set up, see __init__.py
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_NEW_DEVICE.format(entry_id=entry.entry_id), add_device
+        )
+    )
+
+
+class VGuardEntity(Entity):
+    """Entity fed with the values of one VG code by the telemetry hub.
+
+    Static attributes are read from the shared description and device
+    context instead of being copied into every entity.
+    """
+
+    _attr_should_poll = False
+
+    def __init__(self, context: VGuardDeviceContext, description: VGuardDescription) -> None:
+        """Initialize the entity."""
+        self._context = context
+        self._description = description
+        self._vg_code = description.code
+
+    @property
+    def unique_id(self) -> str:
+        """Return the unique ID."""
+        return f"{DOMAIN}_{self._context.serial}_{self._description.key}"
+
+    @property
+    def name(self) -> str:
+        """Return the name."""
+        return self._description.name
+
+    @property
+    def icon(self) -> str:
+        """Return the icon."""
+        return self._description.icon
+
+    @property
+    def _hub(self) -> VGuardTelemetryHub:
+        """Return the telemetry hub of the inverter."""
+        return self._context.hub
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info shared by all entities of the inverter."""
+        return self._context.device_info
+
+    @property
+    def available(self) -> bool:
+        """Return True if the device is online."""
+        return self._hub.available
+
+    @property
+    def extra_state_attributes(self) -> Optional[dict[str, Any]]:
+        """Return window statistics and flag values restored at startup."""
+        attributes = self._hub.aggregate_attributes.get(self._vg_code)
+        if self._vg_code in self._hub.stale_codes:
+            # Restored values are stale until the device reports them
+            return {**(attributes or {}), "stale": True}
+        return attributes
+
+    async def async_added_to_hass(self) -> None:
+        """Register with the telemetry hub."""
+        self.async_on_remove(
+            self._hub.async_add_listener(self._vg_code, self._handle_value)
+        )
+        self.async_on_remove(
+            self._hub.async_add_availability_listener(self.async_write_ha_state)
+        )
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state, counting writes for diagnostics."""
+        self._hub.state_writes += 1
+        super().async_write_ha_state()
+
+    @callback
+    @abstractmethod
+    def _handle_value(self, value: Any) -> None:
+        """Handle a new value for this entity's VG code."""
@@ -0,0 +1,270 @@
+"""Telemetry export for V-Guard Inverter.
+
+When enabled, the numeric values of every frame are collected in memory
+and written once a minute, from an executor thread, to one file per
+inverter and hour: Parquet if pyarrow is installed, gzip CSV otherwise.
+A Parquet file cannot be appended to, so every flush writes a complete
+part file that is merged into the hour's file once the hour is over.
+Files of hours older than the retention period are deleted.
+"""
+from array import array
+import asyncio
+import csv
+from datetime import timedelta
+from functools import partial
+import gzip
+import logging
+import math
+import os
+import time
+from typing import Any, Optional
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import EXPORT_FLUSH_INTERVAL
+from .decoder import as_float
+from .history import HISTORY_CODES
+from .hub import VGuardTelemetryHub
+
+_LOGGER = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class _Batch:
+    """The rows of one inverter collected since the last flush."""
+
+    __slots__ = ("times", "columns")
+
+    def __init__(self) -> None:
+        """Initialize the batch."""
+        self.times = array("d")
+        self.columns = {code: array("d") for code in HISTORY_CODES}
+
+
+class VGuardExporter:
+    """Write the telemetry of the inverters of an entry to hourly files."""
+
+    def __init__(self, hass: HomeAssistant, directory: str, retention_days: int) -> None:
+        """Initialize the exporter."""
+        self.hass = hass
+        self.directory = directory
+        self.retention_days = retention_days
+        self.enabled = False
+        self.rows_written = 0
+        self._hubs: dict[str, VGuardTelemetryHub] = {}
+        self._unsub_frames: dict[str, CALLBACK_TYPE] = {}
+        self._unsub_flush: Optional[CALLBACK_TYPE] = None
+        self._batches: dict[str, _Batch] = {}
+        # One flush at a time, parts are numbered and CSV files appended
+        self._lock = asyncio.Lock()
+        # Only used in the executor: pyarrow (or None) and the hour and
+        # number of the last Parquet part written per inverter
+        self._pyarrow: Any = _UNSET
+        self._parts: dict[str, tuple[str, int]] = {}
+        # Hour of the last expiry run, files are kept per hour
+        self._expired_hour: Optional[str] = None
+
+    @property
+    def format(self) -> Optional[str]:
+        """Return the file format, known after the first flush."""
+        if self._pyarrow is _UNSET:
+            return None
+        return "csv.gz" if self._pyarrow is None else "parquet"
+
+    @callback
+    def async_add_hub(self, hub: VGuardTelemetryHub) -> None:
+        """Export the telemetry of an inverter."""
+        self._hubs[hub.serial] = hub
+        if self.enabled:
+            self._async_listen(hub)
+
+    @callback
+    def async_start(self) -> None:
+        """Start collecting and flushing."""
+        if self.enabled:
+            return
+        self.enabled = True
+        _LOGGER.info("Exporting telemetry to %s", self.directory)
+        for hub in self._hubs.values():
+            self._async_listen(hub)
+        self._unsub_flush = async_track_time_interval(
+            self.hass, self._async_flush, timedelta(seconds=EXPORT_FLUSH_INTERVAL)
+        )
+
+    async def async_stop(self) -> None:
+        """Stop collecting and write what is left."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        while self._unsub_frames:
+            self._unsub_frames.popitem()[1]()
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        await self._async_flush()
+
+    @callback
+    def _async_listen(self, hub: VGuardTelemetryHub) -> None:
+        """Collect the frames of an inverter."""
+        self._unsub_frames[hub.serial] = hub.async_add_frame_listener(
+            partial(self._async_frame_received, hub)
+        )
+
+    @callback
+    def _async_frame_received(self, hub: VGuardTelemetryHub) -> None:
+        """Add the values of the latest frame to the batch of its inverter."""
+        if (batch := self._batches.get(hub.serial)) is None:
+            batch = self._batches[hub.serial] = _Batch()
+        batch.times.append(time.time())
+        get_value = hub.get_value
+        for code, column in batch.columns.items():
+            value = as_float(get_value(code))
+            column.append(math.nan if value is None else value)
+
+    async def _async_flush(self, _now=None) -> None:
+        """Hand the collected rows to the executor."""
+        batches, self._batches = self._batches, {}
+        async with self._lock:
+            try:
+                await self.hass.async_add_executor_job(self._write, batches)
+            except Exception as err:  # OSError, or an ArrowException of pyarrow
+                _LOGGER.error("Failed to export telemetry to %s: %s", self.directory, err)
+
+    def _write(self, batches: dict[str, _Batch]) -> None:
+        """Write the batches and expire old files (executor)."""
+        if self._pyarrow is _UNSET:
+            self._pyarrow = _import_pyarrow()
+            _LOGGER.debug("Exporting telemetry as %s", self.format)
+
+        for serial, batch in batches.items():
+            directory = os.path.join(self.directory, serial)
+            os.makedirs(directory, exist_ok=True)
+            times = batch.times
+            # Rows are in time order, write them hour by hour
+            first = 0
+            while first < len(times):
+                hour = _hour(times[first])
+                last = first + 1
+                while last < len(times) and _hour(times[last]) == hour:
+                    last += 1
+                if self._pyarrow is None:
+                    self._write_csv(directory, hour, batch, first, last)
+                else:
+                    self._write_parquet(serial, directory, hour, batch, first, last)
+                self.rows_written += last - first
+                first = last
+
+        if (hour := _hour(time.time())) != self._expired_hour:
+            self._expired_hour = hour
+            self._expire()
+
+    def _write_csv(
+        self, directory: str, hour: str, batch: _Batch, first: int, last: int
+    ) -> None:
+        """Append rows to the gzip CSV file of an hour (executor)."""
+        path = os.path.join(directory, f"{hour}.csv.gz")
+        new = not os.path.exists(path)
+        # Each append adds a gzip member, readers see one stream
+        with gzip.open(path, "at", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            if new:
+                writer.writerow(("time", *batch.columns))
+            columns = list(batch.columns.values())
+            for row in range(first, last):
+                writer.writerow(
+                    (
+                        round(batch.times[row], 3),
+                        *("" if math.isnan(value := column[row]) else value for column in columns),
+                    )
+                )
+
+    def _write_parquet(
+        self, serial: str, directory: str, hour: str, batch: _Batch, first: int, last: int
+    ) -> None:
+        """Write rows to a new Parquet part of an hour (executor)."""
+        pyarrow, parquet = self._pyarrow
+        last_hour, part = self._parts.get(serial, (None, 0))
+        if last_hour != hour:
+            # A new hour, or the first write since starting
+            self._merge_parts(directory, hour)
+            part = 0
+        part += 1
+        # Parts written before a restart are kept, continue after them
+        while os.path.exists(path := os.path.join(directory, f"{hour}-{part:03d}.parquet")):
+            part += 1
+        self._parts[serial] = (hour, part)
+
+        table = pyarrow.table(
+            {
+                "time": pyarrow.array(
+                    [int(timestamp * 1000) for timestamp in batch.times[first:last]],
+                    pyarrow.timestamp("ms", tz="UTC"),
+                ),
+                **{
+                    code: pyarrow.array(
+                        column[first:last], pyarrow.float64(), from_pandas=True
+                    )
+                    for code, column in batch.columns.items()
+                },
+            }
+        )
+        _write_table(parquet, table, path)
+
+    def _merge_parts(self, directory: str, hour: str) -> None:
+        """Merge the parts of the hours before hour into one file each (executor)."""
+        pyarrow, parquet = self._pyarrow
+        parts: dict[str, list[str]] = {}
+        for name in sorted(os.listdir(directory)):
+            part_hour, separator, rest = name.partition("-")
+            if separator and rest.endswith(".parquet") and part_hour < hour:
+                parts.setdefault(part_hour, []).append(os.path.join(directory, name))
+        for part_hour, paths in parts.items():
+            path = os.path.join(directory, f"{part_hour}.parquet")
+            # Already merged once, parts were added after a restart
+            if os.path.exists(path):
+                paths.insert(0, path)
+            table = pyarrow.concat_tables(parquet.read_table(part) for part in paths)
+            _write_table(parquet, table, path)
+            for part in paths:
+                if part != path:
+                    os.remove(part)
+            _LOGGER.debug("Merged %d parts into %s", len(paths), path)
+
+    def _expire(self) -> None:
+        """Delete the files of hours older than the retention period (executor)."""
+        if not os.path.isdir(self.directory):
+            return
+        # File names start with their UTC hour, which sorts like the time
+        cutoff = _hour(time.time() - self.retention_days * 86400)
+        for serial in os.listdir(self.directory):
+            directory = os.path.join(self.directory, serial)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name[: len(cutoff)] < cutoff:
+                    os.remove(os.path.join(directory, name))
+                    _LOGGER.debug("Removed expired export %s/%s", serial, name)
+
+
+def _hour(timestamp: float) -> str:
+    """Return the UTC hour of a timestamp, used as file name."""
+    return time.strftime("%Y%m%d%H", time.gmtime(timestamp))
+
+
+def _write_table(parquet: Any, table: Any, path: str) -> None:
+    """Write a Parquet file under a temporary name, then move it in place."""
+    temporary = f"{path}.tmp"
+    parquet.write_table(table, temporary, compression="zstd")
+    os.replace(temporary, path)
+
+
+def _import_pyarrow() -> Optional[tuple[Any, Any]]:
+    """Import pyarrow if installed, it is slow to import (executor)."""
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet as parquet  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    return pyarrow, parquet
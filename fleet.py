@@ -0,0 +1,106 @@
+"""Fleet mode for V-Guard Inverter."""
+import logging
+from typing import Callable, Optional
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .client import HomeAssistantMqttClient, MqttClient
+from .const import DEFAULT_TELEMETRY_QOS, TOPIC_LWT, TOPIC_TELEMETRY
+from .hub import VGuardTelemetryHub
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class VGuardFleet:
+    """Route the traffic of many inverters from two wildcard subscriptions."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        ignored_serials: set[str],
+        add_device: Callable[[str], VGuardTelemetryHub],
+        telemetry_qos: int = DEFAULT_TELEMETRY_QOS,
+        mqtt_client: Optional[MqttClient] = None,
+    ) -> None:
+        """Initialize the fleet."""
+        self.hass = hass
+        self._mqtt_client = mqtt_client or HomeAssistantMqttClient(hass)
+        # Serials with their own config entry are left to that entry
+        self._ignored = ignored_serials
+        self._add_device = add_device
+        self._hubs: dict[str, VGuardTelemetryHub] = {}
+        self._telemetry_prefix_len = len(TOPIC_TELEMETRY.format(serial=""))
+        self._lwt_prefix_len = len(TOPIC_LWT.format(serial=""))
+        self.telemetry_qos = telemetry_qos
+        self._unsubscribes: list[CALLBACK_TYPE] = []
+        self._unsub_telemetry: Optional[CALLBACK_TYPE] = None
+
+    async def async_start(self) -> None:
+        """Subscribe to the telemetry and LWT topics of all inverters."""
+        self._unsubscribes.append(
+            await self._mqtt_client.async_subscribe(
+                TOPIC_LWT.format(serial="+"), self._lwt_received, 1
+            )
+        )
+        await self._async_subscribe_telemetry()
+
+    async def _async_subscribe_telemetry(self) -> None:
+        """Subscribe to the telemetry of all inverters with the configured QoS."""
+        self._unsub_telemetry = await self._mqtt_client.async_subscribe(
+            TOPIC_TELEMETRY.format(serial="+"),
+            self._telemetry_received,
+            self.telemetry_qos,
+            encoding=None,
+        )
+
+    async def async_set_telemetry_qos(self, qos: int) -> None:
+        """Change the telemetry QoS, resubscribing if already subscribed."""
+        if qos == self.telemetry_qos:
+            return
+        self.telemetry_qos = qos
+        if self._unsub_telemetry is not None:
+            self._unsub_telemetry()
+            await self._async_subscribe_telemetry()
+
+    @callback
+    def async_stop(self) -> None:
+        """Unsubscribe from all topics."""
+        if self._unsub_telemetry is not None:
+            self._unsub_telemetry()
+            self._unsub_telemetry = None
+        while self._unsubscribes:
+            self._unsubscribes.pop()()
+
+    @callback
+    def async_restore(self, serials: list[str]) -> None:
+        """Add inverters known from a previous run."""
+        for serial in serials:
+            self._get_hub(serial)
+
+    @callback
+    def _get_hub(self, serial: str) -> Optional[VGuardTelemetryHub]:
+        """Return the hub of a serial, adding the inverter when first seen."""
+        if (hub := self._hubs.get(serial)) is not None:
+            return hub
+        if serial in self._ignored:
+            return None
+        if len(serial) <= 5:
+            _LOGGER.debug("Ignoring invalid serial: %s", serial)
+            self._ignored.add(serial)
+            return None
+
+        _LOGGER.info("Adding V-Guard inverter %s to the fleet", serial)
+        hub = self._hubs[serial] = self._add_device(serial)
+        return hub
+
+    @callback
+    def _telemetry_received(self, msg) -> None:
+        """Hand a telemetry frame to the hub of its inverter."""
+        if (hub := self._get_hub(msg.topic[self._telemetry_prefix_len :])) is not None:
+            hub.async_handle_telemetry(msg)
+
+    @callback
+    def _lwt_received(self, msg) -> None:
+        """Hand an LWT message to the hub of its inverter."""
+        if (hub := self._get_hub(msg.topic[self._lwt_prefix_len :])) is not None:
+            hub.async_handle_lwt(msg)
@@ -0,0 +1,201 @@
+"""In-memory telemetry history for V-Guard Inverter.
+
+The numeric values of the last hours are kept per inverter in columns of
+doubles, one column per code plus one of timestamps, so custom cards can
+chart recent data over the websocket API without querying the recorder.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+import logging
+import math
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+from .codes import SENSORS
+from .const import HISTORY_RESOLUTION
+from .decoder import as_float
+from .hub import VGuardTelemetryHub
+
+_LOGGER = logging.getLogger(__name__)
+
+# Codes with a state class are numeric, the others are text or metadata
+HISTORY_CODES = tuple(
+    code for code, description in SENSORS.items() if description.state_class is not None
+)
+
+_NAN = math.nan
+
+
+class VGuardHistory:
+    """Ring buffer of the recent numeric telemetry of one inverter.
+
+    Rows are appended until the buffer holds the configured hours, then the
+    oldest row is overwritten. At most one row is kept per resolution step.
+    """
+
+    def __init__(self, hub: VGuardTelemetryHub) -> None:
+        """Initialize the history, empty until hours are set."""
+        self._hub = hub
+        self.hours = 0.0
+        self._capacity = 0
+        self._times = array("d")
+        self._columns = {code: array("d") for code in HISTORY_CODES}
+        # Position of the oldest row once the buffer is full
+        self._head = 0
+        self._listeners: list[Callable[[float, dict[str, Optional[float]]], None]] = []
+        self._unsub_frame: Optional[CALLBACK_TYPE] = None
+
+    def __len__(self) -> int:
+        """Return the number of rows held."""
+        return len(self._times)
+
+    @callback
+    def async_set_hours(self, hours: float) -> None:
+        """Change how much history is kept, 0 disables and clears it."""
+        if hours == self.hours:
+            return
+        self.hours = hours
+        capacity = int(hours * 3600 / HISTORY_RESOLUTION)
+        # Keep the newest rows that still fit
+        times = self._ordered(self._times)[-capacity:] if capacity else array("d")
+        self._columns = {
+            code: self._ordered(column)[-capacity:] if capacity else array("d")
+            for code, column in self._columns.items()
+        }
+        self._times = times
+        self._head = 0
+        self._capacity = capacity
+
+        if capacity and self._unsub_frame is None:
+            self._unsub_frame = self._hub.async_add_frame_listener(self._async_frame_received)
+        elif not capacity:
+            self.async_stop()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop recording."""
+        if self._unsub_frame is not None:
+            self._unsub_frame()
+            self._unsub_frame = None
+
+    @callback
+    def async_add_listener(
+        self, row_callback: Callable[[float, dict[str, Optional[float]]], None]
+    ) -> CALLBACK_TYPE:
+        """Register a callback for every recorded row."""
+        self._listeners.append(row_callback)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the callback again."""
+            self._listeners.remove(row_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_frame_received(self) -> None:
+        """Record the current values, at most once per resolution step."""
+        now = time.time()
+        times = self._times
+        if times and now - times[self._head - 1] < HISTORY_RESOLUTION:
+            return
+
+        get_value = self._hub.get_value
+        full = len(times) >= self._capacity
+        head = self._head
+        for code, column in self._columns.items():
+            value = as_float(get_value(code))
+            if value is None:
+                value = _NAN
+            if full:
+                column[head] = value
+            else:
+                column.append(value)
+        if full:
+            times[head] = now
+            self._head = (head + 1) % self._capacity
+        else:
+            times.append(now)
+
+        if self._listeners:
+            row = self._row(-1)
+            for row_callback in list(self._listeners):
+                try:
+                    row_callback(now, row)
+                except Exception as err:
+                    _LOGGER.error("Error sending history row: %s", err)
+
+    def _ordered(self, column: array) -> array:
+        """Return a column oldest row first."""
+        if not self._head:
+            return column
+        return column[self._head :] + column[: self._head]
+
+    def _row(self, index: int) -> dict[str, Optional[float]]:
+        """Return one row (in insertion order) with missing values as None."""
+        position = (self._head + index) % len(self._times)
+        return {
+            code: None if math.isnan(value := column[position]) else value
+            for code, column in self._columns.items()
+        }
+
+    def query(
+        self,
+        codes: Optional[Iterable[str]] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        points: Optional[int] = None,
+    ) -> dict[str, Any]:
+        """Return the rows between start and end (epoch seconds).
+
+        With points, the range is split into that many equal time buckets
+        and each series holds the mean of every bucket.
+        """
+        codes = [code for code in (codes or HISTORY_CODES) if code in self._columns]
+        times = self._ordered(self._times)
+        first = bisect_left(times, start) if start is not None else 0
+        last = bisect_right(times, end) if end is not None else len(times)
+        times = times[first:last]
+        columns = {code: self._ordered(self._columns[code])[first:last] for code in codes}
+
+        if points and len(times) > points:
+            return _downsample(
+                times,
+                columns,
+                start if start is not None else times[0],
+                end if end is not None else times[-1],
+                points,
+            )
+        return {
+            "time": times.tolist(),
+            "series": {
+                code: [None if math.isnan(value) else value for value in column]
+                for code, column in columns.items()
+            },
+        }
+
+
+def _downsample(
+    times: array, columns: dict[str, array], start: float, end: float, points: int
+) -> dict[str, Any]:
+    """Average the rows into equal time buckets, empty buckets are None."""
+    width = (end - start) / points or 1.0
+    buckets = [min(int((timestamp - start) / width), points - 1) for timestamp in times]
+    series = {}
+    for code, column in columns.items():
+        totals = [0.0] * points
+        counts = [0] * points
+        for bucket, value in zip(buckets, column):
+            if not math.isnan(value):
+                totals[bucket] += value
+                counts[bucket] += 1
+        series[code] = [
+            round(total / count, 3) if count else None
+            for total, count in zip(totals, counts)
+        ]
+    return {
+        "time": [start + (index + 0.5) * width for index in range(points)],
+        "series": series,
+    }
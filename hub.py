@@ -0,0 +1,400 @@
+"""Telemetry hub for V-Guard Inverter."""
+import logging
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .client import HomeAssistantMqttClient, MqttClient
+from .const import (
+    DEFAULT_TELEMETRY_QOS,
+    LWT_OFFLINE,
+    LWT_ONLINE,
+    TELEMETRY_TIME_BUCKETS,
+)
+from .decoder import decode_frame
+from .stats import Histogram
+
+_LOGGER = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class VGuardTelemetryHub:
+    """Subscribe once to a device's telemetry and fan values out to entities."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        serial: str,
+        telemetry_topic: str,
+        lwt_topic: str,
+        heartbeat_interval: float,
+        known_codes: Iterable[str] = (),
+        telemetry_qos: int = DEFAULT_TELEMETRY_QOS,
+        mqtt_client: Optional[MqttClient] = None,
+    ) -> None:
+        """Initialize the hub."""
+        self.hass = hass
+        # Also used by the command queue to publish to the device
+        self.mqtt_client = mqtt_client or HomeAssistantMqttClient(hass)
+        self.serial = serial
+        self._telemetry_topic = telemetry_topic
+        self._lwt_topic = lwt_topic
+        self.available = False
+        # Unchanged values are still dispatched this often (seconds)
+        self.heartbeat_interval = heartbeat_interval
+        # LWT messages always use QoS 1, they are rare and must not be lost
+        self.telemetry_qos = telemetry_qos
+        # VG code -> update callbacks of the entities using that code
+        self._listeners: dict[str, list[Callable[[Any], None]]] = {}
+        # VG code -> last raw value and when it was last dispatched
+        self._last_values: dict[str, Any] = {}
+        self._last_dispatch: dict[str, float] = {}
+        # VG code -> value a sent command expects, and its confirmation callback
+        self._expected: dict[str, tuple[str, Callable[[], None]]] = {}
+        # VG codes the device reported so far, entities exist only for these
+        self.known_codes: set[str] = set(known_codes)
+        # Called with each newly seen VG code, return True if entities were added
+        self._code_listeners: list[Callable[[str], bool]] = []
+        # Called with VG codes no code listener handled
+        self._unknown_code_listeners: list[Callable[[str], Any]] = []
+        # Called once per availability change, entities write their state
+        self._availability_listeners: list[CALLBACK_TYPE] = []
+        # Called after every decoded frame
+        self._frame_listeners: list[CALLBACK_TYPE] = []
+        # VG codes whose last value was restored and not reported since
+        self.stale_codes: set[str] = set()
+        # VG codes whose entities get windowed aggregates, not raw values
+        self.aggregated_codes: set[str] = set()
+        self.aggregate_attributes: dict[str, dict[str, Any]] = {}
+        self._unsubscribes: list[CALLBACK_TYPE] = []
+        self._unsub_telemetry: Optional[CALLBACK_TYPE] = None
+        # Runtime counters, plain ints so counting never allocates
+        self.started = time.monotonic()
+        self.frames = 0
+        self.decode_errors = 0
+        self.transform_errors = 0
+        self.state_writes = 0
+        # VG codes reported by the device that no platform supports
+        self.unknown_codes: set[str] = set()
+        # Parse and dispatch time of a frame in microseconds
+        self.processing_time = Histogram(TELEMETRY_TIME_BUCKETS)
+
+    async def async_start(self) -> None:
+        """Subscribe to the telemetry and LWT topics."""
+        self._unsubscribes.append(
+            await self.mqtt_client.async_subscribe(
+                self._lwt_topic, self.async_handle_lwt, 1
+            )
+        )
+        await self._async_subscribe_telemetry()
+
+    async def _async_subscribe_telemetry(self) -> None:
+        """Subscribe to the telemetry topic with the configured QoS."""
+        self._unsub_telemetry = await self.mqtt_client.async_subscribe(
+            self._telemetry_topic,
+            self.async_handle_telemetry,
+            self.telemetry_qos,
+            encoding=None,
+        )
+
+    async def async_set_telemetry_qos(self, qos: int) -> None:
+        """Change the telemetry QoS, resubscribing if already subscribed."""
+        if qos == self.telemetry_qos:
+            return
+        self.telemetry_qos = qos
+        if self._unsub_telemetry is not None:
+            self._unsub_telemetry()
+            await self._async_subscribe_telemetry()
+
+    @callback
+    def async_stop(self) -> None:
+        """Unsubscribe from all topics."""
+        if self._unsub_telemetry is not None:
+            self._unsub_telemetry()
+            self._unsub_telemetry = None
+        while self._unsubscribes:
+            self._unsubscribes.pop()()
+
+    @callback
+    def async_add_availability_listener(
+        self, update_callback: CALLBACK_TYPE
+    ) -> CALLBACK_TYPE:
+        """Register a callback for availability changes."""
+        self._availability_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the callback again."""
+            self._availability_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_add_frame_listener(
+        self, frame_callback: CALLBACK_TYPE, first: bool = False
+    ) -> CALLBACK_TYPE:
+        """Register a callback run after every decoded frame.
+
+        Callbacks run in the order they were added, with first set before
+        all others, for state the other listeners read.
+        """
+        if first:
+            self._frame_listeners.insert(0, frame_callback)
+        else:
+            self._frame_listeners.append(frame_callback)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the callback again."""
+            self._frame_listeners.remove(frame_callback)
+
+        return remove_listener
+
+    @callback
+    def async_add_code_listener(
+        self, code_callback: Callable[[str], Any], unknown: bool = False
+    ) -> CALLBACK_TYPE:
+        """Register a callback for VG codes seen for the first time.
+
+        With unknown set, the callback only gets codes no other listener handled.
+        """
+        listeners = self._unknown_code_listeners if unknown else self._code_listeners
+        listeners.append(code_callback)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the callback again."""
+            listeners.remove(code_callback)
+
+        return remove_listener
+
+    @callback
+    def async_announce_codes(self) -> None:
+        """Hand the restored VG codes to the code listeners."""
+        for code in sorted(self.known_codes):
+            self._async_code_seen(code)
+
+    @callback
+    def async_add_listener(
+        self, vg_code: str, update_callback: Callable[[Any], None]
+    ) -> CALLBACK_TYPE:
+        """Register a callback for values of a VG code.
+
+        The last reported value, if any, is handed to the callback right away.
+        """
+        self._listeners.setdefault(vg_code, []).append(update_callback)
+        value = self._last_values.get(vg_code, _MISSING)
+        if value is not _MISSING:
+            update_callback(value)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the callback again."""
+            listeners = self._listeners.get(vg_code)
+            if listeners is None:
+                return
+            listeners.remove(update_callback)
+            if not listeners:
+                del self._listeners[vg_code]
+
+        return remove_listener
+
+    @callback
+    def async_expect(
+        self, vg_code: str, value: str, on_confirmed: Callable[[], None]
+    ) -> CALLBACK_TYPE:
+        """Hold back other values of a VG code until it reports `value`."""
+        expectation = (value, on_confirmed)
+        self._expected[vg_code] = expectation
+
+        @callback
+        def cancel() -> None:
+            """Stop waiting for the value."""
+            if self._expected.get(vg_code) is expectation:
+                del self._expected[vg_code]
+
+        return cancel
+
+    @callback
+    def async_restore(self, values: dict[str, Any], available: bool) -> None:
+        """Seed the last values from a snapshot, stale until reported again."""
+        for key, value in values.items():
+            if key in self._last_values:
+                continue
+            self._last_values[key] = value
+            # Never within the heartbeat, so live data is always dispatched
+            self._last_dispatch[key] = float("-inf")
+            self.stale_codes.add(key)
+        self.available = available
+
+    def get_value(self, key: str) -> Any:
+        """Return the last value of a code, or None."""
+        return self._last_values.get(key)
+
+    @callback
+    def async_set_value(self, key: str, value: Any) -> None:
+        """Route a value computed by the integration like a reported one."""
+        now = time.monotonic()
+        if (
+            self._last_values.get(key, _MISSING) == value
+            and now - self._last_dispatch[key] < self.heartbeat_interval
+        ):
+            return
+        self._last_values[key] = value
+        self._last_dispatch[key] = now
+        if self.stale_codes:
+            self.stale_codes.discard(key)
+        self._dispatch(key, value)
+
+    @callback
+    def async_dispatch_aggregate(
+        self, key: str, value: Any, attributes: dict[str, Any]
+    ) -> None:
+        """Hand the aggregate of a window to the listeners of a VG code."""
+        self.aggregate_attributes[key] = attributes
+        for update_callback in self._listeners.get(key, ()):
+            try:
+                update_callback(value)
+            except Exception as err:
+                _LOGGER.error("Error processing %s: %s", key, err)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return a copy of the last reported values."""
+        return dict(self._last_values)
+
+    @callback
+    def async_redispatch(self, vg_code: str) -> bool:
+        """Send the last reported value of a VG code to its listeners again."""
+        value = self._last_values.get(vg_code, _MISSING)
+        if value is _MISSING:
+            return False
+        self._last_dispatch[vg_code] = time.monotonic()
+        self._dispatch(vg_code, value)
+        return True
+
+    @callback
+    def _async_set_available(self, available: bool) -> None:
+        """Update the availability of all entities of the device at once."""
+        if available == self.available:
+            return
+        self.available = available
+        _LOGGER.info(
+            "V-Guard Inverter %s is %s", self.serial, "online" if available else "offline"
+        )
+        for update_callback in list(self._availability_listeners):
+            try:
+                update_callback()
+            except Exception as err:
+                _LOGGER.error("Error updating availability: %s", err)
+
+    @callback
+    def async_handle_lwt(self, msg) -> None:
+        """Handle the device's last will and birth messages."""
+        state = msg.payload.strip().lower()
+        if state == LWT_ONLINE:
+            self._async_set_available(True)
+        elif state == LWT_OFFLINE:
+            self._async_set_available(False)
+        else:
+            _LOGGER.debug("Unknown LWT payload for %s: %s", self.serial, msg.payload)
+
+    @callback
+    def async_handle_telemetry(self, msg) -> None:
+        """Decode a telemetry frame once and route its values."""
+        start = time.perf_counter()
+        self.frames += 1
+        try:
+            payload = decode_frame(msg.payload)
+        except ValueError as err:
+            self.decode_errors += 1
+            _LOGGER.error("Failed to decode JSON: %s", err)
+            return
+
+        if payload is None:
+            self.decode_errors += 1
+            _LOGGER.warning("Ignoring non-object telemetry payload: %s", msg.payload)
+            return
+
+        _LOGGER.debug("Received MQTT message: %s", payload)
+
+        # A device sending telemetry is online, even if its LWT was missed
+        if not self.available:
+            self._async_set_available(True)
+
+        last_values = self._last_values
+        last_dispatch = self._last_dispatch
+        expected = self._expected
+        stale_codes = self.stale_codes
+        heartbeat = self.heartbeat_interval
+        now = time.monotonic()
+        for key, value in payload.items():
+            if expected and key in expected:
+                expected_value, on_confirmed = expected[key]
+                if str(value) != expected_value:
+                    # Keep the optimistic state until the command is applied
+                    last_values[key] = value
+                    last_dispatch[key] = now
+                    continue
+                del expected[key]
+                on_confirmed()
+            # Skip unchanged values unless the heartbeat is due
+            elif (
+                last_values.get(key, _MISSING) == value
+                and now - last_dispatch[key] < heartbeat
+            ):
+                continue
+            last_values[key] = value
+            last_dispatch[key] = now
+            if stale_codes:
+                stale_codes.discard(key)
+            self._dispatch(key, value)
+
+        for frame_callback in self._frame_listeners:
+            try:
+                frame_callback()
+            except Exception as err:
+                _LOGGER.error("Error processing frame of %s: %s", self.serial, err)
+
+        self.processing_time.record((time.perf_counter() - start) * 1e6)
+
+    def frame_rate(self) -> float:
+        """Return the average number of frames per second since the start."""
+        elapsed = time.monotonic() - self.started
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    @callback
+    def _dispatch(self, key: str, value: Any) -> None:
+        """Hand a value to the listeners of its VG code."""
+        if key not in self.known_codes:
+            self.known_codes.add(key)
+            self._async_code_seen(key)
+        callbacks = self._listeners.get(key)
+        if callbacks is None or key in self.aggregated_codes:
+            return
+        for update_callback in callbacks:
+            try:
+                update_callback(value)
+            except Exception as err:
+                _LOGGER.error("Error processing %s: %s", key, err)
+
+    @callback
+    def _async_code_seen(self, code: str) -> None:
+        """Let the platforms create the entities of a VG code."""
+        handled = False
+        for code_callback in list(self._code_listeners):
+            try:
+                handled = bool(code_callback(code)) or handled
+            except Exception as err:
+                _LOGGER.error("Error adding entities for %s: %s", code, err)
+        if handled:
+            return
+
+        _LOGGER.debug("V-Guard Inverter %s reports unknown code %s", self.serial, code)
+        self.unknown_codes.add(code)
+        for code_callback in list(self._unknown_code_listeners):
+            try:
+                code_callback(code)
+            except Exception as err:
+                _LOGGER.error("Error adding entities for %s: %s", code, err)
@@ -0,0 +1,195 @@
+"""Mains outage detection for V-Guard Inverter."""
+import logging
+import time
+from typing import Callable, Optional
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DERIVED_MAX_GAP,
+    EVENT_OUTAGE_ENDED,
+    EVENT_OUTAGE_STARTED,
+    MAINS_MIN_VOLTAGE,
+    OUTAGE_COUNT,
+    OUTAGE_LAST_DURATION,
+    OUTAGE_TOTAL_DURATION,
+)
+from .decoder import as_float
+from .hub import VGuardTelemetryHub
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class VGuardOutageDetector:
+    """Track mains outages of one inverter from VG014 and VG022.
+
+    Evaluated at the end of every frame before the other frame listeners,
+    so events fire within the frame that reports the change and the
+    listeners see the power state of that frame.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, hub: VGuardTelemetryHub, rated_power: float
+    ) -> None:
+        """Initialize the detector."""
+        self.hass = hass
+        self._hub = hub
+        # Power drawn at 100 % load, converts VG019 into the energy used
+        self.rated_power = rated_power
+        self.on_battery = False
+        self.outages = 0
+        self.total_duration = 0.0  # seconds
+        self.last_duration: Optional[float] = None
+        self._started_at: Optional[float] = None
+        self._started_utc = None
+        self._battery_at_start: Optional[float] = None
+        # Load energy supplied on battery since the last outage ended, in Wh
+        self._energy_used = 0.0
+        self._last_time: Optional[float] = None
+        self._last_power = 0.0
+        # Called with the new state when the unit moves between mains and battery
+        self._listeners: list[Callable[[bool], None]] = []
+        self._unsub_frame: Optional[CALLBACK_TYPE] = None
+
+    @callback
+    def async_start(self) -> None:
+        """Resume the counters of the previous run and follow the telemetry."""
+        hub = self._hub
+        self.outages = int(as_float(hub.get_value(OUTAGE_COUNT)) or 0)
+        self.total_duration = as_float(hub.get_value(OUTAGE_TOTAL_DURATION)) or 0.0
+        self.last_duration = as_float(hub.get_value(OUTAGE_LAST_DURATION))
+        # An outage going on at shutdown continues without a second event,
+        # timed from now since the restored snapshot does not say when it began
+        if self._is_on_battery():
+            self.on_battery = True
+            self._started_at = time.monotonic()
+            self._started_utc = dt_util.utcnow()
+            self._battery_at_start = as_float(hub.get_value("VG017"))
+        self._unsub_frame = hub.async_add_frame_listener(
+            self._async_frame_received, first=True
+        )
+        self._async_publish_counters()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following the telemetry."""
+        if self._unsub_frame is not None:
+            self._unsub_frame()
+            self._unsub_frame = None
+
+    @callback
+    def async_add_listener(self, state_callback: Callable[[bool], None]) -> CALLBACK_TYPE:
+        """Register a callback for changes between mains and battery."""
+        self._listeners.append(state_callback)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the callback again."""
+            self._listeners.remove(state_callback)
+
+        return remove_listener
+
+    def _is_on_battery(self) -> bool:
+        """Return whether the last values say the unit runs on battery."""
+        hub = self._hub
+        input_voltage = as_float(hub.get_value("VG014"))
+        return str(hub.get_value("VG022")) == "1" or (
+            input_voltage is not None and input_voltage < MAINS_MIN_VOLTAGE
+        )
+
+    @callback
+    def _async_frame_received(self) -> None:
+        """Evaluate the power state of the latest frame."""
+        hub = self._hub
+        on_battery = self._is_on_battery()
+        self._async_integrate_energy(on_battery)
+        if on_battery == self.on_battery:
+            return
+        self.on_battery = on_battery
+
+        if on_battery:
+            self._async_outage_started(as_float(hub.get_value("VG014")))
+        else:
+            self._async_outage_ended()
+
+        for state_callback in list(self._listeners):
+            try:
+                state_callback(on_battery)
+            except Exception as err:
+                _LOGGER.error("Error handling outage state: %s", err)
+
+    @callback
+    def _async_integrate_energy(self, on_battery: bool) -> None:
+        """Add the load energy since the previous frame, on battery only."""
+        load = as_float(self._hub.get_value("VG019"))
+        power = load / 100 * self.rated_power if on_battery and load is not None else 0.0
+        now = time.monotonic()
+        elapsed = now - self._last_time if self._last_time is not None else 0.0
+        self._last_time = now
+        if 0 < elapsed <= DERIVED_MAX_GAP:
+            # Trapezoidal Riemann sum, in Wh, like the derived metrics
+            self._energy_used += (self._last_power + power) / 2 * elapsed / 3600
+        self._last_power = power
+
+    @callback
+    def _async_outage_started(self, input_voltage: Optional[float]) -> None:
+        """Record the start of an outage and fire the event."""
+        hub = self._hub
+        self._started_at = time.monotonic()
+        self._started_utc = dt_util.utcnow()
+        self._battery_at_start = as_float(hub.get_value("VG017"))
+        _LOGGER.info("Mains outage at V-Guard Inverter %s", hub.serial)
+        self.hass.bus.async_fire(
+            EVENT_OUTAGE_STARTED,
+            {
+                "serial": hub.serial,
+                "started": self._started_utc.isoformat(),
+                "input_voltage": input_voltage,
+                "battery": self._battery_at_start,
+            },
+        )
+
+    @callback
+    def _async_outage_ended(self) -> None:
+        """Update the counters and fire the event with the outage summary."""
+        hub = self._hub
+        duration = round(time.monotonic() - self._started_at, 1)
+        self.total_duration += duration
+        self.last_duration = duration
+        self.outages += 1
+
+        battery = as_float(hub.get_value("VG017"))
+        depth_of_discharge = (
+            self._battery_at_start - battery
+            if self._battery_at_start is not None and battery is not None
+            else None
+        )
+        _LOGGER.info(
+            "Mains back at V-Guard Inverter %s after %s seconds", hub.serial, duration
+        )
+        self.hass.bus.async_fire(
+            EVENT_OUTAGE_ENDED,
+            {
+                "serial": hub.serial,
+                "started": self._started_utc.isoformat(),
+                "ended": dt_util.utcnow().isoformat(),
+                "duration": duration,
+                "battery_start": self._battery_at_start,
+                "battery_end": battery,
+                "depth_of_discharge": depth_of_discharge,
+                "energy_used": round(self._energy_used, 1),
+            },
+        )
+        self._started_at = self._started_utc = self._battery_at_start = None
+        self._energy_used = 0.0
+        self._async_publish_counters()
+
+    @callback
+    def _async_publish_counters(self) -> None:
+        """Route the counters through the hub like reported values."""
+        hub = self._hub
+        hub.async_set_value(OUTAGE_COUNT, self.outages)
+        hub.async_set_value(OUTAGE_TOTAL_DURATION, round(self.total_duration))
+        if self.last_duration is not None:
+            hub.async_set_value(OUTAGE_LAST_DURATION, round(self.last_duration))
@@ -1,54 +1,45 @@
 """Sensor platform for V-Guard Inverter."""
-import json
+from datetime import timedelta
 import logging
-import datetime
+import time
 from typing import Any, Callable, Optional
 
-from homeassistant.components import mqtt
 from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_TOKEN
+from homeassistant.const import EntityCategory, UnitOfTime
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, MANUFACTURER, MODEL
+from .codes import SENSORS, VGuardSensorDescription, descriptions_for
+from .const import (
+    CONF_EXPOSE_UNKNOWN_CODES,
+    DEFAULT_EXPOSE_UNKNOWN_CODES,
+    DOMAIN,
+    GROUP_DIAGNOSTICS,
+)
+from .decoder import ValueDecoder
+from .entity import VGuardDeviceContext, VGuardEntity, async_setup_device_entities
+from .hub import VGuardTelemetryHub
 
 _LOGGER = logging.getLogger(__name__)
 
-# Sensor definitions: (key, name, icon, device_class, state_class, transform_fn)
-SENSOR_TYPES = {
-    "VG011": ("Wi-Fi Signal", "mdi:wifi", SensorDeviceClass.SIGNAL_STRENGTH, SensorStateClass.MEASUREMENT, lambda v: f"{v} dBm"),
-    "VG012": ("Wi-Fi Firmware Version", "mdi:cellphone-wireless", None, None, None),
-    "VG132": ("Wi-Fi MAC ID", "mdi:access-point-network", None, None, lambda v: ':'.join(v[i:i+2] for i in range(0, len(v), 2)) if v else v),
-    "VG136": ("Router SSID", "mdi:router-wireless", None, None, None),
-    "VG304": ("Timezone Offset", "mdi:clock-time-four-outline", None, None, None),
-    "VG042": ("System Uptime", "mdi:timer-outline", None, None, lambda v: str(datetime.timedelta(seconds=int(v)))),
-    "VG144": ("Temperature", "mdi:thermometer", SensorDeviceClass.TEMPERATURE, SensorStateClass.MEASUREMENT, lambda v: f"{v}°C"),
-    "VG146": ("Total Energy", "mdi:lightning-bolt", SensorDeviceClass.ENERGY, SensorStateClass.TOTAL_INCREASING, lambda v: f"{int(v)/1000:.2f} kWh"),
-    "VG211": ("Energy Usage", "mdi:power-plug", SensorDeviceClass.ENERGY, SensorStateClass.TOTAL_INCREASING, lambda v: f"{int(v)/1000:.2f} kWh"),
-    "VG033": ("Charging Mode", "mdi:battery-charging", None, None, None),
-    "VG095": ("Battery Capacity", "mdi:battery", None, None, None),
-    "VG003": ("Device Status Code", "mdi:information-outline", None, None, None),
-    "VG013": ("Device Model Parameter", "mdi:tag-outline", None, None, None),
-    "VG109": ("Last Update Time", "mdi:clock-outline", None, None, None),
-    "VG041": ("Power Mode", "mdi:power", None, None, lambda v: "normal mode" if v == "0" else "unknown"),
-    "VG094": ("System Mode", "mdi:cog-outline", None, None, lambda v: "normal operation" if v == "1" else "unknown"),
-    "VG014": ("Input Voltage", "mdi:flash", SensorDeviceClass.VOLTAGE, SensorStateClass.MEASUREMENT, lambda v: f"{v} V"),
-    "VG015": ("Output Voltage", "mdi:flash-outline", SensorDeviceClass.VOLTAGE, SensorStateClass.MEASUREMENT, lambda v: f"{v} V"),
-    "VG016": ("Battery Voltage", "mdi:battery-outline", SensorDeviceClass.VOLTAGE, SensorStateClass.MEASUREMENT, lambda v: f"{v} V"),
-    "VG017": ("Battery Percentage", "mdi:battery-charging-outline", SensorDeviceClass.BATTERY, SensorStateClass.MEASUREMENT, lambda v: f"{v}%"),
-    "VG018": ("Charging Current", "mdi:current-ac", SensorDeviceClass.CURRENT, SensorStateClass.MEASUREMENT, lambda v: f"{v} A"),
-    "VG019": ("Load Percentage", "mdi:gauge", None, SensorStateClass.MEASUREMENT, lambda v: f"{v}%"),
-    "VG020": ("Backup Time", "mdi:clock", None, None, lambda v: f"{int(int(v)/60)}h{int(int(v)%60)}m"),
-    "VG022": ("Inverter Status", "mdi:power-socket", None, None, None),
-    "VG023": ("Battery Status", "mdi:battery-alert", None, None, None),
-    "VG024": ("Battery Health", "mdi:heart-pulse", None, None, lambda v: f"{v}%"),
-    "VG025": ("Battery Capacity in Ah", "mdi:battery-high", None, None, lambda v: f"{int(v)/10} Ah"),
-    "VG026": ("Total Runtime", "mdi:timer", None, None, lambda v: str(datetime.timedelta(seconds=int(v)))),
-    "VG098": ("Total Runtime Mirror", "mdi:timer-sand", None, None, lambda v: str(datetime.timedelta(seconds=int(v)))),
-    "VG037": ("Forced Power Cut Duration", "mdi:timer-off-outline", None, None, lambda v: f"{v} min"),
-    "VG038": ("Forced Power Cut Status", "mdi:power-off", None, None, lambda v: "ON" if v == "1" else "OFF"),
+# Only the diagnostic sensors poll, telemetry sensors are pushed by the hub
+SCAN_INTERVAL = timedelta(seconds=60)
+
+# Shared by all inverters, so identical raw values are decoded only once
+SENSOR_DECODER = ValueDecoder({code: description.decoder for code, description in SENSORS.items()})
+
+# Diagnostic sensors, disabled unless the diagnostics group is enabled:
+# (name, icon, state_class, unit, value_fn), value_fn is None for the
+# sensors of DIAGNOSTIC_SENSOR_CLASSES that compute their own value
+DIAGNOSTIC_TYPES: dict[str, tuple[str, str, SensorStateClass, Optional[str], Optional[Callable[[VGuardTelemetryHub], Any]]]] = {
+    "frames": ("Telemetry Frames", "mdi:counter", SensorStateClass.TOTAL_INCREASING, None, lambda hub: hub.frames),
+    "frame_rate": ("Telemetry Frame Rate", "mdi:speedometer", SensorStateClass.MEASUREMENT, "frames/s", None),
+    "decode_errors": ("Telemetry Decode Failures", "mdi:code-json", SensorStateClass.TOTAL_INCREASING, None, lambda hub: hub.decode_errors),
+    "transform_errors": ("Value Decode Failures", "mdi:alert-circle-outline", SensorStateClass.TOTAL_INCREASING, None, lambda hub: hub.transform_errors),
+    "unknown_codes": ("Unknown VG Codes", "mdi:help-circle-outline", SensorStateClass.MEASUREMENT, None, lambda hub: len(hub.unknown_codes)),
+    "state_writes": ("State Writes", "mdi:database-edit-outline", SensorStateClass.TOTAL_INCREASING, None, lambda hub: hub.state_writes),
+    "processing_time": ("Telemetry Processing Time", "mdi:timer-sand", SensorStateClass.MEASUREMENT, UnitOfTime.MICROSECONDS, lambda hub: hub.processing_time.percentile(90)),
 }
 
 
@@ -58,100 +49,184 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up V-Guard Inverter sensors from config entry."""
-    config = hass.data[DOMAIN][entry.entry_id]
-    serial = entry.data[CONF_TOKEN]
-    telemetry_topic = config["telemetry_topic"]
-
-    entities = []
-    for key, (name, icon, device_class, state_class, transform) in SENSOR_TYPES.items():
-        entities.append(
-            VGuardSensor(
-                hass=hass,
-                entry=entry,
-                serial=serial,
-                telemetry_topic=telemetry_topic,
-                sensor_key=key,
-                sensor_name=name,
-                sensor_icon=icon,
-                device_class=device_class,
-                state_class=state_class,
-                transform=transform,
-            )
+
+    @callback
+    def create_unknown_sensors(
+        context: VGuardDeviceContext, code: str
+    ) -> list["VGuardUnknownSensor"]:
+        """Expose a code no platform supports, if enabled in the options."""
+        if not entry.options.get(CONF_EXPOSE_UNKNOWN_CODES, DEFAULT_EXPOSE_UNKNOWN_CODES):
+            return []
+        description = VGuardSensorDescription(
+            code, f"Code {code}", "mdi:help-circle-outline", diagnostic=True
         )
+        return [VGuardUnknownSensor(context, description)]
+
+    async_setup_device_entities(
+        hass,
+        entry,
+        async_add_entities,
+        _create_sensors,
+        create_device_entities=_create_diagnostic_sensors,
+        create_unknown_entities=create_unknown_sensors,
+    )
+
+
+def _create_sensors(context: VGuardDeviceContext, code: str) -> list["VGuardSensor"]:
+    """Create the sensor of one inverter for a VG code."""
+    return [
+        VGuardSensor(context, description)
+        for description in descriptions_for(code, VGuardSensorDescription)
+    ]
 
-    async_add_entities(entities)
 
+def _create_diagnostic_sensors(context: VGuardDeviceContext) -> list["VGuardDiagnosticSensor"]:
+    """Create the diagnostic sensors of one inverter."""
+    return [
+        DIAGNOSTIC_SENSOR_CLASSES.get(key, VGuardDiagnosticSensor)(context, key)
+        for key in DIAGNOSTIC_TYPES
+    ]
 
-class VGuardSensor(SensorEntity):
+
+class VGuardSensor(VGuardEntity, SensorEntity):
     """Representation of a V-Guard Inverter sensor."""
 
+    _description: VGuardSensorDescription
+
     def __init__(
-        self,
-        hass: HomeAssistant,
-        entry: ConfigEntry,
-        serial: str,
-        telemetry_topic: str,
-        sensor_key: str,
-        sensor_name: str,
-        sensor_icon: str,
-        device_class: Optional[SensorDeviceClass],
-        state_class: Optional[SensorStateClass],
-        transform: Optional[Callable],
+        self, context: VGuardDeviceContext, description: VGuardSensorDescription
     ) -> None:
         """Initialize the sensor."""
-        self.hass = hass
-        self._entry = entry
-        self._serial = serial
-        self._telemetry_topic = telemetry_topic
-        self._key = sensor_key
-        self._transform = transform
-        self._attr_name = sensor_name
-        self._attr_unique_id = f"{DOMAIN}_{serial}_{sensor_key}"
-        self._attr_icon = sensor_icon
-        self._attr_device_class = device_class
-        self._attr_state_class = state_class
+        super().__init__(context, description)
         self._attr_native_value = None
-        self._attr_available = False  # Will be True once we receive data
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, serial)},
-            name=f"V-Guard Inverter {serial[-6:]}",
-            manufacturer=MANUFACTURER,
-            model=MODEL,
+
+    @property
+    def device_class(self) -> Optional[SensorDeviceClass]:
+        """Return the device class."""
+        return self._description.device_class
+
+    @property
+    def state_class(self) -> Optional[SensorStateClass]:
+        """Return the state class."""
+        return self._description.state_class
+
+    @property
+    def native_unit_of_measurement(self) -> Optional[str]:
+        """Return the unit the values are reported in."""
+        return self._description.unit
+
+    @property
+    def suggested_unit_of_measurement(self) -> Optional[str]:
+        """Return the unit to show for new entities."""
+        return self._description.suggested_unit
+
+    @property
+    def suggested_display_precision(self) -> Optional[int]:
+        """Return the number of decimals to show."""
+        return self._description.precision
+
+    @property
+    def entity_category(self) -> Optional[EntityCategory]:
+        """Return the category, static device metadata is diagnostic."""
+        return EntityCategory.DIAGNOSTIC if self._description.diagnostic else None
+
+    @property
+    def entity_registry_enabled_default(self) -> bool:
+        """Return False for static device metadata and disabled groups."""
+        description = self._description
+        return not description.diagnostic and (
+            description.group is None or description.group in self._context.entity_groups
         )
 
-    async def async_added_to_hass(self) -> None:
-        """Subscribe to MQTT topic."""
-
-        @callback
-        def message_received(msg):
-            """Handle new MQTT messages."""
-            try:
-                payload = json.loads(msg.payload)
-                _LOGGER.debug("Received MQTT message: %s", payload)
-
-                # Unwrap nested data if needed
-                if len(payload) == 1 and isinstance(next(iter(payload.values())), dict):
-                    payload = next(iter(payload.values()))
-
-                # Update sensor value if key exists in payload
-                if self._key in payload:
-                    value = payload[self._key]
-                    if self._transform:
-                        try:
-                            self._attr_native_value = self._transform(value)
-                        except Exception as err:
-                            _LOGGER.warning("Transform failed for %s: %s", self._key, err)
-                            self._attr_native_value = value
-                    else:
-                        self._attr_native_value = value
-
-                    self._attr_available = True  # Mark as available once we have data
-                    self.async_write_ha_state()
-                    _LOGGER.debug("Updated %s to %s", self._key, self._attr_native_value)
-
-            except json.JSONDecodeError as err:
-                _LOGGER.error("Failed to decode JSON: %s", err)
-            except Exception as err:
-                _LOGGER.error("Error processing message: %s", err)
-
-        await mqtt.async_subscribe(self.hass, self._telemetry_topic, message_received, 1)
+    @callback
+    def _handle_value(self, value: Any) -> None:
+        """Update the sensor from a telemetry value."""
+        try:
+            self._attr_native_value = SENSOR_DECODER.decode(self._vg_code, value)
+        except (ValueError, TypeError) as err:
+            # Keep the previous value, a raw string would break numeric sensors
+            self._hub.transform_errors += 1
+            _LOGGER.warning("Transform failed for %s value '%s': %s", self._vg_code, value, err)
+            return
+
+        self.async_write_ha_state()
+        _LOGGER.debug("Updated %s to %s", self._vg_code, self._attr_native_value)
+
+
+class VGuardUnknownSensor(VGuardSensor):
+    """Raw value of a VG code no platform supports."""
+
+    @callback
+    def _handle_value(self, value: Any) -> None:
+        """Show the raw value, truncated to the state length limit."""
+        self._attr_native_value = str(value)[:255]
+        self.async_write_ha_state()
+
+
+class VGuardDiagnosticSensor(SensorEntity):
+    """Runtime counter of the telemetry hub, polled rather than pushed."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, context: VGuardDeviceContext, key: str) -> None:
+        """Initialize the sensor."""
+        name, icon, state_class, unit, value_fn = DIAGNOSTIC_TYPES[key]
+        self._hub = context.hub
+        # Disabled by default unless the diagnostics group is enabled
+        self._attr_entity_registry_enabled_default = (
+            GROUP_DIAGNOSTICS in context.entity_groups
+        )
+        self._value_fn = value_fn
+        self._attr_name = name
+        self._attr_unique_id = f"{DOMAIN}_{context.serial}_diagnostic_{key}"
+        self._attr_icon = icon
+        self._attr_state_class = state_class
+        self._attr_native_unit_of_measurement = unit
+        self._attr_device_info = context.device_info
+
+    async def async_update(self) -> None:
+        """Read the counter from the hub."""
+        self._attr_native_value = self._value_fn(self._hub)
+
+
+class VGuardProcessingTimeSensor(VGuardDiagnosticSensor):
+    """90th percentile of the parse and dispatch time of a frame."""
+
+    async def async_update(self) -> None:
+        """Read the percentiles from the histogram."""
+        await super().async_update()
+        histogram = self._hub.processing_time
+        self._attr_extra_state_attributes = {
+            "p50": histogram.percentile(50),
+            "p99": histogram.percentile(99),
+            "max": histogram.max if histogram.count else None,
+            "frames": histogram.count,
+        }
+
+
+class VGuardFrameRateSensor(VGuardDiagnosticSensor):
+    """Frames per second received since the previous poll."""
+
+    _attr_suggested_display_precision = 2
+
+    def __init__(self, context: VGuardDeviceContext, key: str) -> None:
+        """Initialize the sensor."""
+        super().__init__(context, key)
+        self._last_frames = context.hub.frames
+        self._last_poll = time.monotonic()
+
+    async def async_update(self) -> None:
+        """Compute the rate from the frame counter."""
+        now = time.monotonic()
+        frames = self._hub.frames
+        elapsed = now - self._last_poll
+        if elapsed > 0:
+            self._attr_native_value = (frames - self._last_frames) / elapsed
+        self._last_frames = frames
+        self._last_poll = now
+
+
+DIAGNOSTIC_SENSOR_CLASSES: dict[str, type[VGuardDiagnosticSensor]] = {
+    "frame_rate": VGuardFrameRateSensor,
+    "processing_time": VGuardProcessingTimeSensor,
+}
@@ -0,0 +1,57 @@
+"""Lightweight runtime statistics for V-Guard Inverter."""
+from typing import Any, Optional, Sequence
+
+
+class Histogram:
+    """Fixed-bucket histogram that records without allocating."""
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        """Initialize the histogram with ascending bucket upper bounds."""
+        self.bounds = tuple(bounds)
+        # One extra bucket collects everything above the last bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        """Add one sample."""
+        index = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Estimate a percentile as the upper bound of its bucket."""
+        if not self.count:
+            return None
+        threshold = self.count * percent / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= threshold and bucket_count:
+                if index < len(self.bounds):
+                    return min(self.bounds[index], self.max)
+                return self.max
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary for diagnostics."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.max if self.count else None,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": {
+                **{f"le_{bound:g}": count for bound, count in zip(self.bounds, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
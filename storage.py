@@ -0,0 +1,119 @@
+"""Persistent per-entry storage for V-Guard Inverter."""
+import logging
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import SNAPSHOT_SAVE_DELAY, STORAGE_KEY, STORAGE_SAVE_DELAY, STORAGE_VERSION
+from .hub import VGuardTelemetryHub
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class VGuardStorage:
+    """Remember the inverters of an entry, their VG codes and last values."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the storage."""
+        self._store: Store = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY.format(entry_id=entry_id)
+        )
+        # Serial -> stored data of the inverter, as loaded
+        self._devices: dict[str, dict[str, Any]] = {}
+        # Serial -> hub whose state is saved
+        self._hubs: dict[str, VGuardTelemetryHub] = {}
+        self._remove_listeners: list[CALLBACK_TYPE] = []
+        # A save is scheduled, new frames need not schedule another
+        self._save_pending = False
+
+    async def async_load(self) -> None:
+        """Load the stored data."""
+        data = await self._store.async_load()
+        if data:
+            self._devices = data.get("devices", {})
+        _LOGGER.debug("Loaded stored data for %d inverter(s)", len(self._devices))
+
+    @property
+    def serials(self) -> list[str]:
+        """Return the serials of all stored inverters."""
+        return list(self._devices)
+
+    def known_codes(self, serial: str) -> list[str]:
+        """Return the VG codes an inverter reported before."""
+        return self._devices.get(serial, {}).get("codes", [])
+
+    @callback
+    def async_restore(self, hub: VGuardTelemetryHub) -> None:
+        """Seed a hub with the snapshot saved in the previous run."""
+        device = self._devices.get(hub.serial)
+        if not device or not device.get("values"):
+            return
+        hub.async_restore(device["values"], device.get("available", False))
+        _LOGGER.debug(
+            "Restored %d values of V-Guard Inverter %s",
+            len(device["values"]),
+            hub.serial,
+        )
+
+    @callback
+    def async_track(self, hub: VGuardTelemetryHub) -> None:
+        """Save the state of a hub from now on."""
+        self._hubs[hub.serial] = hub
+        self._remove_listeners.append(hub.async_add_code_listener(self._async_code_seen))
+        self._remove_listeners.append(hub.async_add_frame_listener(self._async_frame_received))
+        if hub.serial not in self._devices:
+            self.async_schedule_save()
+
+    @callback
+    def async_schedule_save(self, delay: float = STORAGE_SAVE_DELAY) -> None:
+        """Save after delay, coalescing bursts of changes into one write."""
+        self._save_pending = True
+        self._store.async_delay_save(self._data_to_save, delay)
+
+    @callback
+    def _async_code_seen(self, _code: str) -> bool:
+        """Save the grown set of known codes, adding no entities."""
+        self.async_schedule_save()
+        return False
+
+    @callback
+    def _async_frame_received(self) -> None:
+        """Save the snapshot eventually, without re-arming a pending save."""
+        if not self._save_pending:
+            self.async_schedule_save(SNAPSHOT_SAVE_DELAY)
+
+    async def async_stop(self) -> None:
+        """Stop tracking the hubs and write out a pending save right away."""
+        self._async_untrack()
+        if self._save_pending:
+            await self._store.async_save(self._data_to_save())
+        self._hubs.clear()
+
+    async def async_remove(self) -> None:
+        """Delete the stored data, cancelling a pending save."""
+        self._async_untrack()
+        self._hubs.clear()
+        self._save_pending = False
+        await self._store.async_remove()
+
+    @callback
+    def _async_untrack(self) -> None:
+        """Stop saving on new codes and frames."""
+        for remove_listener in self._remove_listeners:
+            remove_listener()
+        self._remove_listeners.clear()
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to store."""
+        self._save_pending = False
+        devices = dict(self._devices)
+        for serial, hub in self._hubs.items():
+            devices[serial] = {
+                "codes": sorted(hub.known_codes),
+                "available": hub.available,
+                "values": hub.snapshot(),
+            }
+        self._devices = devices
+        return {"devices": devices}
@@ -0,0 +1,78 @@
+"""Fixtures for the V-Guard Inverter tests.
+
+The integration lives in the repository root, where HACS installs it
+from. Tests import it as custom_components.vguard_inverter, the way Home
+Assistant does, through a link in a temporary directory. The repository
+root itself must not be on sys.path: select.py would shadow the stdlib.
+"""
+import json
+from pathlib import Path
+import sys
+import tempfile
+from typing import Any
+
+import pytest
+
+_ROOT = Path(__file__).resolve().parent.parent
+_CONFIG_DIR = Path(tempfile.mkdtemp())
+(_CONFIG_DIR / "custom_components").mkdir()
+(_CONFIG_DIR / "custom_components" / "vguard_inverter").symlink_to(
+    _ROOT, target_is_directory=True
+)
+sys.path.insert(0, str(_CONFIG_DIR))
+
+from custom_components.vguard_inverter.client import DirectMqttMessage  # noqa: E402
+from custom_components.vguard_inverter.hub import VGuardTelemetryHub  # noqa: E402
+
+SERIAL = "VGINV0012345678"
+
+
+class FakeMqttClient:
+    """MQTT client recording what the integration publishes."""
+
+    def __init__(self) -> None:
+        """Initialize the client."""
+        self.published: list[tuple[str, str, int]] = []
+        self.error: Exception | None = None
+        self.on_publish = None
+
+    async def async_subscribe(self, topic, msg_callback, qos=0, encoding="utf-8"):
+        """Accept a subscription, messages are fed to the hub directly."""
+        return lambda: None
+
+    async def async_publish(self, topic: str, payload: str, qos: int = 0) -> None:
+        """Record a message, or fail with the configured error."""
+        if self.on_publish is not None:
+            self.on_publish()
+        if self.error is not None:
+            raise self.error
+        self.published.append((topic, payload, qos))
+
+    async def async_release(self) -> None:
+        """Release the client."""
+
+
+def telemetry(payload: Any) -> DirectMqttMessage:
+    """Return a telemetry message as the MQTT client hands it to the hub."""
+    if not isinstance(payload, (str, bytes)):
+        payload = json.dumps(payload)
+    return DirectMqttMessage(f"device/dups/CE01/{SERIAL}", payload, 1, False)
+
+
+@pytest.fixture
+def mqtt_client() -> FakeMqttClient:
+    """Return a fake MQTT client."""
+    return FakeMqttClient()
+
+
+@pytest.fixture
+def hub(hass, mqtt_client: FakeMqttClient) -> VGuardTelemetryHub:
+    """Return a telemetry hub with a 10 minute heartbeat."""
+    return VGuardTelemetryHub(
+        hass,
+        SERIAL,
+        f"device/dups/CE01/{SERIAL}",
+        f"device/dups/CE01/lwt/{SERIAL}",
+        heartbeat_interval=600,
+        mqtt_client=mqtt_client,
+    )
@@ -0,0 +1,68 @@
+"""Tests for the V-Guard Inverter aggregation."""
+from datetime import timedelta
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed_exact
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.vguard_inverter.aggregate import VGuardAggregator
+
+from conftest import telemetry
+
+WINDOW = 60
+
+
+async def _advance(hass, seconds: float) -> None:
+    """Let the window timer run as if `seconds` had passed."""
+    async_fire_time_changed_exact(hass, dt_util.utcnow() + timedelta(seconds=seconds))
+    await hass.async_block_till_done()
+
+
+async def test_window_mean_min_max(hass, hub) -> None:
+    """Every frame of a window counts, however many there are."""
+    received = []
+    hub.async_add_listener("VG017", received.append)
+    aggregator = VGuardAggregator(hass, hub)
+    aggregator.async_set_window(WINDOW)
+
+    # More frames than a fixed buffer of samples would have held
+    for value in ["90"] * 200 + ["96", "84"]:
+        hub.async_handle_telemetry(telemetry({"VG017": value}))
+    assert received == []
+
+    await _advance(hass, WINDOW)
+
+    assert received == [round((90 * 200 + 96 + 84) / 202, 3)]
+    assert hub.aggregate_attributes["VG017"] == {
+        "min": 84.0,
+        "max": 96.0,
+        "samples": 202,
+        "window": WINDOW,
+    }
+    aggregator.async_stop()
+
+
+async def test_window_rollover(hass, hub) -> None:
+    """The next window starts empty, a window without frames publishes nothing."""
+    received = []
+    hub.async_add_listener("VG017", received.append)
+    aggregator = VGuardAggregator(hass, hub)
+    aggregator.async_set_window(WINDOW)
+
+    hub.async_handle_telemetry(telemetry({"VG017": "90"}))
+    await _advance(hass, WINDOW)
+    hub.async_handle_telemetry(telemetry({"VG017": "80"}))
+    hub.async_handle_telemetry(telemetry({"VG017": "70"}))
+    await _advance(hass, 2 * WINDOW)
+
+    assert received == [90.0, 75.0]
+    assert hub.aggregate_attributes["VG017"]["min"] == 70.0
+    assert hub.aggregate_attributes["VG017"]["samples"] == 2
+
+    await _advance(hass, 3 * WINDOW)
+    assert received == [90.0, 75.0]
+
+    # Disabling hands the entity the latest raw value again
+    aggregator.async_set_window(0)
+    assert received == [90.0, 75.0, "70"]
+    assert hub.aggregate_attributes == {}
@@ -0,0 +1,80 @@
+"""Tests for the V-Guard Inverter telemetry cadence controller."""
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.vguard_inverter import cadence as cadence_module
+from custom_components.vguard_inverter.cadence import VGuardCadenceController
+from custom_components.vguard_inverter.const import (
+    CADENCE_MAX_BACKOFF,
+    CADENCE_STALE_ON_MAINS,
+)
+from custom_components.vguard_inverter.outage import VGuardOutageDetector
+
+from conftest import telemetry
+
+ON_MAINS = {"VG014": "231.4", "VG022": "0", "VG017": "96"}
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    """Replace the clock and timers of the controller with ones the test runs.
+
+    Checks are recorded as (delay, action) in `timers` instead of scheduled.
+    """
+    clock = SimpleNamespace(now=1000.0, timers=[])
+
+    def call_later(hass, delay, action):
+        clock.timers.append((delay, action))
+        return lambda: None
+
+    monkeypatch.setattr(
+        cadence_module, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    monkeypatch.setattr(cadence_module, "async_call_later", call_later)
+    return clock
+
+
+async def _run_check(hass, clock: SimpleNamespace) -> float:
+    """Let the delay of the last scheduled check pass and run it."""
+    delay, action = clock.timers[-1]
+    clock.now += delay
+    action(None)
+    await hass.async_block_till_done()
+    return delay
+
+
+async def test_start_resent_with_backoff(hass, hub, clock) -> None:
+    """Start is re-sent once telemetry is stale, then less and less often."""
+    starts = []
+
+    async def publish_start() -> None:
+        starts.append(clock.now)
+
+    outage = VGuardOutageDetector(hass, hub, 900)
+    outage.async_start()
+    controller = VGuardCadenceController(hass, hub, outage, publish_start)
+    controller.async_start()
+    hub.async_handle_telemetry(telemetry(ON_MAINS))
+
+    # A frame within the threshold only moves the check back
+    clock.now += 100
+    hub.async_handle_telemetry(telemetry(ON_MAINS))
+    delay, action = clock.timers[-1]
+    assert delay == CADENCE_STALE_ON_MAINS
+    clock.now = 1000 + delay
+    action(None)
+    assert starts == []
+
+    delays = [await _run_check(hass, clock) for _ in range(6)]
+    assert delays == [100, 600, 1200, 2400, CADENCE_MAX_BACKOFF, CADENCE_MAX_BACKOFF]
+    assert len(starts) == controller.starts_sent == 6
+    assert starts[0] == 1100 + CADENCE_STALE_ON_MAINS
+
+    # A frame resets the backoff, it starts over after the next silence
+    hub.async_handle_telemetry(telemetry(ON_MAINS))
+    assert await _run_check(hass, clock) == CADENCE_MAX_BACKOFF
+    assert len(starts) == 7
+    assert clock.timers[-1][0] == 2 * CADENCE_STALE_ON_MAINS
+
+    controller.async_stop()
@@ -0,0 +1,156 @@
+"""Tests for the V-Guard Inverter direct MQTT client."""
+from types import SimpleNamespace
+from typing import Optional
+
+import paho.mqtt.client as mqtt_client
+import pytest
+
+from homeassistant.exceptions import HomeAssistantError
+
+from custom_components.vguard_inverter import client as client_module
+from custom_components.vguard_inverter.client import DirectMqttClient
+from custom_components.vguard_inverter.const import DATA_MQTT_CLIENTS
+
+from conftest import SERIAL
+
+TELEMETRY_TOPIC = f"device/dups/CE01/{SERIAL}"
+LWT_TOPIC = f"device/dups/CE01/lwt/{SERIAL}"
+
+
+class FakePahoClient:
+    """paho client recording the packets it would send."""
+
+    def __init__(self) -> None:
+        """Initialize the client."""
+        self.subscribed: list[list[tuple[str, int]]] = []
+        self.unsubscribed: list[list[str]] = []
+        self.published: list[tuple[str, str, int]] = []
+        self.publish_rc = mqtt_client.MQTT_ERR_SUCCESS
+        # UNSUBSCRIBE packets sent before the DISCONNECT, None while connected
+        self.unsubscribed_before_disconnect: Optional[list[list[str]]] = None
+
+    def reconnect_delay_set(self, max_delay: int) -> None:
+        """Accept the reconnect delay."""
+
+    def subscribe(self, topics: list[tuple[str, int]]) -> None:
+        """Record one SUBSCRIBE packet."""
+        self.subscribed.append(topics)
+
+    def unsubscribe(self, topics: list[str]) -> None:
+        """Record one UNSUBSCRIBE packet."""
+        self.unsubscribed.append(topics)
+
+    def publish(self, topic: str, payload: str, qos: int) -> SimpleNamespace:
+        """Record a message, return the configured result code."""
+        self.published.append((topic, payload, qos))
+        return SimpleNamespace(rc=self.publish_rc)
+
+    def disconnect(self) -> None:
+        """Record the DISCONNECT."""
+        self.unsubscribed_before_disconnect = list(self.unsubscribed)
+
+    def loop_stop(self) -> None:
+        """Accept stopping the network thread."""
+
+
+@pytest.fixture
+def paho(monkeypatch) -> FakePahoClient:
+    """Return the fake paho client the direct client will use."""
+    paho = FakePahoClient()
+    monkeypatch.setattr(client_module, "_create_paho_client", lambda client_id: paho)
+    return paho
+
+
+async def _connect(hass, client: DirectMqttClient, session_present: bool) -> None:
+    """Report a CONNACK from the network thread and let the loop handle it."""
+    client._on_connect(None, None, {"session present": int(session_present)}, 0)
+    await hass.async_block_till_done()
+
+
+async def test_subscriptions_sent_in_one_packet(hass, paho) -> None:
+    """Subscriptions made in one iteration go out in a single SUBSCRIBE."""
+    client = DirectMqttClient(hass, "localhost", 1883, "test")
+    await _connect(hass, client, session_present=False)
+
+    await client.async_subscribe(TELEMETRY_TOPIC, lambda message: None, 1)
+    await client.async_subscribe(LWT_TOPIC, lambda message: None, 1)
+    await hass.async_block_till_done()
+
+    assert paho.subscribed == [[(TELEMETRY_TOPIC, 1), (LWT_TOPIC, 1)]]
+
+
+async def test_resubscribe_only_without_session(hass, paho) -> None:
+    """A resumed session keeps the subscriptions, a new one needs them again."""
+    client = DirectMqttClient(hass, "localhost", 1883, "test")
+    unsubscribe = await client.async_subscribe(TELEMETRY_TOPIC, lambda message: None, 1)
+    await client.async_subscribe(LWT_TOPIC, lambda message: None, 0)
+    await hass.async_block_till_done()
+    # Nothing is sent before the connection is up
+    assert paho.subscribed == []
+
+    await _connect(hass, client, session_present=False)
+    assert paho.subscribed == [[(TELEMETRY_TOPIC, 1), (LWT_TOPIC, 0)]]
+
+    client._on_disconnect(None, None, mqtt_client.MQTT_ERR_CONN_LOST)
+    await hass.async_block_till_done()
+    await _connect(hass, client, session_present=True)
+    assert len(paho.subscribed) == 1
+
+    unsubscribe()
+    await hass.async_block_till_done()
+    assert paho.unsubscribed == [[TELEMETRY_TOPIC]]
+
+    await _connect(hass, client, session_present=False)
+    assert paho.subscribed[-1] == [(LWT_TOPIC, 0)]
+
+
+async def test_wildcard_dispatch(hass, paho) -> None:
+    """Messages reach the exact and the matching wildcard subscriptions."""
+    client = DirectMqttClient(hass, "localhost", 1883, "test")
+    received = []
+    await client.async_subscribe(
+        TELEMETRY_TOPIC, lambda message: received.append(("exact", message.payload))
+    )
+    await client.async_subscribe(
+        "device/dups/CE01/+", lambda message: received.append(("level", message.payload))
+    )
+    await client.async_subscribe(
+        "device/dups/CE01/lwt/#", lambda message: received.append(("lwt", message.payload))
+    )
+
+    for topic, payload in ((TELEMETRY_TOPIC, b"{}"), (LWT_TOPIC, b"online")):
+        client._on_message(
+            None, None, SimpleNamespace(topic=topic, payload=payload, qos=1, retain=False)
+        )
+    await hass.async_block_till_done()
+
+    assert received == [("exact", "{}"), ("level", "{}"), ("lwt", "online")]
+    assert client.messages == 2
+
+
+async def test_publish_before_connack(hass, paho) -> None:
+    """paho queues QoS 1 messages while disconnected, QoS 0 ones are lost."""
+    client = DirectMqttClient(hass, "localhost", 1883, "test")
+    paho.publish_rc = mqtt_client.MQTT_ERR_NO_CONN
+
+    await client.async_publish("apps/dups/CE01/test", "start", qos=1)
+    with pytest.raises(HomeAssistantError):
+        await client.async_publish("apps/dups/CE01/test", "start", qos=0)
+
+    assert len(paho.published) == 2
+
+
+async def test_release_sends_pending_unsubscribes(hass, paho) -> None:
+    """Unsubscribes made while unloading go out before the DISCONNECT."""
+    client = DirectMqttClient(hass, "localhost", 1883, "test")
+    hass.data[DATA_MQTT_CLIENTS] = {("localhost", 1883): client}
+    client.refs = 1
+    await _connect(hass, client, session_present=False)
+    unsubscribe = await client.async_subscribe(TELEMETRY_TOPIC, lambda message: None, 1)
+    await hass.async_block_till_done()
+
+    unsubscribe()
+    await client.async_release()
+
+    assert paho.unsubscribed_before_disconnect == [[TELEMETRY_TOPIC]]
+    assert hass.data[DATA_MQTT_CLIENTS] == {}
@@ -0,0 +1,161 @@
+"""Tests for the V-Guard Inverter command queue."""
+from datetime import timedelta
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed_exact
+
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from custom_components.vguard_inverter.commands import VGuardCommandQueue
+from custom_components.vguard_inverter.const import COMMAND_ACK_TIMEOUT
+
+from conftest import SERIAL, telemetry
+
+CONTROL_TOPIC = f"apps/dups/CE01/{SERIAL}"
+
+
+def _queue(hass, hub, combine: bool = False) -> VGuardCommandQueue:
+    """Return a command queue for the hub's inverter."""
+    return VGuardCommandQueue(hass, hub, CONTROL_TOPIC, combine=combine)
+
+
+async def _advance(hass, seconds: float) -> None:
+    """Let the queue's timers run as if `seconds` had passed."""
+    async_fire_time_changed_exact(hass, dt_util.utcnow() + timedelta(seconds=seconds))
+    await hass.async_block_till_done()
+
+
+def _payloads(mqtt_client) -> list[str]:
+    """Return the payloads published so far."""
+    return [payload for _topic, payload, _qos in mqtt_client.published]
+
+
+async def test_debounce_keeps_latest_value(hass, hub, mqtt_client) -> None:
+    """Writes to one code within the debounce window collapse to the last."""
+    queue = _queue(hass, hub)
+    queue.async_send("VG095", "120")
+    queue.async_send("VG095", "130")
+    queue.async_send("VG095", "140")
+    await hass.async_block_till_done()
+    assert mqtt_client.published == []
+
+    await _advance(hass, 0.6)
+
+    assert mqtt_client.published == [(CONTROL_TOPIC, "VG095:140", 1)]
+    queue.async_shutdown()
+
+
+async def test_combine_writes_in_one_frame(hass, hub, mqtt_client) -> None:
+    """With combining enabled, all pending writes go out in one frame."""
+    queue = _queue(hass, hub, combine=True)
+    queue.async_send("VG099", "1")
+    queue.async_send("VG071", "0")
+
+    await _advance(hass, 0.6)
+
+    assert _payloads(mqtt_client) == ["VG099:1,VG071:0"]
+    queue.async_shutdown()
+
+
+async def test_rate_limit_between_frames(hass, hub, mqtt_client) -> None:
+    """Without combining, writes are sent one frame per second."""
+    queue = _queue(hass, hub)
+    queue.async_send("VG099", "1")
+    queue.async_send("VG071", "0")
+
+    await _advance(hass, 0.6)
+    assert _payloads(mqtt_client) == ["VG099:1"]
+
+    await _advance(hass, 0.6)
+    assert _payloads(mqtt_client) == ["VG099:1"]
+
+    await _advance(hass, 1.2)
+    assert _payloads(mqtt_client) == ["VG099:1", "VG071:0"]
+    queue.async_shutdown()
+
+
+async def test_confirmation_records_latency(hass, hub, mqtt_client) -> None:
+    """Telemetry reporting the written value confirms the command."""
+    queue = _queue(hass, hub)
+    calls = []
+    hub.async_add_listener("VG099", calls.append)
+    hub.async_handle_telemetry(telemetry({"VG099": "0"}))
+
+    queue.async_send("VG099", "1")
+    await _advance(hass, 0.6)
+    # The old state is held back until the device applies the write
+    hub.async_handle_telemetry(telemetry({"VG099": "0"}))
+    hub.async_handle_telemetry(telemetry({"VG099": "1"}))
+
+    assert queue.confirmed == 1
+    assert queue.latency.count == 1
+    assert calls == ["0", "1"]
+
+    # No rollback once confirmed
+    await _advance(hass, COMMAND_ACK_TIMEOUT + 1)
+    assert queue.rolled_back == 0
+
+
+async def test_timeout_rolls_back(hass, hub, mqtt_client) -> None:
+    """A write not confirmed in time restores the last reported value."""
+    queue = _queue(hass, hub)
+    calls = []
+    hub.async_add_listener("VG099", calls.append)
+    hub.async_handle_telemetry(telemetry({"VG099": "0"}))
+
+    queue.async_send("VG099", "1")
+    await _advance(hass, 0.6)
+    await _advance(hass, COMMAND_ACK_TIMEOUT + 1)
+
+    assert queue.rolled_back == 1
+    assert queue.confirmed == 0
+    assert calls == ["0", "0"]
+
+
+async def test_publish_failure_rolls_back(hass, hub, mqtt_client) -> None:
+    """A write that cannot be published is rolled back right away."""
+    queue = _queue(hass, hub)
+    calls = []
+    hub.async_add_listener("VG099", calls.append)
+    hub.async_handle_telemetry(telemetry({"VG099": "0"}))
+    mqtt_client.error = HomeAssistantError("broker gone")
+
+    queue.async_send("VG099", "1")
+    await _advance(hass, 0.6)
+
+    assert queue.rolled_back == 1
+    assert calls == ["0", "0"]
+
+
+async def test_write_replaced_while_publishing(hass, hub, mqtt_client) -> None:
+    """A newer write made during the publish keeps its own timing."""
+    queue = _queue(hass, hub)
+    hub.async_handle_telemetry(telemetry({"VG099": "0"}))
+    queue.async_send("VG099", "1")
+    # The user flips the switch back while the first frame is in flight
+    mqtt_client.on_publish = lambda: queue.async_send("VG099", "0")
+
+    await _advance(hass, 0.6)
+    mqtt_client.on_publish = None
+
+    command = queue._unconfirmed["VG099"]
+    assert command.value == "0"
+    assert command.sent_at is None
+    assert command.cancel_timeout is None
+
+    # The first frame's timeout must not roll back the newer write early
+    await _advance(hass, COMMAND_ACK_TIMEOUT + 1)
+    assert queue.rolled_back == 0
+    assert _payloads(mqtt_client) == ["VG099:1", "VG099:0"]
+    queue.async_shutdown()
+
+
+async def test_shutdown_drops_pending_writes(hass, hub, mqtt_client) -> None:
+    """Writes not sent before shutdown are dropped."""
+    queue = _queue(hass, hub)
+    queue.async_send("VG099", "1")
+
+    queue.async_shutdown()
+    await _advance(hass, 2)
+
+    assert mqtt_client.published == []
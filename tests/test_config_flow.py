@@ -0,0 +1,85 @@
+"""Tests for the V-Guard Inverter config flow."""
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant import config_entries
+from homeassistant.data_entry_flow import FlowResultType
+from homeassistant.helpers.service_info.mqtt import MqttServiceInfo
+
+from custom_components.vguard_inverter.const import (
+    CONF_MODE,
+    DATA_DISCOVERED_SERIALS,
+    DOMAIN,
+    FLEET_UNIQUE_ID,
+    MODE_FLEET,
+)
+
+from conftest import SERIAL
+
+OTHER_SERIAL = "VGINV0087654321"
+
+
+def _lwt(serial: str) -> MqttServiceInfo:
+    """Return the discovery info of a retained LWT message."""
+    return MqttServiceInfo(
+        topic=f"device/dups/CE01/lwt/{serial}",
+        payload="online",
+        qos=1,
+        retain=True,
+        subscribed_topic="device/dups/CE01/lwt/+",
+        timestamp=0,
+    )
+
+
+async def _discover(hass, serial: str):
+    """Start the flow Home Assistant starts for an LWT message."""
+    return await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_MQTT}, data=_lwt(serial)
+    )
+
+
+async def test_known_serial_keeps_discovery_running(
+    hass, enable_custom_integrations, mqtt_mock
+) -> None:
+    """A known inverter does not abort with the reason that ends discovery."""
+    MockConfigEntry(domain=DOMAIN, unique_id=SERIAL, data={}).add_to_hass(hass)
+
+    result = await _discover(hass, SERIAL)
+    assert result["type"] == FlowResultType.ABORT
+    assert result["reason"] == "device_configured"
+    assert SERIAL not in hass.data.get(DATA_DISCOVERED_SERIALS, set())
+
+    result = await _discover(hass, OTHER_SERIAL)
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "mqtt_confirm"
+
+
+async def test_fleet_ends_discovery(hass, enable_custom_integrations, mqtt_mock) -> None:
+    """With a fleet entry every inverter is handled, discovery may stop."""
+    MockConfigEntry(
+        domain=DOMAIN, unique_id=FLEET_UNIQUE_ID, data={CONF_MODE: MODE_FLEET}
+    ).add_to_hass(hass)
+
+    result = await _discover(hass, OTHER_SERIAL)
+
+    assert result["type"] == FlowResultType.ABORT
+    assert result["reason"] == "already_configured"
+
+
+async def test_fleet_blocks_single_inverter_entries(
+    hass, enable_custom_integrations
+) -> None:
+    """With a fleet entry, inverters cannot be added a second time by hand."""
+    MockConfigEntry(
+        domain=DOMAIN, unique_id=FLEET_UNIQUE_ID, data={CONF_MODE: MODE_FLEET}
+    ).add_to_hass(hass)
+
+    for step in ("manual", "mqtt_discovery"):
+        result = await hass.config_entries.flow.async_init(
+            DOMAIN, context={"source": config_entries.SOURCE_USER}
+        )
+        result = await hass.config_entries.flow.async_configure(
+            result["flow_id"], {"next_step_id": step}
+        )
+
+        assert result["type"] == FlowResultType.ABORT
+        assert result["reason"] == "fleet_configured"
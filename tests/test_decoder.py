@@ -0,0 +1,71 @@
+"""Tests for the V-Guard Inverter telemetry decoder."""
+import pytest
+
+from custom_components.vguard_inverter import decoder as decoder_module
+from custom_components.vguard_inverter.decoder import ValueDecoder, power_mode, tenths
+
+
+def _counting(decode):
+    """Wrap a decoder, recording the raw values it is called with."""
+    calls = []
+
+    def wrapper(value):
+        calls.append(value)
+        return decode(value)
+
+    return wrapper, calls
+
+
+def test_repeated_value_memoized() -> None:
+    """A repeated raw value is decoded once, a changed one again."""
+    decode, calls = _counting(tenths)
+    decoder = ValueDecoder({"VG016": decode, "VG017": None})
+
+    assert [decoder.decode("VG016", raw) for raw in ("134", "134", "135", "134")] == [
+        13.4,
+        13.4,
+        13.5,
+        13.4,
+    ]
+    assert calls == ["134", "135"]
+    assert (decoder.hits, decoder.misses) == (2, 2)
+
+    # Codes without a decoder pass through, not counted
+    assert decoder.decode("VG017", "96") == "96"
+    assert (decoder.hits, decoder.misses) == (2, 2)
+
+
+def test_same_raw_value_per_code() -> None:
+    """Memos are kept per code, the same raw value decodes per its code."""
+    decoder = ValueDecoder({"VG016": tenths, "VG041": power_mode})
+
+    assert decoder.decode("VG016", "0") == 0.0
+    assert decoder.decode("VG041", "0") == "normal mode"
+
+
+def test_non_numeric_values() -> None:
+    """Failures are raised every time, unhashable values are not memoized."""
+    decode, calls = _counting(tenths)
+    decoder = ValueDecoder({"VG016": decode, "VG041": power_mode})
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            decoder.decode("VG016", "n/a")
+    assert calls == ["n/a", "n/a"]
+    assert decoder.hits == 0
+
+    assert decoder.decode("VG041", ["0"]) == "unknown"
+    assert decoder.decode("VG041", "x") == decoder.decode("VG041", "x") == "unknown"
+    assert decoder.hits == 1
+
+
+def test_memo_reset_when_full(monkeypatch) -> None:
+    """A code with many distinct values starts a new memo instead of growing."""
+    monkeypatch.setattr(decoder_module, "MEMO_SIZE", 2)
+    decode, calls = _counting(tenths)
+    decoder = ValueDecoder({"VG016": decode})
+
+    for raw in ("1", "2", "3", "1"):
+        decoder.decode("VG016", raw)
+
+    assert calls == ["1", "2", "3", "1"]
@@ -0,0 +1,95 @@
+"""Tests for the V-Guard Inverter derived metrics."""
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.vguard_inverter import derived as derived_module
+from custom_components.vguard_inverter.const import (
+    DERIVED_CHARGE_ENERGY,
+    DERIVED_CHARGE_POWER,
+    DERIVED_DISCHARGE_ENERGY,
+    DERIVED_LOAD_POWER,
+    DERIVED_MAX_GAP,
+)
+from custom_components.vguard_inverter.derived import VGuardDerivedMetrics
+from custom_components.vguard_inverter.outage import VGuardOutageDetector
+
+from conftest import telemetry
+
+ON_MAINS = {"VG014": "231.4", "VG022": "0", "VG016": "50", "VG019": "50"}
+ON_BATTERY = {"VG014": "0", "VG022": "1", "VG016": "48", "VG018": "0", "VG019": "50"}
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    """Replace the metrics' monotonic clock with one the test advances."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        derived_module, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+def _start(hass, hub) -> VGuardDerivedMetrics:
+    """Start the metrics of the hub with a 900 W inverter."""
+    outage = VGuardOutageDetector(hass, hub, 900)
+    outage.async_start()
+    metrics = VGuardDerivedMetrics(hub, outage, 900)
+    metrics.async_start()
+    return metrics
+
+
+async def test_charge_energy_trapezoid(hass, hub, clock) -> None:
+    """Energy is the mean power of two frames times the time between them."""
+    _start(hass, hub)
+
+    hub.async_handle_telemetry(telemetry(dict(ON_MAINS, VG018="10")))
+    assert hub.get_value(DERIVED_CHARGE_POWER) == 500.0
+    assert hub.get_value(DERIVED_LOAD_POWER) == 450
+    clock.now += 60
+    hub.async_handle_telemetry(telemetry(dict(ON_MAINS, VG018="20")))
+
+    # (500 W + 1000 W) / 2 for a minute
+    assert hub.get_value(DERIVED_CHARGE_ENERGY) == 12.5
+    assert hub.get_value(DERIVED_DISCHARGE_ENERGY) == 0.0
+
+
+async def test_discharge_energy_on_battery(hass, hub, clock) -> None:
+    """On battery the load is integrated as discharge, charging stops."""
+    _start(hass, hub)
+
+    hub.async_handle_telemetry(telemetry(dict(ON_MAINS, VG018="0")))
+    clock.now += 120
+    hub.async_handle_telemetry(telemetry(ON_BATTERY))
+    clock.now += 120
+    hub.async_handle_telemetry(telemetry(ON_BATTERY))
+
+    # Ramps from 0 to 450 W, then 450 W for two minutes
+    assert hub.get_value(DERIVED_DISCHARGE_ENERGY) == 22.5
+    assert hub.get_value(DERIVED_CHARGE_POWER) == 0.0
+    assert hub.get_value(DERIVED_CHARGE_ENERGY) == 0.0
+
+
+async def test_gap_not_integrated(hass, hub, clock) -> None:
+    """Longer gaps than DERIVED_MAX_GAP, and time stopped, add no energy."""
+    metrics = _start(hass, hub)
+    charging = telemetry(dict(ON_MAINS, VG018="20"))
+
+    hub.async_handle_telemetry(charging)
+    clock.now += DERIVED_MAX_GAP + 1
+    hub.async_handle_telemetry(charging)
+    assert hub.get_value(DERIVED_CHARGE_ENERGY) == 0.0
+
+    clock.now += 36
+    hub.async_handle_telemetry(charging)
+    assert hub.get_value(DERIVED_CHARGE_ENERGY) == 10.0
+
+    # Restarted metrics resume the total, without the time in between
+    metrics.async_stop()
+    clock.now += 36
+    metrics.async_start()
+    hub.async_handle_telemetry(charging)
+    assert hub.get_value(DERIVED_CHARGE_ENERGY) == 10.0
+    clock.now += 36
+    hub.async_handle_telemetry(charging)
+    assert hub.get_value(DERIVED_CHARGE_ENERGY) == 20.0
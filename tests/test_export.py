@@ -0,0 +1,119 @@
+"""Tests for the V-Guard Inverter telemetry export."""
+import csv
+import gzip
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.vguard_inverter import export as export_module
+from custom_components.vguard_inverter.export import VGuardExporter
+
+from conftest import SERIAL, telemetry
+
+# 2024-01-01 10:30 UTC
+START = 1704105000.0
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    """Replace the exporter's wall clock with one the test advances."""
+    clock = SimpleNamespace(now=START)
+    monkeypatch.setattr(
+        export_module,
+        "time",
+        SimpleNamespace(time=lambda: clock.now, strftime=time.strftime, gmtime=time.gmtime),
+    )
+    return clock
+
+
+@pytest.fixture
+def no_pyarrow(monkeypatch) -> None:
+    """Export gzip CSV, as without pyarrow installed."""
+    monkeypatch.setattr(export_module, "_import_pyarrow", lambda: None)
+
+
+async def _export_two_flushes(hass, hub, directory, clock, seconds: float) -> VGuardExporter:
+    """Export one frame, flush, export another `seconds` later and stop."""
+    exporter = VGuardExporter(hass, str(directory), 7)
+    exporter.async_add_hub(hub)
+    exporter.async_start()
+    hub.async_handle_telemetry(telemetry({"VG017": "96"}))
+    await exporter._async_flush()
+    clock.now += seconds
+    hub.async_handle_telemetry(telemetry({"VG017": "95"}))
+    await exporter.async_stop()
+    return exporter
+
+
+async def test_csv_export(hass, hub, tmp_path, clock, no_pyarrow) -> None:
+    """Without pyarrow, the rows of an hour are appended to one gzip CSV file."""
+    exporter = await _export_two_flushes(hass, hub, tmp_path, clock, 60)
+
+    assert exporter.format == "csv.gz"
+    assert exporter.rows_written == 2
+    (path,) = (tmp_path / SERIAL).iterdir()
+    assert path.name == "2024010110.csv.gz"
+    with gzip.open(path, "rt", newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["VG017"] for row in rows] == ["96.0", "95.0"]
+
+
+async def test_expire_by_hour(hass, hub, tmp_path, clock, no_pyarrow) -> None:
+    """Files of hours before the retention period are deleted by name."""
+    directory = tmp_path / SERIAL
+    directory.mkdir()
+    # 8 days before START, and the hour that is just 7 days old
+    (directory / "2023122410.csv.gz").write_bytes(b"")
+    (directory / "2023122510.csv.gz").write_bytes(b"")
+
+    await _export_two_flushes(hass, hub, tmp_path, clock, 60)
+
+    assert sorted(path.name for path in directory.iterdir()) == [
+        "2023122510.csv.gz",
+        "2024010110.csv.gz",
+    ]
+
+
+async def test_write_error_is_logged(hass, hub, tmp_path, caplog, no_pyarrow) -> None:
+    """Errors other than OSError, as pyarrow raises them, are logged."""
+    exporter = VGuardExporter(hass, str(tmp_path), 7)
+    exporter.async_add_hub(hub)
+    exporter.async_start()
+    hub.async_handle_telemetry(telemetry({"VG017": "96"}))
+
+    def fail(*args):
+        raise ValueError("invalid table")
+
+    exporter._write_csv = fail
+    await exporter.async_stop()
+
+    assert "Failed to export telemetry" in caplog.text
+
+
+async def test_parquet_parts_merged_per_hour(hass, hub, tmp_path, clock) -> None:
+    """Each flush writes a complete part, the parts of an hour become one file."""
+    parquet = pytest.importorskip("pyarrow.parquet")
+    directory = tmp_path / SERIAL
+
+    exporter = await _export_two_flushes(hass, hub, tmp_path, clock, 60)
+
+    assert exporter.format == "parquet"
+    assert sorted(path.name for path in directory.iterdir()) == [
+        "2024010110-001.parquet",
+        "2024010110-002.parquet",
+    ]
+
+    # The first write of the next hour merges the previous one
+    clock.now += 3600
+    await _export_two_flushes(hass, hub, tmp_path, clock, 60)
+
+    assert sorted(path.name for path in directory.iterdir()) == [
+        "2024010110.parquet",
+        "2024010111-001.parquet",
+        "2024010111-002.parquet",
+    ]
+    assert parquet.read_table(directory / "2024010110.parquet")["VG017"].to_pylist() == [
+        96.0,
+        95.0,
+    ]
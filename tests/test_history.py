@@ -0,0 +1,125 @@
+"""Tests for the V-Guard Inverter telemetry history and its websocket API."""
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.vguard_inverter import history as history_module
+from custom_components.vguard_inverter.const import DOMAIN, HISTORY_RESOLUTION
+from custom_components.vguard_inverter.history import VGuardHistory
+from custom_components.vguard_inverter.websocket import (
+    async_register_websocket_commands,
+)
+
+from conftest import SERIAL, telemetry
+
+START = 1704105000.0
+# Room for three rows
+HOURS = 3.5 * HISTORY_RESOLUTION / 3600
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    """Replace the history's wall clock with one the test advances."""
+    clock = SimpleNamespace(now=START)
+    monkeypatch.setattr(history_module, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def _record(hub, clock, values: list[str]) -> None:
+    """Report one battery value per resolution step."""
+    for value in values:
+        hub.async_handle_telemetry(telemetry({"VG017": value}))
+        clock.now += HISTORY_RESOLUTION
+
+
+async def test_ring_buffer_wraps(hass, hub, clock) -> None:
+    """Once full, the oldest rows are overwritten and queries stay in order."""
+    history = VGuardHistory(hub)
+    history.async_set_hours(HOURS)
+
+    _record(hub, clock, ["90", "91", "92", "93", "94"])
+
+    assert len(history) == 3
+    result = history.query(["VG017"])
+    assert result["time"] == [START + step * HISTORY_RESOLUTION for step in (2, 3, 4)]
+    assert result["series"] == {"VG017": [92.0, 93.0, 94.0]}
+
+    # Growing the buffer keeps the rows, oldest first
+    history.async_set_hours(2 * HOURS)
+    _record(hub, clock, ["95"])
+    assert history.query(["VG017"])["series"]["VG017"] == [92.0, 93.0, 94.0, 95.0]
+
+
+async def test_frames_within_resolution_skipped(hass, hub, clock) -> None:
+    """At most one row is kept per resolution step, missing codes are None."""
+    history = VGuardHistory(hub)
+    history.async_set_hours(HOURS)
+
+    hub.async_handle_telemetry(telemetry({"VG017": "90"}))
+    clock.now += HISTORY_RESOLUTION / 2
+    hub.async_handle_telemetry(telemetry({"VG017": "91"}))
+
+    assert history.query(["VG017", "VG016"])["series"] == {
+        "VG017": [90.0],
+        "VG016": [None],
+    }
+
+
+async def test_query_range(hass, hub, clock) -> None:
+    """Start and end are inclusive, unknown codes are left out."""
+    history = VGuardHistory(hub)
+    history.async_set_hours(1)
+    _record(hub, clock, ["90", "91", "92", "93"])
+
+    result = history.query(
+        ["VG017", "VG999"],
+        start=START + HISTORY_RESOLUTION,
+        end=START + 2 * HISTORY_RESOLUTION,
+    )
+
+    assert result == {
+        "time": [START + HISTORY_RESOLUTION, START + 2 * HISTORY_RESOLUTION],
+        "series": {"VG017": [91.0, 92.0]},
+    }
+    assert history.query(["VG017"], start=START + 3600)["time"] == []
+
+
+async def test_query_downsampled(hass, hub, clock) -> None:
+    """With points, each bucket holds the mean of its rows, empty ones None."""
+    history = VGuardHistory(hub)
+    history.async_set_hours(1)
+    _record(hub, clock, ["90", "92", "94", "96"])
+
+    result = history.query(["VG017"], points=2)
+    assert result["series"] == {"VG017": [91.0, 95.0]}
+    # Bucket centres of the 30 seconds between the first and the last row
+    assert result["time"] == [START + 7.5, START + 22.5]
+
+    end = START + 6 * HISTORY_RESOLUTION
+    result = history.query(["VG017"], start=START, end=end, points=3)
+    assert result["series"] == {"VG017": [91.0, 95.0, None]}
+
+
+async def test_websocket_history(hass, hub, clock, hass_ws_client) -> None:
+    """The websocket command returns the query of the inverter's history."""
+    history = VGuardHistory(hub)
+    history.async_set_hours(1)
+    _record(hub, clock, ["90", "92", "94", "96"])
+    hass.data[DOMAIN] = {"entry": {"devices": {SERIAL: {"history": history}}}}
+    client = await hass_ws_client(hass)
+    async_register_websocket_commands(hass)
+
+    await client.send_json_auto_id(
+        {"type": f"{DOMAIN}/history", "serial": SERIAL, "codes": ["VG017"], "points": 2}
+    )
+    response = await client.receive_json()
+    assert response["success"]
+    assert response["result"] == {
+        "time": [START + 7.5, START + 22.5],
+        "series": {"VG017": [91.0, 95.0]},
+    }
+
+    await client.send_json_auto_id({"type": f"{DOMAIN}/history", "serial": "VGINV0"})
+    response = await client.receive_json()
+    assert not response["success"]
+    assert response["error"]["code"] == "not_found"
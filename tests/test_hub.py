@@ -0,0 +1,170 @@
+"""Tests for the V-Guard Inverter telemetry hub."""
+import pytest
+
+from custom_components.vguard_inverter.entity import VGuardEntity
+
+from conftest import telemetry
+
+
+async def test_fan_out_per_code(hub) -> None:
+    """Each value goes to the listeners of its VG code only."""
+    calls = []
+    hub.async_add_listener("VG017", lambda value: calls.append(("a", value)))
+    hub.async_add_listener("VG017", lambda value: calls.append(("b", value)))
+    hub.async_add_listener("VG016", lambda value: calls.append(("c", value)))
+
+    hub.async_handle_telemetry(telemetry({"VG017": "96", "VG016": "13.4", "VG099": "0"}))
+
+    assert calls == [("a", "96"), ("b", "96"), ("c", "13.4")]
+    assert hub.frames == 1
+    assert hub.available
+
+
+async def test_nested_frame(hub) -> None:
+    """A frame wrapped in a single object is unwrapped."""
+    calls = []
+    hub.async_add_listener("VG017", calls.append)
+
+    hub.async_handle_telemetry(telemetry({"data": {"VG017": "96"}}))
+
+    assert calls == ["96"]
+
+
+async def test_listener_gets_last_value(hub) -> None:
+    """A listener added later starts with the last reported value."""
+    hub.async_handle_telemetry(telemetry({"VG017": "96"}))
+    calls = []
+
+    remove = hub.async_add_listener("VG017", calls.append)
+    assert calls == ["96"]
+
+    remove()
+    hub.async_handle_telemetry(telemetry({"VG017": "95"}))
+    assert calls == ["96"]
+
+
+async def test_unchanged_values_suppressed_until_heartbeat(hub) -> None:
+    """Repeated values are only dispatched again once the heartbeat is due."""
+    calls = []
+    hub.async_add_listener("VG017", calls.append)
+
+    hub.async_handle_telemetry(telemetry({"VG017": "96"}))
+    hub.async_handle_telemetry(telemetry({"VG017": "96"}))
+    assert calls == ["96"]
+
+    hub.async_handle_telemetry(telemetry({"VG017": "95"}))
+    assert calls == ["96", "95"]
+
+    # Every value is due when the heartbeat interval has passed
+    hub.heartbeat_interval = 0
+    hub.async_handle_telemetry(telemetry({"VG017": "95"}))
+    assert calls == ["96", "95", "95"]
+
+
+async def test_expectation_holds_back_other_values(hub) -> None:
+    """While a write is unconfirmed, contradicting values are not dispatched."""
+    calls = []
+    confirmed = []
+    hub.async_add_listener("VG099", calls.append)
+    hub.async_handle_telemetry(telemetry({"VG099": "0"}))
+
+    cancel = hub.async_expect("VG099", "1", lambda: confirmed.append(True))
+    hub.async_handle_telemetry(telemetry({"VG099": "0"}))
+    assert calls == ["0"]
+    assert not confirmed
+
+    hub.async_handle_telemetry(telemetry({"VG099": "1"}))
+    assert calls == ["0", "1"]
+    assert confirmed == [True]
+
+    # Confirmed expectations are gone, cancelling is harmless
+    cancel()
+    hub.async_handle_telemetry(telemetry({"VG099": "0"}))
+    assert calls == ["0", "1", "0"]
+
+
+async def test_cancelled_expectation(hub) -> None:
+    """A cancelled expectation no longer holds back values."""
+    calls = []
+    hub.async_add_listener("VG099", calls.append)
+
+    hub.async_expect("VG099", "1", lambda: None)()
+    hub.async_handle_telemetry(telemetry({"VG099": "0"}))
+
+    assert calls == ["0"]
+
+
+async def test_redispatch_restores_last_reported_value(hub) -> None:
+    """The last reported value is sent again, e.g. to roll back a write."""
+    calls = []
+    hub.async_add_listener("VG099", calls.append)
+    assert not hub.async_redispatch("VG099")
+
+    hub.async_handle_telemetry(telemetry({"VG099": "0"}))
+    assert hub.async_redispatch("VG099")
+    assert calls == ["0", "0"]
+
+
+@pytest.mark.parametrize("payload", ["{not json", b"\xff\xfe", "[1, 2]", '"text"'])
+async def test_decode_errors_counted(hub, payload) -> None:
+    """Frames that are not JSON objects are counted and dropped."""
+    calls = []
+    hub.async_add_listener("VG017", calls.append)
+
+    hub.async_handle_telemetry(telemetry(payload))
+
+    assert hub.frames == 1
+    assert hub.decode_errors == 1
+    assert not calls
+    assert not hub.available
+
+
+async def test_frame_listeners_run_after_values(hub) -> None:
+    """Frame listeners see the values of the frame they are called for."""
+    seen = []
+    hub.async_add_frame_listener(lambda: seen.append(hub.get_value("VG017")))
+
+    hub.async_handle_telemetry(telemetry({"VG017": "96"}))
+
+    assert seen == ["96"]
+
+
+async def test_failing_listener_does_not_stop_fan_out(hub) -> None:
+    """An error in one listener is logged, the others still get the value."""
+    calls = []
+
+    def fail(value):
+        raise ValueError(value)
+
+    hub.async_add_listener("VG017", fail)
+    hub.async_add_listener("VG017", calls.append)
+
+    hub.async_handle_telemetry(telemetry({"VG017": "96"}))
+
+    assert calls == ["96"]
+
+
+async def test_failing_frame_listener_does_not_stop_others(hub, caplog) -> None:
+    """An error in one frame listener is logged, the later ones still run."""
+    seen = []
+
+    def fail():
+        raise ValueError("broken")
+
+    hub.async_add_frame_listener(fail)
+    hub.async_add_frame_listener(lambda: seen.append(hub.get_value("VG017")))
+
+    hub.async_handle_telemetry(telemetry({"VG017": "96"}))
+
+    assert seen == ["96"]
+    assert "Error processing frame" in caplog.text
+
+
+def test_entity_must_handle_values() -> None:
+    """An entity class without a value handler cannot be created."""
+
+    class Incomplete(VGuardEntity):
+        """Entity forgetting _handle_value."""
+
+    with pytest.raises(TypeError):
+        Incomplete(None, None)
@@ -0,0 +1,106 @@
+"""Tests for the V-Guard Inverter setup helpers and migrations."""
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import CONF_HOST, CONF_PORT, CONF_TOKEN, UnitOfEnergy
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+from custom_components.vguard_inverter import (
+    _async_apply_entity_groups,
+    async_migrate_entry,
+)
+from custom_components.vguard_inverter.const import (
+    DERIVED_CHARGE_ENERGY,
+    DERIVED_LOAD_POWER,
+    DOMAIN,
+    GROUP_DERIVED,
+    GROUP_DIAGNOSTICS,
+)
+
+from conftest import SERIAL
+
+
+async def test_apply_entity_groups(hass) -> None:
+    """Toggling a group enables or disables exactly its sensors."""
+    entry = MockConfigEntry(domain=DOMAIN, data={})
+    entry.add_to_hass(hass)
+    hass.data[DOMAIN] = {entry.entry_id: {"devices": {SERIAL: {}}}}
+    registry = er.async_get(hass)
+
+    def register(key: str) -> str:
+        """Register a sensor of the inverter, return its entity ID."""
+        return registry.async_get_or_create(
+            "sensor", DOMAIN, f"{DOMAIN}_{SERIAL}_{key}", config_entry=entry
+        ).entity_id
+
+    derived = [register(DERIVED_CHARGE_ENERGY), register(DERIVED_LOAD_POWER)]
+    diagnostic = register("diagnostic_frame_rate")
+    telemetry = register("VG017")
+
+    def disabled_by(entity_id: str):
+        """Return who disabled an entity."""
+        return registry.async_get(entity_id).disabled_by
+
+    _async_apply_entity_groups(hass, entry, {GROUP_DIAGNOSTICS})
+    assert [disabled_by(entity_id) for entity_id in derived] == [
+        er.RegistryEntryDisabler.INTEGRATION
+    ] * 2
+    assert disabled_by(diagnostic) is None
+    assert disabled_by(telemetry) is None
+
+    _async_apply_entity_groups(hass, entry, {GROUP_DERIVED})
+    assert [disabled_by(entity_id) for entity_id in derived] == [None, None]
+    assert disabled_by(diagnostic) is er.RegistryEntryDisabler.INTEGRATION
+    assert disabled_by(telemetry) is None
+
+
+async def test_apply_entity_groups_keeps_user_choice(hass) -> None:
+    """Sensors the user disabled stay disabled when their group is enabled."""
+    entry = MockConfigEntry(domain=DOMAIN, data={})
+    entry.add_to_hass(hass)
+    hass.data[DOMAIN] = {entry.entry_id: {"devices": {SERIAL: {}}}}
+    registry = er.async_get(hass)
+    entity_id = registry.async_get_or_create(
+        "sensor",
+        DOMAIN,
+        f"{DOMAIN}_{SERIAL}_{DERIVED_CHARGE_ENERGY}",
+        config_entry=entry,
+        disabled_by=er.RegistryEntryDisabler.USER,
+    ).entity_id
+
+    _async_apply_entity_groups(hass, entry, {GROUP_DERIVED})
+
+    assert registry.async_get(entity_id).disabled_by is er.RegistryEntryDisabler.USER
+
+
+async def test_migrate_v1_to_v3(hass) -> None:
+    """A version 1 entry gets suggested units, disabled diagnostics and a clean device."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        version=1,
+        unique_id=SERIAL,
+        data={CONF_HOST: "localhost", CONF_PORT: 1883, CONF_TOKEN: SERIAL},
+    )
+    entry.add_to_hass(hass)
+    registry = er.async_get(hass)
+    energy = registry.async_get_or_create(
+        "sensor", DOMAIN, f"{DOMAIN}_{SERIAL}_VG146", config_entry=entry
+    ).entity_id
+    firmware = registry.async_get_or_create(
+        "sensor", DOMAIN, f"{DOMAIN}_{SERIAL}_VG012", config_entry=entry
+    ).entity_id
+    device_registry = dr.async_get(hass)
+    device = device_registry.async_get_or_create(
+        config_entry_id=entry.entry_id,
+        identifiers={(DOMAIN, SERIAL)},
+        sw_version="2.2.3",
+    )
+
+    assert await async_migrate_entry(hass, entry)
+
+    assert entry.version == 3
+    assert registry.async_get(energy).options["sensor.private"] == {
+        "suggested_unit_of_measurement": UnitOfEnergy.KILO_WATT_HOUR
+    }
+    assert registry.async_get(energy).disabled_by is None
+    assert registry.async_get(firmware).disabled_by is er.RegistryEntryDisabler.INTEGRATION
+    assert device_registry.async_get(device.id).sw_version is None
@@ -0,0 +1,88 @@
+"""Tests for the V-Guard Inverter outage detector."""
+from types import SimpleNamespace
+
+import pytest
+from pytest_homeassistant_custom_component.common import async_capture_events
+
+from custom_components.vguard_inverter import outage as outage_module
+from custom_components.vguard_inverter.const import (
+    EVENT_OUTAGE_ENDED,
+    EVENT_OUTAGE_STARTED,
+)
+from custom_components.vguard_inverter.outage import VGuardOutageDetector
+
+from conftest import telemetry
+
+ON_MAINS = {"VG014": "231.4", "VG022": "0", "VG017": "96", "VG019": "50"}
+ON_BATTERY = {"VG014": "0", "VG022": "1", "VG017": "90", "VG019": "50"}
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    """Replace the detector's monotonic clock with one the test advances."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        outage_module, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+async def test_outage_events_and_energy(hass, hub, clock) -> None:
+    """An outage fires both events, the energy is computed without derived metrics."""
+    started = async_capture_events(hass, EVENT_OUTAGE_STARTED)
+    ended = async_capture_events(hass, EVENT_OUTAGE_ENDED)
+    detector = VGuardOutageDetector(hass, hub, 900)
+    detector.async_start()
+
+    hub.async_handle_telemetry(telemetry(ON_MAINS))
+    clock.now += 60
+    hub.async_handle_telemetry(telemetry(ON_BATTERY))
+    clock.now += 60
+    hub.async_handle_telemetry(telemetry(ON_BATTERY))
+    clock.now += 60
+    hub.async_handle_telemetry(telemetry(dict(ON_MAINS, VG017="88")))
+    await hass.async_block_till_done()
+
+    assert len(started) == 1
+    assert started[0].data["battery"] == 90
+    assert len(ended) == 1
+    data = ended[0].data
+    assert data["duration"] == 120
+    assert data["depth_of_discharge"] == 2
+    # 450 W between the battery frames, half of that towards either edge
+    assert data["energy_used"] == 15.0
+    assert detector.outages == 1
+    assert hub.get_value("outage_duration_total") == 120
+
+
+async def test_restored_outage_continues_without_event(hass, hub, clock) -> None:
+    """A snapshot taken on battery resumes the outage instead of starting one."""
+    started = async_capture_events(hass, EVENT_OUTAGE_STARTED)
+    ended = async_capture_events(hass, EVENT_OUTAGE_ENDED)
+    hub.async_restore(ON_BATTERY, True)
+    detector = VGuardOutageDetector(hass, hub, 900)
+    detector.async_start()
+    assert detector.on_battery
+
+    hub.async_handle_telemetry(telemetry(ON_BATTERY))
+    clock.now += 30
+    hub.async_handle_telemetry(telemetry(ON_MAINS))
+    await hass.async_block_till_done()
+
+    assert not started
+    assert len(ended) == 1
+    assert ended[0].data["duration"] == 30
+    assert ended[0].data["battery_start"] == 90
+
+
+async def test_detector_runs_before_other_frame_listeners(hass, hub) -> None:
+    """Frame listeners added earlier still see the state of the current frame."""
+    seen = []
+    hub.async_add_frame_listener(lambda: seen.append(detector.on_battery))
+    detector = VGuardOutageDetector(hass, hub, 900)
+    detector.async_start()
+
+    hub.async_handle_telemetry(telemetry(ON_BATTERY))
+    hub.async_handle_telemetry(telemetry(ON_MAINS))
+
+    assert seen == [True, False]
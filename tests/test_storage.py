@@ -0,0 +1,54 @@
+"""Tests for the V-Guard Inverter storage."""
+from datetime import timedelta
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed_exact
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.vguard_inverter.const import SNAPSHOT_SAVE_DELAY, STORAGE_KEY
+from custom_components.vguard_inverter.storage import VGuardStorage
+
+from conftest import SERIAL, telemetry
+
+ENTRY_ID = "entry"
+KEY = STORAGE_KEY.format(entry_id=ENTRY_ID)
+
+
+async def _advance(hass, seconds: float) -> None:
+    """Let delayed saves run as if `seconds` had passed."""
+    async_fire_time_changed_exact(hass, dt_util.utcnow() + timedelta(seconds=seconds))
+    await hass.async_block_till_done()
+
+
+async def test_stop_writes_pending_snapshot(hass, hass_storage, hub) -> None:
+    """Unloading writes the snapshot at once instead of leaving a timer."""
+    storage = VGuardStorage(hass, ENTRY_ID)
+    await storage.async_load()
+    storage.async_track(hub)
+    hub.async_handle_telemetry(telemetry({"VG017": "96"}))
+    assert KEY not in hass_storage
+
+    await storage.async_stop()
+
+    device = hass_storage[KEY]["data"]["devices"][SERIAL]
+    assert device["values"] == {"VG017": "96"}
+    assert device["codes"] == ["VG017"]
+
+    # No longer tracked, frames after unloading schedule nothing
+    hub.async_handle_telemetry(telemetry({"VG017": "95"}))
+    await _advance(hass, SNAPSHOT_SAVE_DELAY + 1)
+    assert hass_storage[KEY]["data"]["devices"][SERIAL]["values"] == {"VG017": "96"}
+
+
+async def test_removed_file_not_written_again(hass, hass_storage, hub) -> None:
+    """Removing the entry after unloading leaves no file behind."""
+    storage = VGuardStorage(hass, ENTRY_ID)
+    await storage.async_load()
+    storage.async_track(hub)
+    hub.async_handle_telemetry(telemetry({"VG017": "96"}))
+
+    await storage.async_stop()
+    await storage.async_remove()
+    await _advance(hass, SNAPSHOT_SAVE_DELAY + 1)
+
+    assert KEY not in hass_storage
@@ -0,0 +1,86 @@
+"""Websocket API for V-Guard Inverter.
+
+vguard_inverter/history returns the in-memory history of an inverter,
+optionally limited to a time range and downsampled. A subscription to
+vguard_inverter/history/subscribe receives every new row as an event.
+"""
+from typing import Any, Optional
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+from .history import VGuardHistory
+
+_CODES = vol.All([str], vol.Length(min=1))
+
+
+@callback
+def async_register_websocket_commands(hass: HomeAssistant) -> None:
+    """Register the websocket commands."""
+    websocket_api.async_register_command(hass, websocket_history)
+    websocket_api.async_register_command(hass, websocket_subscribe_history)
+
+
+def _get_history(hass: HomeAssistant, serial: str) -> Optional[VGuardHistory]:
+    """Return the history of an inverter of any entry."""
+    for config in hass.data.get(DOMAIN, {}).values():
+        if (device := config["devices"].get(serial)) is not None:
+            return device["history"]
+    return None
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/history",
+        vol.Required("serial"): str,
+        vol.Optional("codes"): _CODES,
+        vol.Optional("start"): vol.Coerce(float),
+        vol.Optional("end"): vol.Coerce(float),
+        vol.Optional("points"): vol.All(vol.Coerce(int), vol.Range(min=1, max=5000)),
+    }
+)
+@callback
+def websocket_history(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return a range of the history, timestamps in epoch seconds."""
+    if (history := _get_history(hass, msg["serial"])) is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "Unknown inverter")
+        return
+    connection.send_result(
+        msg["id"],
+        history.query(msg.get("codes"), msg.get("start"), msg.get("end"), msg.get("points")),
+    )
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/history/subscribe",
+        vol.Required("serial"): str,
+        vol.Optional("codes"): _CODES,
+    }
+)
+@callback
+def websocket_subscribe_history(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Send every new row of the history until unsubscribed."""
+    if (history := _get_history(hass, msg["serial"])) is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "Unknown inverter")
+        return
+    codes = msg.get("codes")
+
+    @callback
+    def forward_row(timestamp: float, row: dict[str, Optional[float]]) -> None:
+        """Send a row to the subscriber."""
+        if codes is not None:
+            row = {code: row[code] for code in codes if code in row}
+        connection.send_message(
+            websocket_api.event_message(msg["id"], {"time": timestamp, "values": row})
+        )
+
+    connection.subscriptions[msg["id"]] = history.async_add_listener(forward_row)
+    connection.send_result(msg["id"])